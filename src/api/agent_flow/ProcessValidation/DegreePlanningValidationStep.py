@@ -1,13 +1,19 @@
 import json
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional
 
 from semantic_kernel import Kernel
 from semantic_kernel.functions import kernel_function, KernelArguments
 from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelProcessStepState, KernelProcessStepContext
 from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
 
+from src.api.agent_flow.ProcessValidation.DegreePlanningPatchPrompt import degree_planning_patch_prompt
 from src.api.agent_flow.ProcessValidation.DegreePlanningValidationPrompt import degree_planning_validation_prompt
-from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationContext import ArtifactExtraction, ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.llm_services.LlmScheduler import LlmPriority, use_llm_priority
+from src.api.agent_flow.llm_services.StructuredOutput import StructuredOutputError, parse_structured
 
 
 class DegreePlanningValidationStep(KernelProcessStep[ConversationContext]):
@@ -21,7 +27,24 @@ class DegreePlanningValidationStep(KernelProcessStep[ConversationContext]):
         self._setup_validation_functions()
 
     def _setup_validation_functions(self):
-        extraction_prompt_config = PromptTemplateConfig(
+        prompt_registry.get_or_add(
+            self.kernel,
+            plugin_name="DegreePlanningValidation",
+            function_name="validate_degree_planning",
+            prompt_template_config=self._extraction_prompt,
+            output_model=ArtifactExtraction,
+        )
+        prompt_registry.get_or_add(
+            self.kernel,
+            plugin_name="DegreePlanningValidation",
+            function_name="extract_artifact_patch",
+            prompt_template_config=self._patch_prompt,
+            output_model=ArtifactExtraction,
+        )
+
+    @staticmethod
+    def _extraction_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
             template=degree_planning_validation_prompt,
             input_variables=[
                 InputVariable(name="chat_history", description="The chat history to extract information from",
@@ -31,10 +54,20 @@ class DegreePlanningValidationStep(KernelProcessStep[ConversationContext]):
             name="conversation_artifact_extractor",
             description="Extracts a conversation artifact from chat history"
         )
-        self.kernel.add_function(
-            prompt_template_config=extraction_prompt_config,
-            plugin_name="DegreePlanningValidation",
-            function_name="validate_degree_planning",
+
+    @staticmethod
+    def _patch_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
+            template=degree_planning_patch_prompt,
+            input_variables=[
+                InputVariable(name="artifact", description="The current conversation artifact as JSON",
+                              is_required=True),
+                InputVariable(name="new_messages", description="Messages not yet reflected in the artifact",
+                              is_required=True),
+            ],
+            template_format="semantic-kernel",
+            name="conversation_artifact_patcher",
+            description="Extracts the artifact fields changed by the newest messages"
         )
 
     @kernel_function(name="validate_degree_planning")
@@ -42,51 +75,87 @@ class DegreePlanningValidationStep(KernelProcessStep[ConversationContext]):
         """
         Validates if the user's input is related to degree planning.
         """
-        if self.kernel:
-            validated_degree_planning = await self.kernel.invoke(
-                plugin_name="DegreePlanningValidation",
-                function_name="validate_degree_planning",
-                arguments=KernelArguments(
-                    chat_history=self.state.to_chat_history().messages
-                )
-            )
-        else:
+        if not self.kernel:
             raise ValueError("Kernel is not initialized.")
 
-        validated_state = json.loads(str(validated_degree_planning))
-
-        # Get current state from artifact
-        current_state = self.state.artifact.current_state
-
-        # Check if validated state differs from current state
-        if validated_state["current_state"] != current_state:
-        # Update state in artifact
-            self.state.artifact.current_state = validated_state["current_state"]
-
-        # Update other relevant fields from validated state
-        if validated_state["degree_type"]:
-            self.state.artifact.degree_type = validated_state["degree_type"]
-
-        if validated_state["major"]:
-            self.state.artifact.major = validated_state["major"]
-
-        if validated_state["time_preference"]:
-            self.state.artifact.time_preference = validated_state["time_preference"]
-
-        if validated_state["current_term"]:
-            self.state.artifact.current_term = validated_state["current_term"]
-
-        if validated_state["preferred_courses_per_semester"]:
-            self.state.artifact.preferred_courses_per_semester = validated_state["preferred_courses_per_semester"]
-
-        if validated_state["career_goals"]:
-            self.state.artifact.career_goals = validated_state["career_goals"]
-
-        if validated_state["courses_selected"]:
-            for course in validated_state["courses_selected"]:
-                if course not in self.state.artifact.courses_selected:
-                    self.state.artifact.courses_selected.append(course)
+        with turn_span("degree_planning_validation"):
+            result = await validate_conversation_artifact(self.kernel, self.state)
         await context.emit_event(process_event="DegreePlanningValidationStateChanged", data=data)
-        return f"State changed from {current_state} to {validated_state['current_state']}"
-
-
+        return result
+
+
+async def validate_conversation_artifact(kernel: Kernel, state: ConversationContext) -> str:
+    """Bring `state.artifact` up to date with the conversation.
+
+    Used by the step above, and run as a background task after the response when the
+    manager validates in the background. By default only the turns not yet folded into
+    the artifact are sent, so the cost does not grow with the conversation;
+    PANDA_ARTIFACT_EXTRACTION=full re-extracts from the whole chat history instead. If the
+    extractor's output cannot be used, the artifact is left as it is and the same turns are
+    sent again next time.
+    """
+    current_state = state.artifact.current_state
+    turn = state.turn_count
+
+    # The student is not waiting for this; final responses go first
+    with use_llm_priority(LlmPriority.BACKGROUND):
+        if os.getenv("PANDA_ARTIFACT_EXTRACTION", "incremental").lower() == "full":
+            patch = await _extract_full(kernel, state)
+        else:
+            patch = await _extract_patch(kernel, state)
+    if patch is None:
+        return f"State unchanged at {current_state}: the artifact could not be extracted"
+
+    changed = state.artifact.apply_patch(patch, version=turn)
+    state.artifact.extracted_turns = max(state.artifact.extracted_turns, turn)
+    print(f"artifact fields changed: {changed}")
+    return f"State changed from {current_state} to {state.artifact.current_state}"
+
+
+async def _parse_extraction(kernel: Kernel, output: Any) -> Optional[Dict[str, Any]]:
+    try:
+        return (await parse_structured(kernel, output, ArtifactExtraction)).patch()
+    except StructuredOutputError as e:
+        print(e)
+        return None
+
+
+async def _extract_full(kernel: Kernel, state: ConversationContext) -> Optional[Dict[str, Any]]:
+    prompt_registry.get_or_add(
+        kernel,
+        plugin_name="DegreePlanningValidation",
+        function_name="validate_degree_planning",
+        prompt_template_config=DegreePlanningValidationStep._extraction_prompt,
+        output_model=ArtifactExtraction,
+    )
+    validated_degree_planning = await kernel.invoke(
+        plugin_name="DegreePlanningValidation",
+        function_name="validate_degree_planning",
+        arguments=KernelArguments(
+            chat_history=state.to_chat_history().messages
+        )
+    )
+    return await _parse_extraction(kernel, validated_degree_planning)
+
+
+async def _extract_patch(kernel: Kernel, state: ConversationContext) -> Optional[Dict[str, Any]]:
+    new_messages = state.messages_since_turn(state.artifact.extracted_turns)
+    if not new_messages:
+        return {}
+
+    prompt_registry.get_or_add(
+        kernel,
+        plugin_name="DegreePlanningValidation",
+        function_name="extract_artifact_patch",
+        prompt_template_config=DegreePlanningValidationStep._patch_prompt,
+        output_model=ArtifactExtraction,
+    )
+    patch = await kernel.invoke(
+        plugin_name="DegreePlanningValidation",
+        function_name="extract_artifact_patch",
+        arguments=KernelArguments(
+            artifact=json.dumps(state.artifact.extracted_fields()),
+            new_messages="\n".join(f"{msg['role']}: {msg['content']}" for msg in new_messages),
+        )
+    )
+    return await _parse_extraction(kernel, patch)
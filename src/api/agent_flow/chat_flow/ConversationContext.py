@@ -1,8 +1,14 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import Enum
-from typing import List, Any, Dict, Optional
+from typing import List, Any, Dict, Iterator, Optional, Tuple
 
-from pydantic import BaseModel, Field
-from semantic_kernel.contents import ChatHistory
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
+
+from src.api.agent_flow.chat_flow.TokenBudget import estimate_tokens
+from src.api.agent_flow.chat_flow.TurnIndex import RECENT_TURNS, RELEVANT_TURNS, TurnIndex
 
 
 class AcademicTerm(BaseModel):
@@ -44,6 +50,67 @@ class ConversationArtifact(BaseModel):
     total_credits_needed: Optional[int] = None
     courses_selected: Optional[List[str]] = Field(default_factory=list)
 
+    # Bookkeeping for incremental extraction: the turn each field was last set in, and how
+    # many turns of the conversation have been folded into the artifact
+    field_versions: Dict[str, int] = Field(default_factory=dict)
+    extracted_turns: int = 0
+
+    def extracted_fields(self) -> Dict[str, Any]:
+        """The artifact as shown to the extractor, without bookkeeping."""
+        return self.model_dump(mode="json", exclude={"field_versions", "extracted_turns"})
+
+    def apply_patch(self, patch: Dict[str, Any], version: int) -> List[str]:
+        """Merge extracted fields stamped with `version` (a turn number); returns the fields changed.
+
+        Empty values never clear a field, a field set by a later turn than `version` is kept, and
+        courses_selected accumulates.
+        """
+        changed = []
+        for name, value in patch.items():
+            if name in ("field_versions", "extracted_turns") or name not in type(self).model_fields:
+                continue
+            if value is None or value == "" or value == []:
+                continue
+            if self.field_versions.get(name, -1) > version:
+                continue
+            try:
+                value = getattr(type(self).model_validate({name: value}), name)
+            except ValidationError as e:
+                print(f"Ignoring invalid artifact field {name}: {e}")
+                continue
+
+            if name == "courses_selected":
+                current = self.courses_selected or []
+                value = current + [course for course in value if course not in current]
+            if value != getattr(self, name):
+                setattr(self, name, value)
+                changed.append(name)
+            self.field_versions[name] = version
+        return changed
+
+
+class ArtifactExtraction(BaseModel):
+    """The artifact fields as the extractor returns them; null (or left out) means not found."""
+    current_state: Optional[str] = None
+    degree_type: Optional[str] = None
+    major: Optional[str] = None
+    concentration: Optional[str] = None
+    minor: Optional[List[str]] = None
+    start_term: Optional[AcademicTerm] = None
+    current_term: Optional[AcademicTerm] = None
+    preferred_courses_per_semester: Optional[int] = None
+    min_courses_per_semester: Optional[int] = None
+    max_courses_per_semester: Optional[int] = None
+    time_preference: Optional[str] = None
+    summer_available: Optional[bool] = None
+    career_goals: Optional[List[str]] = None
+    total_credits_needed: Optional[int] = None
+    courses_selected: Optional[List[str]] = None
+
+    def patch(self) -> Dict[str, Any]:
+        """The fields found, for ConversationArtifact.apply_patch."""
+        return self.model_dump(mode="json", exclude_none=True)
+
 
 class ConversationContext(BaseModel):
     """Context for the current conversation."""
@@ -51,6 +118,28 @@ class ConversationContext(BaseModel):
     # cached_rag_results: List[Dict[str, str]] = Field(default_factory=list)
     last_intent: Optional[str] = None
     artifact: ConversationArtifact = Field(default_factory=ConversationArtifact)
+    # Running summary of messages[:summarized_messages], maintained by HistorySummarizer
+    summary: Optional[str] = None
+    summarized_messages: int = 0
+    # Set while a caller is streaming the current turn; response tokens are pushed here
+    _token_queue: Optional[asyncio.Queue] = PrivateAttr(default=None)
+    # Work started after a turn's response (e.g. artifact validation) that the next turn must wait for
+    _background_tasks: List[asyncio.Task] = PrivateAttr(default_factory=list)
+    _summary_task: Optional[asyncio.Task] = PrivateAttr(default=None)
+    # ChatHistory mirror of `messages`, with each message's position in it and its token estimate
+    _chat_history: Optional[ChatHistory] = PrivateAttr(default=None)
+    _synced_messages: Optional[List[Dict[str, Any]]] = PrivateAttr(default=None)
+    _history_offsets: List[int] = PrivateAttr(default_factory=list)
+    _token_counts: List[int] = PrivateAttr(default_factory=list)
+    # Message embeddings for relevance retrieval, and the index of each turn's user message
+    _turn_index: TurnIndex = PrivateAttr(default_factory=TurnIndex)
+    _turn_starts: List[int] = PrivateAttr(default_factory=list)
+    # Search started alongside this turn's classification (a SpeculativeSearch), until the response takes it
+    _speculation: Optional[Any] = PrivateAttr(default=None)
+    # Cookie header of the signed-in student's Panda session, for tools that read their data
+    _panda_session: Optional[str] = PrivateAttr(default=None)
+    # Why the current turn's response failed, for process_message to raise
+    _turn_error: Optional[BaseException] = PrivateAttr(default=None)
 
 
     def add_message(self, role: str, content: str, name: Optional[str] = None) -> None:
@@ -78,13 +167,45 @@ class ConversationContext(BaseModel):
         """Add a system message to the history."""
         self.add_message("system", content)
 
-    def to_chat_history(self) -> ChatHistory:
-        """Convert internal message format to Semantic Kernel's ChatHistory."""
-        chat_history = ChatHistory()
+    @property
+    def turn_count(self) -> int:
+        """Number of user messages so far."""
+        return sum(1 for msg in self.messages if msg["role"] == "user")
+
+    def messages_since_turn(self, turn: int) -> List[Dict[str, Any]]:
+        """Messages from the user message that started turn `turn + 1` onwards."""
+        seen = 0
+        for index, msg in enumerate(self.messages):
+            if msg["role"] == "user":
+                if seen == turn:
+                    return self.messages[index:]
+                seen += 1
+        return []
+
+    def _sync_chat_history(self) -> ChatHistory:
+        """Append messages added since the last call to the cached ChatHistory.
+
+        The cache is rebuilt only when `messages` was replaced or shrank; edits to existing
+        message dicts are not picked up.
+        """
+        if (self._chat_history is None or self._synced_messages is not self.messages
+                or len(self._history_offsets) > len(self.messages)):
+            self._chat_history = ChatHistory()
+            self._synced_messages = self.messages
+            self._history_offsets = []
+            self._token_counts = []
+            self._turn_index = TurnIndex()
+            self._turn_starts = []
 
-        for msg in self.messages:
+        chat_history = self._chat_history
+        for msg in self.messages[len(self._history_offsets):]:
             role = msg["role"]
             content = msg["content"]
+            if role == "user":
+                self._turn_starts.append(len(self._history_offsets))
+            self._history_offsets.append(len(chat_history.messages))
+            self._token_counts.append(estimate_tokens(content or ""))
+            self._turn_index.add(content or "")
 
             if role == "user":
                 chat_history.add_user_message(content)
@@ -95,11 +216,198 @@ class ConversationContext(BaseModel):
 
         return chat_history
 
+    def _history_offset(self, message_index: int) -> int:
+        """Position of messages[message_index] in the cached ChatHistory (its end when past the last)."""
+        if message_index < len(self._history_offsets):
+            return self._history_offsets[message_index]
+        return len(self._chat_history.messages)
+
+    def _window_start(self, max_tokens: int) -> Tuple[Optional[str], int]:
+        """Summary text (if any) and index of the first message of the budgeted window."""
+        summarized = min(self.summarized_messages, len(self.messages))
+        summary = None
+        budget = max_tokens
+        if self.summary and summarized:
+            summary = f"Summary of the earlier conversation: {self.summary}"
+            budget -= estimate_tokens(summary)
+
+        start = len(self.messages)
+        while start > summarized:
+            cost = self._token_counts[start - 1]
+            if cost > budget and start < len(self.messages):
+                break
+            budget -= cost
+            start -= 1
+        return summary, start
+
+    def history_window(self, max_tokens: int) -> List[Dict[str, Any]]:
+        """The running summary plus as many of the most recent unsummarised messages as fit in
+        `max_tokens` (estimated). The latest message is always included."""
+        self._sync_chat_history()
+        summary, start = self._window_start(max_tokens)
+        window = [{"role": "system", "content": summary}] if summary else []
+        return window + self.messages[start:]
+
+    def _relevant_ranges(self, query: str, max_tokens: Optional[int]) -> Tuple[Optional[str], List[Tuple[int, int]]]:
+        """Message ranges of the last RECENT_TURNS turns plus up to RELEVANT_TURNS earlier turns
+        most similar to `query`, in conversation order, and the summary if it still fits.
+
+        The recent turns get the budget first (trimmed from the front like `history_window`),
+        then the relevant turns in order of similarity, then the summary.
+        """
+        budget = max_tokens if max_tokens is not None else float("inf")
+        turns = len(self._turn_starts)
+        recent_from = max(0, turns - RECENT_TURNS)
+        cut = self._turn_starts[recent_from] if turns else 0
+
+        start = len(self.messages)
+        while start > cut:
+            cost = self._token_counts[start - 1]
+            if cost > budget and start < len(self.messages):
+                break
+            budget -= cost
+            start -= 1
+
+        ranges = []
+        if start == cut:
+            for turn in self._turn_index.top_turns(query, self._turn_starts, recent_from, RELEVANT_TURNS):
+                first, last = self._turn_starts[turn], self._turn_starts[turn + 1]
+                cost = sum(self._token_counts[first:last])
+                if cost <= budget:
+                    ranges.append((first, last))
+                    budget -= cost
+        ranges.sort()
+        ranges.append((start, len(self.messages)))
+
+        summary = None
+        if self.summary and self.summarized_messages:
+            summary = f"Summary of the earlier conversation: {self.summary}"
+            if estimate_tokens(summary) > budget:
+                summary = None
+        return summary, ranges
+
+    def to_chat_history(self, max_tokens: Optional[int] = None, query: Optional[str] = None) -> ChatHistory:
+        """Semantic Kernel ChatHistory of the conversation, maintained incrementally.
+
+        Without arguments this is the cached history of all messages, shared between callers,
+        so treat it as read-only. With `max_tokens`, a new ChatHistory of the budgeted
+        `history_window` that reuses the cached message objects. With `query`, the recent turns
+        plus the earlier turns most relevant to it (within `max_tokens`, if given).
+        """
+        chat_history = self._sync_chat_history()
+        if query is not None:
+            summary, ranges = self._relevant_ranges(query, max_tokens)
+            window = [message for first, last in ranges for message in chat_history.messages[
+                self._history_offset(first):self._history_offset(last)]]
+            if summary:
+                window = [ChatMessageContent(role=AuthorRole.SYSTEM, content=summary)] + window
+            return ChatHistory(messages=window)
+        if max_tokens is None:
+            return chat_history
+
+        summary, start = self._window_start(max_tokens)
+        window = chat_history.messages[self._history_offset(start):]
+        if summary:
+            window = [ChatMessageContent(role=AuthorRole.SYSTEM, content=summary)] + window
+        return ChatHistory(messages=window)
+
     def from_chat_history(self, chat_history: ChatHistory) -> None:
         """Update internal messages from a ChatHistory object."""
         self.messages = []
+        self.summary = None
+        self.summarized_messages = 0
+        self._chat_history = None
 
         # Convert each message in the ChatHistory to our internal format
         for message in chat_history:
             role = message.role.value.lower()  # Convert AuthorRole to string
-            self.add_message(role, message.content)
\ No newline at end of file
+            self.add_message(role, message.content)
+
+    def attach_token_queue(self, queue: Optional[asyncio.Queue]) -> None:
+        """Stream response tokens of the following turns into the queue (None to stop)."""
+        self._token_queue = queue
+
+    def attach_panda_session(self, session_cookie: Optional[str]) -> None:
+        """Read the student's Panda data as this session in the following turns (None for no access)."""
+        self._panda_session = session_cookie
+
+    @property
+    def panda_session(self) -> Optional[str]:
+        return self._panda_session
+
+    @property
+    def is_streaming(self) -> bool:
+        return self._token_queue is not None
+
+    def emit_token(self, token: str) -> None:
+        """Forward a response token to the attached queue, if any."""
+        if self._token_queue is not None and token:
+            self._token_queue.put_nowait(token)
+
+    def attach_speculation(self, speculation: Optional[Any]) -> None:
+        self._speculation = speculation
+
+    def take_speculation(self) -> Optional[Any]:
+        """The current turn's speculative search, if any; the caller becomes responsible for it."""
+        speculation, self._speculation = self._speculation, None
+        return speculation
+
+    def fail_turn(self, error: BaseException) -> None:
+        """Record that the current turn's response failed; the process runtime does not propagate it."""
+        self._turn_error = error
+
+    def take_turn_error(self) -> Optional[BaseException]:
+        error, self._turn_error = self._turn_error, None
+        return error
+
+    def add_background_task(self, task: asyncio.Task) -> None:
+        """Register work on this conversation that has to finish before its next turn starts."""
+        self._background_tasks = [pending for pending in self._background_tasks if not pending.done()]
+        self._background_tasks.append(task)
+
+    def set_summary_task(self, task: asyncio.Task) -> None:
+        """Track the history summary refresh; unlike background tasks, turns never wait for it."""
+        self._summary_task = task
+
+    @property
+    def is_summarizing(self) -> bool:
+        return self._summary_task is not None and not self._summary_task.done()
+
+    @property
+    def has_pending_background_tasks(self) -> bool:
+        return any(not task.done() for task in self._background_tasks)
+
+    async def wait_for_background_tasks(self) -> None:
+        """Wait for background work of the previous turn; failures are logged, not raised."""
+        tasks, self._background_tasks = self._background_tasks, []
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                print(f"Background task failed: {e}")
+
+
+# The conversation the current task is serving. Shared plugins and process steps read it,
+# so one kernel can serve every session.
+_active_context: ContextVar[Optional[ConversationContext]] = ContextVar("active_conversation_context", default=None)
+
+
+@contextmanager
+def use_conversation_context(context: ConversationContext) -> Iterator[ConversationContext]:
+    """Make `context` the active conversation for the enclosed code and the tasks it starts."""
+    token = _active_context.set(context)
+    try:
+        yield context
+    finally:
+        _active_context.reset(token)
+
+
+def get_active_context(default: Optional[ConversationContext] = None) -> ConversationContext:
+    """Return the active conversation, or `default` when none is set."""
+    context = _active_context.get() or default
+    if context is None:
+        raise RuntimeError("No active conversation context. Wrap the call in use_conversation_context().")
+    return context
@@ -1,137 +1,392 @@
-from typing import TypeVar, Type
+import asyncio
+import os
+import time
+from enum import Enum
+from typing import AsyncIterator, List, TypeVar, Type, Optional
 
+from openai import AsyncAzureOpenAI
+from pydantic import BaseModel
 from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
 from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+from semantic_kernel.filters import FilterTypes
 from semantic_kernel.processes import ProcessBuilder
 
-from src.api.agent_flow.ProcessValidation.DegreePlanningValidationStep import DegreePlanningValidationStep
-from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.ProcessValidation.DegreePlanningValidationStep import DegreePlanningValidationStep, \
+    validate_conversation_artifact
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext, get_active_context, \
+    use_conversation_context
+from src.api.agent_flow.chat_flow.HistorySummarizer import schedule_summary_refresh
+from src.api.agent_flow.chat_flow.TurnAdmission import ServiceTier, turn_admission
+from src.api.agent_flow.chat_flow.TurnTimings import TurnTimer, turn_timing_stats, use_turn_timer
+from src.api.agent_flow.intent_recognition.ClassificationJoinProcess import ClassificationJoinStep
+from src.api.agent_flow.intent_recognition.FastPathClassifier import FastPathClassifier, fast_path_classifier
 from src.api.agent_flow.intent_recognition.StateTransitionProcess import StateTransitionProcess
 from src.api.agent_flow.response_creation.ResponseGenerator import ResponseGenerator
 from src.api.agent_flow.information_search.InformationRetrievalEvaluationProcess import \
     InformationRetrievalEvaluationStep
+from src.api.agent_flow.information_search.SpeculativeSearch import SpeculativeSearch
+from src.api.agent_flow.llm_services.LlmScheduler import llm_scheduler
+from src.api.agent_flow.llm_services.LoadBalancedChatCompletion import LoadBalancedChatCompletion, PoolEndpoint, \
+    azure_openai_pool, llm_hedging, load_balancer_stats
+from src.api.agent_flow.llm_services.ModelRouting import model_routing, route_stats
+from src.api.agent_flow.llm_services.ScheduledChatCompletion import ScheduledChatCompletion
 from src.api.agent_flow.intent_recognition.RecognizeIntentProcess import IntentRecognitionStep
+from src.api.agent_flow.intent_recognition.TurnClassificationProcess import TurnClassificationStep
 from src.api.agent_flow.response_creation.ResponseProcessStep import ResponseStep
 from src.api.agent_plugins.Course import CourseRecommendationPlugin
 from src.api.agent_plugins.StudentInfo import StudentInfoPlugin
 
+# Structured outputs (JSON schema response formats) need 2024-08-01-preview or later
+AZURE_OPENAI_API_VERSION = "2024-08-01-preview"
+
+
+class PipelineMode(str, Enum):
+    # Intent recognition, then a separate RAG-need evaluation (two LLM calls)
+    SEQUENTIAL = "sequential"
+    # One structured call returns intent, confidence and retrieval need together
+    COMBINED = "combined"
+    # Intent recognition and RAG evaluation run concurrently and are joined before the response
+    PARALLEL = "parallel"
+
+
+class ValidationMode(str, Enum):
+    # Degree planning turns return after the artifact has been re-extracted
+    INLINE = "inline"
+    # The response returns immediately; extraction runs as a task the next turn waits for
+    BACKGROUND = "background"
+
+
+class ResponseChunk(BaseModel):
+    """One item of stream_message: a token of the response, or the complete response at the end."""
+    text: str
+    final: bool = False
+
 
 class ConversationStateManager:
     def __init__(self,
                  azure_openai_deployment: str,
                  azure_openai_endpoint: str,
                  azure_openai_api_key: str,
-                 service_id: str = "default"
+                 service_id: str = "default",
+                 pipeline_mode: PipelineMode | str | None = None,
+                 chat_service: ChatCompletionClientBase | None = None,
+                 validation_mode: ValidationMode | str | None = None,
+                 speculative_search: bool | None = None,
+                 pool: List[PoolEndpoint] | None = None,
                  ):
-        self.chat_service = AzureChatCompletion(
-            deployment_name=azure_openai_deployment,
-            endpoint=azure_openai_endpoint,
+        # Switchable per manager (or via PANDA_PIPELINE_MODE) so modes can be A/B tested
+        self.pipeline_mode = PipelineMode(pipeline_mode or os.getenv("PANDA_PIPELINE_MODE", PipelineMode.SEQUENTIAL))
+        self.validation_mode = ValidationMode(
+            validation_mode or os.getenv("PANDA_VALIDATION_MODE", ValidationMode.INLINE))
+        # Caps the turns running at once, in front of the LLM scheduler
+        self.turn_admission = turn_admission
+        # Every LLM request is admitted by the process-wide scheduler (PANDA_LLM_SCHEDULER=false bypasses it)
+        self.llm_scheduler = llm_scheduler if os.getenv("PANDA_LLM_SCHEDULER", "true").lower() == "true" else None
+        # With a pool of endpoints (PANDA_AZURE_OPENAI_POOL), every deployment is served by all of
+        # them; their clients don't retry, the pool fails over to another endpoint instead
+        pool = azure_openai_pool if pool is None else pool
+        self._pool_clients = {} if chat_service else {
+            endpoint.name: AsyncAzureOpenAI(
+                azure_endpoint=endpoint.endpoint,
+                api_key=endpoint.key() or azure_openai_api_key,
+                api_version=AZURE_OPENAI_API_VERSION,
+                max_retries=0,
+            )
+            for endpoint in pool
+        }
+        # Otherwise one client for every deployment; an injected service (e.g. the benchmarks' stub)
+        # replaces Azure OpenAI
+        self._azure_client = None if chat_service or self._pool_clients else AsyncAzureOpenAI(
+            azure_endpoint=azure_openai_endpoint,
             api_key=azure_openai_api_key,
-            api_version="2024-02-15-preview",
+            api_version=AZURE_OPENAI_API_VERSION,
+            # The scheduler retries rate limited requests itself, holding back the rest of the queue
+            max_retries=0 if self.llm_scheduler else 2,
         )
+        self.chat_service = self._create_chat_service(chat_service, azure_openai_deployment)
         self.kernel = Kernel()
         self.kernel.add_service(self.chat_service)
+        # A service per model route, registered under the route's name; prompt functions select
+        # theirs by service id (see ModelRouting)
+        for route_name, route in model_routing.routes.items():
+            service = self._create_chat_service(chat_service, route.deployment or azure_openai_deployment,
+                                                service_id=route_name)
+            if service is not None:
+                self.kernel.add_service(service)
+        self.kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, route_stats.on_function_invocation)
+        # Conversation used when process_message is called without one (e.g. the CLI)
         self.context = ConversationContext()
+        # Generate the search query (and with PANDA_SPECULATIVE_RETRIEVAL, retrieve) while the turn is
+        # still being classified; costs the tokens of every search that turns out not to be needed
+        self.speculative_search = speculative_search if speculative_search is not None else \
+            os.getenv("PANDA_SPECULATIVE_SEARCH", "false").lower() == "true"
+        self.speculative_retrieval = os.getenv("PANDA_SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+        self.timing_report = os.getenv("PANDA_TIMING_REPORT", "false").lower() == "true"
+        self.last_turn_timer: Optional[TurnTimer] = None
         self.response_generator = ResponseGenerator(self.kernel, self.context)
         self.process_builder = self._build_process()
         self.process = self.process_builder.build()
 
+    def _create_chat_service(self, chat_service: ChatCompletionClientBase | None, deployment: str,
+                             service_id: str | None = None) -> ChatCompletionClientBase | None:
+        if chat_service is None and self._pool_clients:
+            service = LoadBalancedChatCompletion(
+                {name: AzureChatCompletion(service_id=service_id, deployment_name=deployment, async_client=client)
+                 for name, client in self._pool_clients.items()},
+                service_id=service_id,
+                hedge=llm_hedging,
+            )
+            load_balancer_stats.register(service)
+        else:
+            service = chat_service or AzureChatCompletion(
+                service_id=service_id,
+                deployment_name=deployment,
+                async_client=self._azure_client,
+            )
+        if self.llm_scheduler is not None:
+            return ScheduledChatCompletion(service, self.llm_scheduler, service_id=service_id)
+        if chat_service is not None and service_id is not None:
+            # Without the scheduler wrapping it, an injected service is registered once and routed
+            # functions fall back to it
+            return None
+        return service
+
     def _build_process(self) -> ProcessBuilder:
         process = ProcessBuilder(name="ConversationStateManager")
 
-        shared_context = self.context
-
-        course_plugin = CourseRecommendationPlugin(shared_context)
-        student_info_plugin = StudentInfoPlugin(shared_context)
+        # Plugins and steps are shared by every conversation; they resolve the
+        # active ConversationContext set by process_message.
+        course_plugin = CourseRecommendationPlugin()
+        student_info_plugin = StudentInfoPlugin()
 
         self.kernel.add_plugin(course_plugin, plugin_name="CourseRecommendationPlugin")
         self.kernel.add_plugin(student_info_plugin, plugin_name="StudentInfoPlugin")
 
         T = TypeVar("T")
 
-        def create_step(step_class: Type[T]) -> T:
+        def create_step(step_class: Type[T], **attributes) -> T:
+            # Steps are created per process run, inside the caller's conversation scope
             step = step_class()
             step.kernel = self.kernel
-            step.state = shared_context
+            step.state = get_active_context()
+            for name, value in attributes.items():
+                setattr(step, name, value)
             return step
 
-        intent_recognition_step = process.add_step(
-            IntentRecognitionStep,
-            factory_function=lambda: create_step(IntentRecognitionStep),
-        )
-
         state_transition_step = process.add_step(
             StateTransitionProcess,
             factory_function=lambda: create_step(StateTransitionProcess),
         )
 
-        rag_evaluation_step = process.add_step(
-            InformationRetrievalEvaluationStep,
-            factory_function=lambda: create_step(InformationRetrievalEvaluationStep),
-        )
-
         response_step = process.add_step(
             ResponseStep,
-            factory_function=lambda: create_step(ResponseStep),
-        )
-
-        degree_planning_validation_step = process.add_step(
-            DegreePlanningValidationStep,
-            factory_function=lambda: create_step(DegreePlanningValidationStep),
+            factory_function=lambda: create_step(ResponseStep, response_generator=self.response_generator),
         )
 
         # Define the process flow
-        process.on_input_event(event_id="UserInput").send_event_to(
-            intent_recognition_step,
-            parameter_name="user_input"
-        )
+        if self.pipeline_mode == PipelineMode.COMBINED:
+            turn_classification_step = process.add_step(
+                TurnClassificationStep,
+                factory_function=lambda: create_step(TurnClassificationStep),
+            )
 
-        intent_recognition_step.on_event("IntentRecognized").send_event_to(
-            state_transition_step,
-            parameter_name="data"
-        )
+            process.on_input_event(event_id="UserInput").send_event_to(
+                turn_classification_step,
+                parameter_name="user_input"
+            )
 
-        state_transition_step.on_event(event_id="StateChanged").send_event_to(
-            rag_evaluation_step,
-            parameter_name="data"
-        )
+            turn_classification_step.on_event("IntentRecognized").send_event_to(
+                state_transition_step,
+                parameter_name="data"
+            )
 
-        state_transition_step.on_event(event_id="StateUnchanged").send_event_to(
-            rag_evaluation_step,
-            parameter_name="data"
-        )
+            # The transition carries needs_rag from the classifier straight to the response
+            state_transition_step.on_event(event_id="StateChanged").send_event_to(
+                response_step,
+                parameter_name="data"
+            )
 
-        rag_evaluation_step.on_event(event_id="RagEvaluated").send_event_to(
-            response_step,
-            parameter_name="data"
-        )
+            state_transition_step.on_event(event_id="StateUnchanged").send_event_to(
+                response_step,
+                parameter_name="data"
+            )
+        elif self.pipeline_mode == PipelineMode.PARALLEL:
+            intent_recognition_step = process.add_step(
+                IntentRecognitionStep,
+                factory_function=lambda: create_step(IntentRecognitionStep),
+            )
 
-        response_step.on_event(event_id="DegreePlanningResponseGenerated").send_event_to(
-            degree_planning_validation_step,
-            parameter_name="data"
-        )
+            rag_evaluation_step = process.add_step(
+                InformationRetrievalEvaluationStep,
+                factory_function=lambda: create_step(InformationRetrievalEvaluationStep),
+            )
+
+            join_step = process.add_step(
+                ClassificationJoinStep,
+                factory_function=lambda: create_step(ClassificationJoinStep),
+            )
+
+            # Both classifiers start from the raw user input; the RAG evaluation sees the
+            # state from before this turn's transition
+            process.on_input_event(event_id="UserInput").send_event_to(
+                intent_recognition_step,
+                parameter_name="user_input"
+            )
+
+            process.on_input_event(event_id="UserInput").send_event_to(
+                rag_evaluation_step,
+                function_name="analyze_user_input",
+                parameter_name="user_input"
+            )
+
+            intent_recognition_step.on_event("IntentRecognized").send_event_to(
+                state_transition_step,
+                parameter_name="data"
+            )
+
+            state_transition_step.on_event(event_id="StateChanged").send_event_to(
+                join_step,
+                function_name="join_classification",
+                parameter_name="intent_data"
+            )
+
+            state_transition_step.on_event(event_id="StateUnchanged").send_event_to(
+                join_step,
+                function_name="join_classification",
+                parameter_name="intent_data"
+            )
+
+            rag_evaluation_step.on_event(event_id="RagEvaluated").send_event_to(
+                join_step,
+                function_name="join_classification",
+                parameter_name="rag_data"
+            )
+
+            join_step.on_event(event_id="ClassificationJoined").send_event_to(
+                response_step,
+                parameter_name="data"
+            )
+        else:
+            intent_recognition_step = process.add_step(
+                IntentRecognitionStep,
+                factory_function=lambda: create_step(IntentRecognitionStep),
+            )
+
+            rag_evaluation_step = process.add_step(
+                InformationRetrievalEvaluationStep,
+                factory_function=lambda: create_step(InformationRetrievalEvaluationStep),
+            )
+
+            process.on_input_event(event_id="UserInput").send_event_to(
+                intent_recognition_step,
+                parameter_name="user_input"
+            )
+
+            intent_recognition_step.on_event("IntentRecognized").send_event_to(
+                state_transition_step,
+                parameter_name="data"
+            )
+
+            state_transition_step.on_event(event_id="StateChanged").send_event_to(
+                rag_evaluation_step,
+                function_name="analyze_rag_need",
+                parameter_name="data"
+            )
+
+            state_transition_step.on_event(event_id="StateUnchanged").send_event_to(
+                rag_evaluation_step,
+                function_name="analyze_rag_need",
+                parameter_name="data"
+            )
+
+            rag_evaluation_step.on_event(event_id="RagEvaluated").send_event_to(
+                response_step,
+                parameter_name="data"
+            )
+
+        # In background mode process_message schedules the validation itself
+        if self.validation_mode == ValidationMode.INLINE:
+            degree_planning_validation_step = process.add_step(
+                DegreePlanningValidationStep,
+                factory_function=lambda: create_step(DegreePlanningValidationStep),
+            )
+
+            response_step.on_event(event_id="DegreePlanningResponseGenerated").send_event_to(
+                degree_planning_validation_step,
+                parameter_name="data"
+            )
 
         return process
 
-    async def process_message(self, user_input: str) -> str:
+    async def process_message(self, user_input: str, token_queue: Optional[asyncio.Queue] = None,
+                              context: Optional[ConversationContext] = None,
+                              tier: ServiceTier | str = ServiceTier.FREE) -> str:
+        """Run one conversation turn.
+
+        `context` selects the conversation (defaults to the manager's own). The caller must not run
+        two turns of the same conversation at once. If a queue is given, response tokens are put on
+        it as they are generated. In background validation mode a degree planning turn returns
+        before its artifact is re-extracted; the next turn of the conversation waits for it.
+        When the maximum number of turns is already running, the turn waits for a slot, and
+        premium turns are admitted ahead of free ones.
+        """
         from semantic_kernel.processes.local_runtime.local_kernel_process import start
         from semantic_kernel.processes.kernel_process.kernel_process_event import KernelProcessEvent
 
+        context = context or self.context
+
         # Store the current message count before processing
-        previous_message_count = len(self.context.messages)
-        previous_assistant_messages = [msg for msg in self.context.messages if msg["role"] == "assistant"]
+        previous_message_count = len(context.messages)
+        previous_assistant_messages = [msg for msg in context.messages if msg["role"] == "assistant"]
 
         # Process the message
-        async with await start(
-                process=self.process,
-                kernel=self.kernel,
-                initial_event=KernelProcessEvent(id="UserInput", data=user_input)
-        ) as running_process:
-            # The context is properly awaited here
-            pass
+        context.attach_token_queue(token_queue)
+        timer = TurnTimer()
+        try:
+            with use_conversation_context(context), use_turn_timer(timer):
+                # The artifact must be up to date before this turn is classified; waiting for it
+                # does not hold a turn slot
+                if context.has_pending_background_tasks:
+                    with timer.span("wait_for_validation"):
+                        await context.wait_for_background_tasks()
+
+                async with self.turn_admission.admit(tier):
+                    if self._should_speculate(user_input):
+                        context.attach_speculation(self._start_speculation(user_input, context))
+
+                    async with await start(
+                            process=self.process,
+                            kernel=self.kernel,
+                            initial_event=KernelProcessEvent(id="UserInput", data=user_input)
+                    ) as running_process:
+                        # The context is properly awaited here
+                        pass
+
+                # A failed response (e.g. a stream broken part-way) fails the turn
+                error = context.take_turn_error()
+                if error is not None:
+                    raise error
+        finally:
+            context.attach_token_queue(None)
+            # Not taken by the response step (e.g. the turn failed or was cancelled)
+            speculation = context.take_speculation()
+            if speculation is not None:
+                speculation.discard()
+            timer.finish()
+            turn_timing_stats.record(timer)
+            self.last_turn_timer = timer
+            if self.timing_report:
+                print(timer.report())
+
+        with use_conversation_context(context):
+            if self.validation_mode == ValidationMode.BACKGROUND and context.artifact.current_state == "degree_planning":
+                context.add_background_task(asyncio.create_task(self._validate_in_background(context)))
+            # Fold older turns into the running summary once the response is out
+            schedule_summary_refresh(self.kernel, context)
 
         # Now check for new assistant messages (after process completion)
-        current_assistant_messages = [msg for msg in self.context.messages if msg["role"] == "assistant"]
+        current_assistant_messages = [msg for msg in context.messages if msg["role"] == "assistant"]
 
         # If a new assistant message was added
         if len(current_assistant_messages) > len(previous_assistant_messages):
@@ -141,4 +396,46 @@ class ConversationStateManager:
                 return "I'm sorry, I couldn't generate a response. Please try again with the same message."
             return message
 
-        return "I'm sorry, I couldn't generate a response."
\ No newline at end of file
+        return "I'm sorry, I couldn't generate a response."
+
+    def _should_speculate(self, user_input: str) -> bool:
+        # Messages the fast path answers never need retrieval
+        return self.speculative_search and not (fast_path_classifier.enabled and FastPathClassifier.match(user_input))
+
+    def _start_speculation(self, user_input: str, context: ConversationContext) -> SpeculativeSearch:
+        retrieve = None
+        if self.speculative_retrieval:
+            async def retrieve(query: str):
+                return await self.response_generator.rag_chat.generate_response(query=query)
+        return SpeculativeSearch(self.response_generator.search_query, user_input, context, retrieve=retrieve)
+
+    async def stream_message(self, user_input: str, context: Optional[ConversationContext] = None,
+                             tier: ServiceTier | str = ServiceTier.FREE) -> AsyncIterator[ResponseChunk]:
+        """Run one conversation turn, yielding response tokens as they are generated.
+
+        The last chunk is final and carries the complete response (which is the only text when the
+        response was not streamed, e.g. an error message). Closing the iterator early cancels the turn.
+        """
+        token_queue: asyncio.Queue = asyncio.Queue()
+        turn = asyncio.create_task(self.process_message(user_input, token_queue=token_queue, context=context,
+                                                        tier=tier))
+        # Wake the reader once the turn is over, whether or not tokens were produced
+        turn.add_done_callback(lambda _: token_queue.put_nowait(None))
+        try:
+            while (token := await token_queue.get()) is not None:
+                yield ResponseChunk(text=token)
+            yield ResponseChunk(text=await turn, final=True)
+        finally:
+            if not turn.done():
+                turn.cancel()
+
+    async def _validate_in_background(self, context: ConversationContext) -> str:
+        start = time.perf_counter()
+        try:
+            return await validate_conversation_artifact(self.kernel, context)
+        except Exception as e:
+            # The session may be evicted before another turn awaits this task, so report here
+            print(f"Background degree planning validation failed: {e}")
+            return ""
+        finally:
+            turn_timing_stats.record_background("degree_planning_validation", time.perf_counter() - start)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import KernelArguments
+from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TurnTimings import turn_timing_stats
+from src.api.agent_flow.llm_services.LlmScheduler import LlmPriority, use_llm_priority
+
+# Most recent messages that are never folded into the summary
+KEEP_MESSAGES = int(os.getenv("PANDA_HISTORY_KEEP_MESSAGES", "12"))
+# Fold at least this many messages at once, so the summary is not rewritten every turn
+FOLD_MESSAGES = int(os.getenv("PANDA_HISTORY_FOLD_MESSAGES", "8"))
+
+
+def _summary_prompt() -> PromptTemplateConfig:
+    return PromptTemplateConfig(
+        template="""
+        You maintain a running summary of a conversation between a UNC student and an academic advising
+        assistant. Update the summary with the new messages below. Keep every fact that matters for advising:
+        the student's degree, major, minors, terms, course load and time preferences, career goals, courses
+        discussed or chosen, open questions and anything the assistant promised. Drop greetings and small talk.
+        Write at most 200 words of plain text.
+
+        Current summary: {{$summary}}
+
+        New messages:
+        {{$new_messages}}
+
+        Updated summary:
+        """,
+        name="summarize_history",
+        template_format="semantic-kernel",
+        input_variables=[
+            InputVariable(name="summary", description="The summary so far", is_required=True),
+            InputVariable(name="new_messages", description="Messages to fold into the summary", is_required=True),
+        ]
+    )
+
+
+def needs_summary(context: ConversationContext) -> bool:
+    return len(context.messages) - KEEP_MESSAGES - context.summarized_messages >= FOLD_MESSAGES
+
+
+def schedule_summary_refresh(kernel: Kernel, context: ConversationContext) -> Optional[asyncio.Task]:
+    """Start folding older messages into the summary, unless not needed or already running.
+
+    Called after a turn's response has been delivered; the next turn does not wait for it
+    and reads the previous summary until the refresh lands.
+    """
+    if context.is_summarizing or not needs_summary(context):
+        return None
+    task = asyncio.create_task(refresh_summary(kernel, context))
+    context.set_summary_task(task)
+    return task
+
+
+async def refresh_summary(kernel: Kernel, context: ConversationContext) -> None:
+    start_time = time.perf_counter()
+    start = context.summarized_messages
+    end = len(context.messages) - KEEP_MESSAGES
+    new_messages = context.messages[start:end]
+
+    prompt_registry.get_or_add(
+        kernel,
+        plugin_name="HistorySummarizer",
+        function_name="summarize_history",
+        prompt_template_config=_summary_prompt,
+    )
+    try:
+        with use_llm_priority(LlmPriority.BACKGROUND):
+            summary = await kernel.invoke(
+                plugin_name="HistorySummarizer",
+                function_name="summarize_history",
+                arguments=KernelArguments(
+                    summary=context.summary or "None yet.",
+                    new_messages="\n".join(f"{msg['role']}: {msg['content']}" for msg in new_messages),
+                )
+            )
+    except Exception as e:
+        print(f"History summary refresh failed: {e}")
+        return
+    finally:
+        turn_timing_stats.record_background("history_summary", time.perf_counter() - start_time)
+
+    # Skip if the history was replaced meanwhile
+    if context.summarized_messages == start and len(context.messages) >= end:
+        context.summary = str(summary).strip()
+        context.summarized_messages = end
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Callable, Dict
+
+from pydantic import BaseModel
+from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai import PromptExecutionSettings
+from semantic_kernel.functions import KernelFunction
+from semantic_kernel.prompt_template import PromptTemplateConfig
+
+from src.api.agent_flow.llm_services.ModelRouting import model_routing
+from src.api.agent_flow.llm_services.StructuredOutput import apply_response_format
+
+
+class PromptFunctionRegistry:
+    """Registers prompt functions on a kernel once and returns the existing function afterwards.
+
+    Building the template config and compiling it into a kernel function only happens on the
+    first request for a (kernel, plugin, function); process steps can call this on every
+    activation for the cost of a dict lookup. New functions are pointed at their model route,
+    and functions with an `output_model` request JSON output in its shape.
+    """
+
+    def __init__(self):
+        self.registrations = 0
+        self.reuses = 0
+        self.compile_seconds = 0.0
+
+    def get_or_add(self,
+                   kernel: Kernel,
+                   plugin_name: str,
+                   function_name: str,
+                   prompt_template_config: Callable[[], PromptTemplateConfig],
+                   prompt_execution_settings: PromptExecutionSettings | None = None,
+                   output_model: type[BaseModel] | None = None,
+                   ) -> KernelFunction:
+        plugin = kernel.plugins.get(plugin_name)
+        if plugin is not None and function_name in plugin.functions:
+            self.reuses += 1
+            return plugin.functions[function_name]
+
+        start = time.perf_counter()
+        function = kernel.add_function(
+            plugin_name=plugin_name,
+            function_name=function_name,
+            prompt_template_config=prompt_template_config(),
+            prompt_execution_settings=prompt_execution_settings,
+        )
+        model_routing.apply(function, plugin_name, function_name)
+        if output_model is not None:
+            apply_response_format(function, output_model)
+        self.compile_seconds += time.perf_counter() - start
+        self.registrations += 1
+        return function
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "registrations": self.registrations,
+            "reuses": self.reuses,
+            "compile_ms": round(self.compile_seconds * 1000, 3),
+        }
+
+
+prompt_registry = PromptFunctionRegistry()
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class ConversationSession(Generic[T]):
+    """One student's conversation plus the lock that serialises its turns."""
+
+    def __init__(self, session_id: str, value: T):
+        self.session_id = session_id
+        self.value = value
+        self.lock = asyncio.Lock()
+        self.active = 0
+        self.weight = 0
+        self.last_used = time.monotonic()
+
+
+class ConversationSessionStore(Generic[T]):
+    """Sessions keyed by id, created on first use by `factory`.
+
+    Turns within a session run one at a time, different sessions run in parallel.
+    Sessions idle for longer than `idle_ttl` seconds are dropped, and when the total
+    weight (`weigh`, e.g. message count) exceeds `capacity` the least recently used
+    idle sessions are evicted. Sessions with a turn in progress are never evicted.
+    """
+
+    def __init__(self,
+                 factory: Callable[[str], T],
+                 capacity: int = 1000,
+                 idle_ttl: float = 1800,
+                 weigh: Callable[[T], int] = lambda value: 1,
+                 ):
+        self.factory = factory
+        self.capacity = capacity
+        self.idle_ttl = idle_ttl
+        self.weigh = weigh
+        # Ordered from least to most recently acquired
+        self._sessions: OrderedDict[str, ConversationSession[T]] = OrderedDict()
+        self._weight = 0
+
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    @asynccontextmanager
+    async def acquire(self, session_id: str) -> AsyncIterator[T]:
+        """Hold the session for one turn, waiting for any turn already running in it."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = ConversationSession(session_id, self.factory(session_id))
+            self._sessions[session_id] = session
+            self.created += 1
+        self._sessions.move_to_end(session_id)
+
+        session.active += 1
+        try:
+            async with session.lock:
+                session.last_used = time.monotonic()
+                yield session.value
+        finally:
+            session.active -= 1
+            session.last_used = time.monotonic()
+            if self._sessions.get(session_id) is session:
+                weight = self.weigh(session.value)
+                self._weight += weight - session.weight
+                session.weight = weight
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired sessions, then least recently used ones until under capacity."""
+        now = time.monotonic()
+        # Walk from the least recently acquired end, skipping sessions with a turn in progress,
+        # and stop at the first one that is neither expired nor needed to get under capacity
+        for session_id, session in list(self._sessions.items()):
+            if session.active:
+                continue
+            if now - session.last_used > self.idle_ttl:
+                self._remove(session_id)
+                self.expirations += 1
+            elif self._weight > self.capacity:
+                self._remove(session_id)
+                self.evictions += 1
+            else:
+                break
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._weight -= session.weight
+
+    def discard(self, session_id: str) -> None:
+        if session_id in self._sessions:
+            self._remove(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "active": sum(1 for session in self._sessions.values() if session.active),
+            "weight": self._weight,
+            "capacity": self.capacity,
+            "created": self.created,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,39 @@
+import math
+import os
+
+# Chat history each prompt may embed, in estimated tokens. Override one with
+# PANDA_HISTORY_BUDGET_<NAME>, e.g. PANDA_HISTORY_BUDGET_RESPONSE=6000.
+HISTORY_BUDGETS = {
+    "intent_recognition": 800,
+    "turn_classification": 800,
+    "rag_evaluation": 600,
+    "search_query": 800,
+    "response": 3000,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def result_tokens(result) -> int:
+    """Tokens an LLM call consumed, from the usage the service reported, else estimated from the
+    prompt messages and the answer."""
+    if result is None:
+        return 0
+    value = getattr(result, "value", result)
+    for item in value if isinstance(value, list) else [value]:
+        usage = (getattr(item, "metadata", None) or {}).get("usage")
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            return usage.prompt_tokens + (usage.completion_tokens or 0)
+    messages = (getattr(result, "metadata", None) or {}).get("messages")
+    prompt = sum(estimate_tokens(str(message.content or "")) for message in messages) if messages else 0
+    return prompt + estimate_tokens(str(result))
+
+
+def history_budget(prompt_name: str) -> int:
+    override = os.getenv(f"PANDA_HISTORY_BUDGET_{prompt_name.upper()}")
+    if override:
+        return int(override)
+    return HISTORY_BUDGETS.get(prompt_name, HISTORY_BUDGETS["response"])
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+from src.api.agent_flow.chat_flow.TurnTimings import percentile, turn_span
+
+# Latency samples kept per tier for the percentiles in /metrics
+LATENCY_SAMPLES = 1000
+
+
+class ServiceTier(str, Enum):
+    PREMIUM = "premium"
+    FREE = "free"
+
+
+class TurnAdmission:
+    """Limits how many conversation turns run at once, admitting waiting premium turns first.
+
+    Waiting turns are ordered by arrival time, with premium turns treated as having arrived
+    `premium_head_start` seconds earlier. A premium turn therefore overtakes free turns that
+    arrived less than that long before it, and a free turn never waits behind premium turns
+    that arrived more than that long after it.
+    """
+
+    def __init__(self, max_active: int = 16, premium_head_start: float = 5.0):
+        self.max_active = max_active
+        self.premium_head_start = premium_head_start
+        self.active = 0
+        self._queue: List[Tuple[float, int, ServiceTier, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        self.turns: Dict[ServiceTier, int] = {tier: 0 for tier in ServiceTier}
+        self.queued_turns: Dict[ServiceTier, int] = {tier: 0 for tier in ServiceTier}
+        self.wait_samples: Dict[ServiceTier, Deque[float]] = {
+            tier: deque(maxlen=LATENCY_SAMPLES) for tier in ServiceTier}
+        self.latency_samples: Dict[ServiceTier, Deque[float]] = {
+            tier: deque(maxlen=LATENCY_SAMPLES) for tier in ServiceTier}
+
+    def queue_depth(self, tier: ServiceTier) -> int:
+        return sum(1 for _, _, queued_tier, admitted in self._queue
+                   if queued_tier == tier and not admitted.done())
+
+    @asynccontextmanager
+    async def admit(self, tier: ServiceTier = ServiceTier.FREE) -> AsyncIterator[None]:
+        """Hold a turn slot, waiting for one if every slot is taken."""
+        tier = ServiceTier(tier)
+        arrived = time.perf_counter()
+        if self.active < self.max_active and not self._queue:
+            self.active += 1
+        else:
+            await self._wait(tier, arrived)
+        waited = time.perf_counter() - arrived
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.turns[tier] += 1
+            self.wait_samples[tier].append(waited)
+            self.latency_samples[tier].append(time.perf_counter() - arrived)
+            self._dispatch()
+
+    async def _wait(self, tier: ServiceTier, arrived: float) -> None:
+        self.queued_turns[tier] += 1
+        rank = arrived - (self.premium_head_start if tier == ServiceTier.PREMIUM else 0.0)
+        admitted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, next(self._sequence), tier, admitted))
+        self._dispatch()
+        try:
+            with turn_span("wait_for_admission"):
+                await admitted
+        except asyncio.CancelledError:
+            # Admitted just as the turn was cancelled; pass the slot on
+            if admitted.done() and not admitted.cancelled():
+                self.active -= 1
+                self._dispatch()
+            raise
+
+    def _dispatch(self) -> None:
+        while self._queue and self.active < self.max_active:
+            _, _, _, admitted = heapq.heappop(self._queue)
+            if admitted.done():  # cancelled while waiting
+                continue
+            self.active += 1
+            admitted.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "premium_head_start_s": self.premium_head_start,
+            "tiers": {
+                tier.value: {
+                    "turns": self.turns[tier],
+                    "queued_turns": self.queued_turns[tier],
+                    "queue_depth": self.queue_depth(tier),
+                    "avg_wait_ms": round(sum(self.wait_samples[tier]) / len(self.wait_samples[tier]) * 1000, 1)
+                    if self.wait_samples[tier] else 0.0,
+                    "p95_wait_ms": round(percentile(list(self.wait_samples[tier]), 0.95) * 1000, 1),
+                    "p50_latency_ms": round(percentile(list(self.latency_samples[tier]), 0.5) * 1000, 1),
+                    "p95_latency_ms": round(percentile(list(self.latency_samples[tier]), 0.95) * 1000, 1),
+                }
+                for tier in ServiceTier
+            },
+        }
+
+
+# Shared by every manager in the process, in front of the LLM scheduler
+turn_admission = TurnAdmission(
+    max_active=int(os.getenv("PANDA_MAX_ACTIVE_TURNS", "16")),
+    premium_head_start=float(os.getenv("PANDA_PREMIUM_HEAD_START", "5")),
+)
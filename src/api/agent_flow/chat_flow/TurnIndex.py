@@ -0,0 +1,70 @@
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+# Turns always given verbatim, and earlier turns retrieved by relevance, per prompt.
+# At least the latest turn is always given, so the verbatim cut falls on a turn start.
+RECENT_TURNS = max(1, int(os.getenv("PANDA_HISTORY_RECENT_TURNS", "3")))
+RELEVANT_TURNS = max(0, int(os.getenv("PANDA_HISTORY_RELEVANT_TURNS", "3")))
+
+EMBEDDING_DIMENSIONS = 512
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from have how i if in is it its me my of on or so that the "
+    "their them then there these they this to was we what when where which who why will with you your".split()
+)
+
+
+def embed(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """Signed hashed bag of words and bigrams, L2-normalised; cosine similarity is a dot product."""
+    words = [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+        hashed = zlib.crc32(token.encode())
+        vector[hashed % dimensions] += 1.0 if hashed & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+class TurnIndex:
+    """Embeddings of a conversation's messages in one growing array, for relevance lookups."""
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.vectors = np.zeros((64, dimensions), dtype=np.float32)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, text: str) -> None:
+        if self.size == len(self.vectors):
+            grown = np.zeros((len(self.vectors) * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size] = embed(text, self.vectors.shape[1])
+        self.size += 1
+
+    def scores(self, query: str, limit: int | None = None) -> np.ndarray:
+        """Similarity of the query to each of the first `limit` indexed messages."""
+        limit = self.size if limit is None else min(limit, self.size)
+        return self.vectors[:limit] @ embed(query, self.vectors.shape[1])
+
+    def top_turns(self, query: str, turn_starts: List[int], before_turn: int, k: int) -> List[int]:
+        """The k turns before `before_turn` most similar to the query, best first.
+
+        A turn scores as its best-matching message; turns with nothing in common are skipped.
+        """
+        if k <= 0 or before_turn <= 0:
+            return []
+        first, cut = turn_starts[0], turn_starts[before_turn]
+        message_scores = self.scores(query, cut)[first:]
+        turn_scores = np.maximum.reduceat(message_scores, np.asarray(turn_starts[:before_turn]) - first)
+        k = min(k, before_turn)
+        candidates = np.argpartition(-turn_scores, k - 1)[:k]
+        ranked = sorted(candidates, key=lambda turn: -turn_scores[turn])
+        return [int(turn) for turn in ranked if turn_scores[turn] > 0]
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of latency samples; 0 when there are none."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TurnTimer:
+    """Records when each stage of one conversation turn started and finished."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.spans: List[Tuple[str, float, float]] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start - self.started, time.perf_counter() - self.started))
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def serial_total(self) -> float:
+        """What the turn would cost if every stage ran one after another."""
+        return sum(end - start for _, start, end in self.spans)
+
+    def report(self, width: int = 40) -> str:
+        """Timeline of the turn; overlapping bars are stages that ran concurrently."""
+        total = self.total or 1e-9
+        lines = [f"turn {self.total * 1000:.0f} ms (stages sum to {self.serial_total * 1000:.0f} ms)"]
+        for name, start, end in sorted(self.spans, key=lambda span: span[1]):
+            offset = int(start / total * width)
+            length = max(1, int((end - start) / total * width))
+            bar = " " * offset + "#" * length
+            lines.append(f"  {name:<28} {bar:<{width}} {start * 1000:7.0f} -> {end * 1000:7.0f} ms")
+        return "\n".join(lines)
+
+
+class TurnTimingStats:
+    """Running per-stage averages across turns, for /metrics."""
+
+    def __init__(self):
+        self.turns = 0
+        self.total_seconds = 0.0
+        self.stage_counts: Dict[str, int] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        # Work done after a turn returned, off the critical path
+        self.background_counts: Dict[str, int] = {}
+        self.background_seconds: Dict[str, float] = {}
+
+    def record(self, timer: TurnTimer) -> None:
+        self.turns += 1
+        self.total_seconds += timer.total
+        for name, start, end in timer.spans:
+            self.stage_counts[name] = self.stage_counts.get(name, 0) + 1
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + (end - start)
+
+    def record_background(self, name: str, seconds: float) -> None:
+        self.background_counts[name] = self.background_counts.get(name, 0) + 1
+        self.background_seconds[name] = self.background_seconds.get(name, 0.0) + seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turns,
+            "avg_turn_ms": round(self.total_seconds / self.turns * 1000, 1) if self.turns else 0.0,
+            "avg_stage_ms": {
+                name: round(self.stage_seconds[name] / count * 1000, 1) for name, count in self.stage_counts.items()
+            },
+            "avg_background_ms": {
+                name: round(self.background_seconds[name] / count * 1000, 1)
+                for name, count in self.background_counts.items()
+            },
+        }
+
+
+turn_timing_stats = TurnTimingStats()
+
+_active_timer: ContextVar[Optional[TurnTimer]] = ContextVar("active_turn_timer", default=None)
+
+
+@contextmanager
+def use_turn_timer(timer: TurnTimer) -> Iterator[TurnTimer]:
+    token = _active_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _active_timer.reset(token)
+
+
+@contextmanager
+def turn_span(name: str) -> Iterator[None]:
+    """Time a stage of the current turn; a no-op outside of a timed turn."""
+    timer = _active_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.span(name):
+        yield
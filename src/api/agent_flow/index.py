@@ -19,16 +19,24 @@ async def chat():
 
     while True:
         try:
-            user_input = input("User> ")
+            # Read input off the event loop so background work of the previous turn keeps running
+            user_input = await asyncio.to_thread(input, "User> ")
             if user_input.lower() == "exit":
                 print("\nGoodbye!")
                 break
 
-            response = await client.process_message(str(user_input))
-
-            print("\nAssistant> ", end="")
-            print(response)
-
+            streamed = False
+            async for chunk in client.stream_message(str(user_input)):
+                if not chunk.final:
+                    if not streamed:
+                        print("\nAssistant> ", end="")
+                        streamed = True
+                    print(chunk.text, end="", flush=True)
+                elif not streamed:
+                    # Nothing was streamed (e.g. an error message), print the whole response
+                    print("\nAssistant> ", end="")
+                    print(chunk.text, end="")
+            print()
             print()
 
         except KeyboardInterrupt:
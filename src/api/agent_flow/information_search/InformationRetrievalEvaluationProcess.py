@@ -7,6 +7,11 @@ from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelPr
 from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
 
 from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.information_search.RagNeedClassifier import rag_need_classifier, rag_verdict_log
+from src.api.agent_flow.intent_recognition.FastPathClassifier import fast_path_classifier
 
 class InformationRetrievalEvaluationStep(KernelProcessStep[ConversationContext]):
     kernel: Kernel | None = None
@@ -20,7 +25,17 @@ class InformationRetrievalEvaluationStep(KernelProcessStep[ConversationContext])
         self._setup_information_retrieval()
 
     def _setup_information_retrieval(self):
-        evaluation_template_config = PromptTemplateConfig(
+        if self.kernel:
+            prompt_registry.get_or_add(
+                self.kernel,
+                plugin_name="RagRecognizer",
+                function_name="evaluate_rag_need",
+                prompt_template_config=self._evaluation_prompt,
+            )
+
+    @staticmethod
+    def _evaluation_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
             template="""You are a validation agent for an academic advising AI system. Your task is to determine when UNC-specific data lookups or Research-Augmented Generation (RAG) retrievals are needed.
             ### Core Validation Criteria:
             1. **Only trigger UNC Lookups or RAG Retrievals when the latest user input explicitly requires it**
@@ -106,32 +121,58 @@ class InformationRetrievalEvaluationStep(KernelProcessStep[ConversationContext])
                 InputVariable(name="current_state", description="The current state", is_required=True),
             ]
         )
-        if self.kernel:
-            self.kernel.add_function(
-                plugin_name="RagRecognizer",
-                function_name="evaluate_rag_need",
-                prompt_template_config=evaluation_template_config,
-            )
 
     @kernel_function(name="analyze_rag_need")
     async def analyze_rag_need(self, context: KernelProcessStepContext, data: Dict[str, Any]):
         user_input = data.get("user_input", "")
         current_state = data.get("state", "")
+        return await self._evaluate_rag_need(context, user_input, current_state)
+
+    @kernel_function(name="analyze_user_input")
+    async def analyze_user_input(self, context: KernelProcessStepContext, user_input: str):
+        """Evaluates straight from the user input, concurrently with intent recognition.
+
+        The state transition has not happened yet, so the evaluation sees the previous state.
+        """
+        return await self._evaluate_rag_need(context, user_input, self.state.artifact.current_state)
+
+    async def _evaluate_rag_need(self, context: KernelProcessStepContext, user_input: str, current_state: str):
+        fast_path = fast_path_classifier.classify("rag_evaluation", user_input, current_state)
+        if fast_path is not None:
+            data = {
+                "needs_rag": fast_path["needs_rag"],
+                "user_input": user_input,
+            }
+            await context.emit_event(process_event="RagEvaluated", data=data)
+            return fast_path["needs_rag"]
+
+        # The distilled classifier answers confident cases in-process
+        if rag_need_classifier is not None:
+            needs_rag = rag_need_classifier.decide(user_input, current_state)
+            if needs_rag is not None:
+                await context.emit_event(process_event="RagEvaluated", data={
+                    "needs_rag": needs_rag,
+                    "user_input": user_input,
+                })
+                return needs_rag
+
         if self.kernel:
-            response = await self.kernel.invoke(
-                plugin_name="RagRecognizer",
-                function_name="evaluate_rag_need",
-                arguments=KernelArguments(
-                    user_input=user_input,
-                    chat_history=self.state.to_chat_history(),
-                    current_state=current_state,
+            with turn_span("rag_evaluation"):
+                response = await self.kernel.invoke(
+                    plugin_name="RagRecognizer",
+                    function_name="evaluate_rag_need",
+                    arguments=KernelArguments(
+                        user_input=user_input,
+                        chat_history=self.state.to_chat_history(history_budget("rag_evaluation")),
+                        current_state=current_state,
+                    )
                 )
-            )
         else:
             raise Exception("Kernel is not initialized")
         print(f"response: {response}")
 
         needs_rag = str(response).strip().lower() == "true"
+        rag_verdict_log.record(user_input, current_state, needs_rag)
         data = {
             "needs_rag": needs_rag,
             "user_input": user_input,
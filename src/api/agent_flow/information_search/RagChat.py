@@ -15,13 +15,13 @@ from semantic_kernel.prompt_template import InputVariable, PromptTemplateConfig
 from dotenv import load_dotenv
 import os
 
-from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
 
 
 class AzureRagChat:
+    """Summarises Azure AI Search results for a query. Built once and reused for every RAG turn."""
 
-    def __init__(self, state: ConversationContext, kernel: Kernel, prompt_template: PromptTemplateConfig, query: str, load_env_vars=True):
-        self.state = state
+    def __init__(self, kernel: Kernel, prompt_template: PromptTemplateConfig, load_env_vars=True):
         self.kernel = kernel
         if load_env_vars:
             load_dotenv()
@@ -34,7 +34,6 @@ class AzureRagChat:
         )
 
         self.prompt_template = prompt_template
-        self.query = query
 
         # Set up RAG data source
         self.az_source = AzureAISearchDataSource.from_azure_ai_search_settings(
@@ -47,31 +46,32 @@ class AzureRagChat:
 
     def _setup_chat_function(self):
         """Set up the chat function with the correct prompt template."""
-        self.prompt_template_config = self.prompt_template
+        # Work on a copy so the shared template does not collect execution settings
+        self.prompt_template_config = self.prompt_template.model_copy(deep=True)
         self.prompt_template_config.add_execution_settings(self.req_settings)
 
-        self.chat_function = self.kernel.add_function(
+        self.chat_function = prompt_registry.get_or_add(
+            self.kernel,
             plugin_name="ChatBot",
             function_name="Chat",
-            prompt_template_config=self.prompt_template_config,
+            prompt_template_config=lambda: self.prompt_template_config,
         )
 
     async def generate_response(
             self,
-            user_input: str,
+            query: str,
             streaming: bool = False
     ) -> FunctionResult:
-        """Generate a response to the user input using the provided chat history.
+        """Retrieve and summarise search results for the query.
 
         Args:
-            user_input: The user's message
-            chat_history: Optional chat history (either ChatHistory object or string)
+            query: The search query
             streaming: Whether to stream the response (not implemented yet)
 
         Returns:
-            Tuple of (response text, updated chat history)
+            The function result holding the summary
         """
 
         # Generate response (non-streaming for now)
-        response = await self.kernel.invoke(self.chat_function, arguments=KernelArguments(query=self.query))
+        response = await self.kernel.invoke(self.chat_function, arguments=KernelArguments(query=query))
         return response
\ No newline at end of file
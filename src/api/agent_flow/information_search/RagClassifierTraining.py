@@ -0,0 +1,96 @@
+"""
+Train the local RAG-need classifier from the verdict log and report how it does on
+held-out turns.
+
+Collect verdicts by running the agent with PANDA_RAG_VERDICT_LOG=rag_verdicts.jsonl,
+then:
+
+    python -m src.api.agent_flow.information_search.RagClassifierTraining \
+        --log rag_verdicts.jsonl --out rag_classifier.npz
+
+and serve it with PANDA_RAG_CLASSIFIER=rag_classifier.npz. To report on a separate
+held-out log without training:
+
+    python -m src.api.agent_flow.information_search.RagClassifierTraining \
+        --model rag_classifier.npz --heldout later_verdicts.jsonl
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from src.api.agent_flow.information_search.RagNeedClassifier import DEFAULT_DIMENSIONS, RagNeedClassifier, \
+    RagVerdictLog
+
+
+def report(classifier: RagNeedClassifier, examples: List[Tuple[str, str, bool]]) -> None:
+    if not examples:
+        print("no held-out examples")
+        return
+
+    start = time.perf_counter()
+    probabilities = [classifier.predict_proba(user_input, state) for user_input, state, _ in examples]
+    latency_us = (time.perf_counter() - start) / len(examples) * 1e6
+
+    labels = [needs_rag for _, _, needs_rag in examples]
+    predictions = [probability >= 0.5 for probability in probabilities]
+    correct = sum(p == label for p, label in zip(predictions, labels))
+    true_positives = sum(p and label for p, label in zip(predictions, labels))
+    predicted_positive = sum(predictions)
+    positives = sum(labels)
+
+    confident = [(p >= 0.5, label) for p, label in zip(probabilities, labels)
+                 if max(p, 1 - p) >= classifier.threshold]
+    confident_correct = sum(p == label for p, label in confident)
+
+    print(f"held-out turns:      {len(examples)} ({positives} needing RAG)")
+    print(f"accuracy:            {correct / len(examples):.3f}")
+    print(f"precision / recall:  {true_positives / predicted_positive if predicted_positive else 0.0:.3f}"
+          f" / {true_positives / positives if positives else 0.0:.3f}")
+    print(f"threshold {classifier.threshold:.2f}:      decides {len(confident) / len(examples):.1%} of turns locally,"
+          f" {confident_correct / len(confident) if confident else 0.0:.3f} accurate on those")
+    print(f"latency:             {latency_us:.1f} us per turn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="verdict log to train on")
+    parser.add_argument("--out", default="rag_classifier.npz", help="where to write the model")
+    parser.add_argument("--heldout", help="separate verdict log to evaluate on")
+    parser.add_argument("--holdout-fraction", type=float, default=0.2,
+                        help="fraction of --log held out when --heldout is not given")
+    parser.add_argument("--model", help="evaluate an existing model instead of training")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    heldout = list(RagVerdictLog.read(args.heldout)) if args.heldout else []
+
+    if args.model:
+        classifier = RagNeedClassifier.load(args.model, args.threshold)
+    else:
+        if not args.log:
+            parser.error("--log is required to train")
+        examples = list(RagVerdictLog.read(args.log))
+        if not args.heldout:
+            random.Random(args.seed).shuffle(examples)
+            split = int(len(examples) * (1 - args.holdout_fraction))
+            examples, heldout = examples[:split], examples[split:]
+
+        start = time.perf_counter()
+        classifier = RagNeedClassifier.train(examples, dimensions=args.dimensions, epochs=args.epochs,
+                                             threshold=args.threshold)
+        print(f"trained on {len(examples)} turns in {time.perf_counter() - start:.1f} s")
+        classifier.save(args.out)
+
+        start = time.perf_counter()
+        RagNeedClassifier.load(args.out)
+        print(f"saved {args.out} (loads in {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    report(classifier, heldout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 2 ** 18
+
+
+def hash_features(user_input: str, current_state: str, dimensions: int = DEFAULT_DIMENSIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed n-gram features of a turn as (indices, values), L2-normalised.
+
+    Word unigrams and bigrams, character trigrams, the conversation state and the
+    state crossed with each word. crc32 keeps the hashes stable across processes,
+    unlike hash().
+    """
+    words = re.findall(r"[a-z0-9]+", user_input.lower())
+    text = f" {' '.join(words)} "
+    tokens = [f"w:{word}" for word in words]
+    tokens += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    tokens += [f"c:{text[i:i + 3]}" for i in range(len(text) - 2)]
+    tokens += [f"s:{current_state}"] + [f"sw:{current_state}:{word}" for word in words]
+
+    counts: Dict[int, float] = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode()) % dimensions
+        counts[index] = counts.get(index, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+    values /= np.sqrt(np.dot(values, values)) or 1.0
+    return indices, values
+
+
+class RagNeedClassifier:
+    """Logistic regression over hashed n-grams that predicts the LLM's RAG-need verdict.
+
+    Trained offline from the verdict log (see RagClassifierTraining). `decide` only
+    answers when the predicted probability is at least `threshold` away from a coin flip
+    in either direction; otherwise the caller asks the LLM.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, threshold: float = 0.9):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self.decided = 0
+        self.deferred = 0
+
+    @property
+    def dimensions(self) -> int:
+        return len(self.weights)
+
+    def predict_proba(self, user_input: str, current_state: str) -> float:
+        indices, values = hash_features(user_input, current_state, self.dimensions)
+        score = float(np.dot(self.weights[indices], values)) + self.bias
+        return 1.0 / (1.0 + np.exp(-score))
+
+    def decide(self, user_input: str, current_state: str) -> Optional[bool]:
+        """The RAG-need verdict if the model is confident enough, else None."""
+        probability = self.predict_proba(user_input, current_state)
+        if max(probability, 1.0 - probability) < self.threshold:
+            self.deferred += 1
+            return None
+        self.decided += 1
+        return probability >= 0.5
+
+    @classmethod
+    def train(cls, examples: List[Tuple[str, str, bool]], dimensions: int = DEFAULT_DIMENSIONS,
+              epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4,
+              threshold: float = 0.9) -> "RagNeedClassifier":
+        """Full-batch gradient descent on (user_input, current_state, needs_rag) examples."""
+        rows, cols, vals = [], [], []
+        for row, (user_input, current_state, _) in enumerate(examples):
+            indices, values = hash_features(user_input, current_state, dimensions)
+            rows.append(np.full(len(indices), row))
+            cols.append(indices)
+            vals.append(values)
+        rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        labels = np.array([needs_rag for _, _, needs_rag in examples], dtype=np.float64)
+        count = len(examples)
+
+        weights = np.zeros(dimensions)
+        bias = 0.0
+        for _ in range(epochs):
+            scores = np.bincount(rows, weights=vals * weights[cols], minlength=count) + bias
+            errors = 1.0 / (1.0 + np.exp(-scores)) - labels
+            gradient = np.bincount(cols, weights=vals * errors[rows], minlength=dimensions) / count
+            weights -= learning_rate * (gradient + l2 * weights)
+            bias -= learning_rate * float(errors.mean())
+        return cls(weights, bias, threshold)
+
+    def save(self, path: str) -> None:
+        # float32 halves the file and load time; the precision loss does not move predictions
+        np.savez(path, weights=self.weights.astype(np.float32), bias=np.float64(self.bias),
+                 threshold=np.float64(self.threshold))
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "RagNeedClassifier":
+        with np.load(path) as model:
+            saved_threshold = float(model["threshold"])
+            return cls(model["weights"].astype(np.float64), float(model["bias"]),
+                       threshold if threshold is not None else saved_threshold)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.decided + self.deferred
+        return {
+            "decided": self.decided,
+            "deferred_to_llm": self.deferred,
+            "rate": round(self.decided / total, 3) if total else 0.0,
+        }
+
+
+class RagVerdictLog:
+    """Appends the LLM's RAG-need verdicts to a JSONL file as training data."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def record(self, user_input: str, current_state: str, needs_rag: bool) -> None:
+        if not self.path:
+            return
+        entry = {"user_input": user_input, "current_state": current_state, "needs_rag": needs_rag,
+                 "logged_at": time.time()}
+        with open(self.path, "a", encoding="utf-8") as log:
+            log.write(json.dumps(entry) + "\n")
+
+    @staticmethod
+    def read(path: str) -> Iterable[Tuple[str, str, bool]]:
+        with open(path, encoding="utf-8") as log:
+            for line in log:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["user_input"], entry.get("current_state", ""), bool(entry["needs_rag"])
+
+
+def _load_configured_classifier() -> Optional[RagNeedClassifier]:
+    path = os.getenv("PANDA_RAG_CLASSIFIER")
+    if not path:
+        return None
+    threshold = os.getenv("PANDA_RAG_CLASSIFIER_THRESHOLD")
+    try:
+        return RagNeedClassifier.load(path, float(threshold) if threshold else None)
+    except OSError as e:
+        print(f"RAG classifier not loaded, using the LLM: {e}")
+        return None
+
+
+rag_need_classifier = _load_configured_classifier()
+rag_verdict_log = RagVerdictLog(os.getenv("PANDA_RAG_VERDICT_LOG"))
@@ -1,22 +1,42 @@
-from typing import Dict, Any
+import json
+from typing import Dict, Any, Literal, Optional
 
 from semantic_kernel import Kernel
-from semantic_kernel.functions import KernelArguments
+from semantic_kernel.functions import FunctionResult, KernelArguments
 from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
 
 from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+
+# The retrieval a turn needs, as the combined turn classifier decides it
+RagType = Literal["none", "lookup", "career"]
+
+# What the search query is built around, per retrieval type
+SEARCH_FOCUS: Dict[str, str] = {
+    "lookup": "UNC data lookup: major/degree requirements, course details and policies, departments, offices",
+    "career": "Career pathways: the student's career goal and the majors, courses and resources leading to it",
+}
 
 
 class SearchQuery:
 
-    def __init__(self, kernel: Kernel, state: ConversationContext):
-        self.state = state
+    def __init__(self, kernel: Kernel):
         self.kernel = kernel
         self._setup_search_function()
 
 
     def _setup_search_function(self):
-        search_query_prompt = PromptTemplateConfig(
+        prompt_registry.get_or_add(
+            self.kernel,
+            plugin_name="SearchQuery",
+            function_name="generate_search_query",
+            prompt_template_config=self._search_query_prompt,
+        )
+
+    @staticmethod
+    def _search_query_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
             template="""
             You are an AI assistant that generates specialized search queries for UNC-related topics. 
             Your task is to create the most relevant search query based on the conversation history and current user input.
@@ -41,6 +61,7 @@ class SearchQuery:
             For career paths: "UNC [major] [career] pathways courses"
             For specific courses: "UNC [course code] description prerequisites"
             For general questions: "UNC [topic] information resources"
+            If a search focus is given, build the query for it: {{$search_focus}}
             
             ## Context From Conversation Artifact ##
             (Use this information for ambiguous queries)
@@ -55,25 +76,32 @@ class SearchQuery:
                 InputVariable(name="user_input", description="User input", is_required=True),
                 InputVariable(name="chat_history", description="Chat history", is_required=True),
                 InputVariable(name="state", description="State", is_required=True),
+                InputVariable(name="search_focus", description="Kind of retrieval the turn needs", is_required=False),
             ]
         )
-        self.kernel.add_function(
-            plugin_name="SearchQuery",
-            function_name="generate_search_query",
-            prompt_template_config=search_query_prompt,
-        )
 
-    async def generate_search_query(self, user_input: str) -> str:
-        response = await self.kernel.invoke(
+    async def generate_search_query(self, user_input: str, state: ConversationContext,
+                                    rag_type: Optional[RagType] = None) -> str:
+        response = await self.invoke_search_query(user_input=user_input, state=state, rag_type=rag_type)
+        if response is None:
+            raise Exception("Failed to generate search query")
+        print(f"search query {str(response)}")
+        return str(response)
+
+    async def invoke_search_query(self, user_input: str, state: ConversationContext,
+                                  rag_type: Optional[RagType] = None) -> FunctionResult | None:
+        """The raw function result, for callers that account for its token usage.
+
+        rag_type, when the classifier gave one, focuses the query on a lookup or on career pathways.
+        """
+        return await self.kernel.invoke(
             plugin_name="SearchQuery",
             function_name="generate_search_query",
             arguments=KernelArguments(
                 user_input=user_input,
-                chat_history=self.state.to_chat_history(),
-                state=str(self.state.model_dump_json()),
+                chat_history=state.to_chat_history(history_budget("search_query"), query=user_input),
+                # The artifact only; the conversation itself is already in chat_history
+                state=json.dumps(state.artifact.extracted_fields()),
+                search_focus=SEARCH_FOCUS.get(rag_type, ""),
             )
         )
-        if response is None:
-            raise Exception("Failed to generate search query")
-        print(f"search query {str(response)}")
-        return str(response)
\ No newline at end of file
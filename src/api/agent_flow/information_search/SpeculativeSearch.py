@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from semantic_kernel.functions import FunctionResult
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.TokenBudget import estimate_tokens, history_budget, result_tokens
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.information_search.SearchQueryProcess import SearchQuery
+
+
+class SpeculationStats:
+    """How often speculative searches were used, the tokens spent on discarded ones, and the
+    latency the used ones saved, for /metrics."""
+
+    def __init__(self):
+        self.started = 0
+        self.used = 0
+        self.discarded = 0
+        self.failed = 0
+        self.tokens_total = 0
+        self.tokens_wasted = 0
+        self.seconds_saved = 0.0
+
+    def record_used(self, tokens: int, seconds_saved: float) -> None:
+        self.used += 1
+        self.tokens_total += tokens
+        self.seconds_saved += seconds_saved
+
+    def record_discarded(self, tokens: int, failed: bool = False) -> None:
+        self.discarded += 1
+        self.failed += int(failed)
+        self.tokens_total += tokens
+        self.tokens_wasted += tokens
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "used": self.used,
+            "discarded": self.discarded,
+            "failed": self.failed,
+            "tokens_total": self.tokens_total,
+            "tokens_wasted": self.tokens_wasted,
+            "wasted_token_rate": round(self.tokens_wasted / self.tokens_total, 3) if self.tokens_total else 0.0,
+            "avg_latency_saved_ms": round(self.seconds_saved / self.used * 1000, 1) if self.used else 0.0,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class SpeculativeSearch:
+    """Search query generation, and optionally retrieval, started alongside a turn's classification.
+
+    The response step calls use() once the turn turns out to need retrieval; otherwise the turn
+    calls discard(), which cancels whatever is still running.
+    """
+
+    def __init__(self, search_query: SearchQuery, user_input: str, state: ConversationContext,
+                 retrieve: Optional[Callable[[str], Awaitable[FunctionResult]]] = None):
+        self.search_query = search_query
+        self.user_input = user_input
+        self.state = state
+        self.retrieve = retrieve
+        self.query_result: Optional[FunctionResult] = None
+        self.search_results: Optional[FunctionResult] = None
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._settled = False
+        self.task = asyncio.create_task(self._run())
+        speculation_stats.started += 1
+
+    async def _run(self) -> None:
+        with turn_span("speculative_search"):
+            self.query_result = await self.search_query.invoke_search_query(
+                user_input=self.user_input, state=self.state)
+            if self.query_result is None:
+                raise Exception("Failed to generate search query")
+            print(f"speculative search query {str(self.query_result)}")
+            if self.retrieve is not None:
+                self.search_results = await self.retrieve(str(self.query_result))
+        self.finished = time.perf_counter()
+
+    def tokens(self) -> int:
+        """Tokens spent so far; a call cancelled in flight counts its estimated prompt."""
+        if self.query_result is None:
+            return estimate_tokens(self.user_input) + history_budget("search_query")
+        tokens = result_tokens(self.query_result)
+        if self.retrieve is not None:
+            tokens += result_tokens(self.search_results) if self.search_results is not None \
+                else estimate_tokens(str(self.query_result))
+        return tokens
+
+    async def use(self) -> Tuple[str, Optional[FunctionResult]]:
+        """The search query and, if retrieval was speculated too, its results.
+
+        Raises if the speculative calls failed; the caller then runs them itself.
+        """
+        waiting_since = time.perf_counter()
+        try:
+            await self.task
+        except Exception:
+            self._settle_discarded(failed=True)
+            raise
+        self._settled = True
+        # Without speculation the whole run would have started only now
+        waited = time.perf_counter() - waiting_since
+        speculation_stats.record_used(self.tokens(), (self.finished - self.started) - waited)
+        return str(self.query_result), self.search_results
+
+    def discard(self) -> None:
+        """Cancel the speculation if it is still running and count its tokens as wasted."""
+        if self._settled:
+            return
+        if not self.task.done():
+            self.task.cancel()
+        self._settle_discarded(failed=False)
+
+    def _settle_discarded(self, failed: bool) -> None:
+        self._settled = True
+        speculation_stats.record_discarded(self.tokens(), failed=failed)
+        # Consume the outcome so a failure nobody awaited is not reported as unhandled
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
@@ -0,0 +1,34 @@
+from typing import Any, Dict
+
+from semantic_kernel import Kernel
+from semantic_kernel.functions import kernel_function
+from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelProcessStepState, KernelProcessStepContext
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+
+
+class ClassificationJoinStep(KernelProcessStep[ConversationContext]):
+    kernel: Kernel | None = None
+    state: ConversationContext | None = None
+
+    def __init__(self):
+        super().__init__()
+
+    async def activate(self, state: KernelProcessStepState[ConversationContext]):
+        pass
+
+    @kernel_function(name="join_classification")
+    async def join_classification(self, context: KernelProcessStepContext, intent_data: Dict[str, Any],
+                                  rag_data: Dict[str, Any]):
+        """
+        Waits for both the state transition and the RAG evaluation of the turn (the process
+        runtime only invokes a step function once all of its parameters have arrived), then
+        hands the combined result to the response step.
+        """
+        data = {
+            "state": intent_data.get("state", self.state.artifact.current_state),
+            "user_input": intent_data.get("user_input", rag_data.get("user_input", "")),
+            "needs_rag": rag_data.get("needs_rag", False),
+        }
+        await context.emit_event(process_event="ClassificationJoined", data=data)
+        return data
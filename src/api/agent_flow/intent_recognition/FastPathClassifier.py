@@ -0,0 +1,72 @@
+import os
+import re
+from typing import Any, Dict, Optional
+
+INTENTS = ("initial", "degree_planning", "course_question", "general_qa")
+
+# Whole-message patterns, matched against the lower-cased message with punctuation removed
+TRIVIAL_PATTERNS = {
+    "greeting": re.compile(r"(hi+|hey+|hello+|howdy|yo|good (morning|afternoon|evening))( there| again)?"),
+    # Only thanks closes a turn: a bare "ok" or "great" may accept the assistant's offer to look
+    # something up or change the plan, so it goes to the LLM
+    "thanks": re.compile(
+        r"((ok(ay)?|alright|cool|great|nice|awesome|perfect|got it|sounds good|that helps)( then)? ?)?"
+        r"(thanks?|thank you|thx|ty)( (so|very) much| a lot)?"
+    ),
+    "farewell": re.compile(r"((ok(ay)?|thanks?|thank you) ?)?(bye|goodbye|see (you|ya)( later)?|exit|quit|thats all)"),
+}
+
+
+class FastPathClassifier:
+    """Decides trivial turns (greetings, thanks, goodbyes) without an LLM call.
+
+    Runs at the start of the intent, RAG-need and combined classification steps. A trivial
+    message keeps the conversation in its current state and never needs retrieval; anything
+    else returns None and the step falls through to its LLM prompt.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.checked: Dict[str, int] = {}
+        self.short_circuited: Dict[str, int] = {}
+
+    @staticmethod
+    def match(user_input: str) -> Optional[str]:
+        """Kind of trivial message, or None."""
+        text = re.sub(r"[^a-z ]", "", user_input.lower().replace("'", ""))
+        text = " ".join(text.split())
+        if not text:
+            return None
+        for kind, pattern in TRIVIAL_PATTERNS.items():
+            if pattern.fullmatch(text):
+                return kind
+        return None
+
+    def classify(self, stage: str, user_input: str, current_state: str) -> Optional[Dict[str, Any]]:
+        """Intent and retrieval need for a trivial message, or None to ask the LLM."""
+        self.checked[stage] = self.checked.get(stage, 0) + 1
+        kind = self.match(user_input) if self.enabled else None
+        if kind is None:
+            return None
+
+        self.short_circuited[stage] = self.short_circuited.get(stage, 0) + 1
+        return {
+            "intent": current_state if current_state in INTENTS else "general_qa",
+            "confidence": 1.0,
+            "needs_rag": False,
+            "rag_type": "none",
+            "reason": f"fast path: {kind}",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            stage: {
+                "checked": checked,
+                "short_circuited": self.short_circuited.get(stage, 0),
+                "rate": round(self.short_circuited.get(stage, 0) / checked, 3) if checked else 0.0,
+            }
+            for stage, checked in self.checked.items()
+        }
+
+
+fast_path_classifier = FastPathClassifier(enabled=os.getenv("PANDA_FAST_PATH", "true").lower() == "true")
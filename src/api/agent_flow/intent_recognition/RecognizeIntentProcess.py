@@ -1,11 +1,24 @@
-import json
 import logging
+from pydantic import BaseModel
 from semantic_kernel import Kernel
 from semantic_kernel.functions import kernel_function, KernelArguments
 from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelProcessStepState, KernelProcessStepContext
 from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
 
 from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.intent_recognition.FastPathClassifier import fast_path_classifier
+from src.api.agent_flow.llm_services.StructuredOutput import StructuredOutputError, parse_structured
+
+
+class IntentRecognition(BaseModel):
+    """The intent recognizer's answer."""
+    intent: str
+    confidence: float = 0.6
+    reason: str = ""
+
 
 class IntentRecognitionStep(KernelProcessStep[ConversationContext]):
     kernel: Kernel | None = None
@@ -19,8 +32,19 @@ class IntentRecognitionStep(KernelProcessStep[ConversationContext]):
         self._setup_intent_recognition()
 
     def _setup_intent_recognition(self):
-        """Sets up the AI function for intent recognition."""
-        intent_recognition_prompt = PromptTemplateConfig(
+        """Sets up the AI function for intent recognition (registered once per kernel)."""
+        if self.kernel:
+            prompt_registry.get_or_add(
+                self.kernel,
+                plugin_name="IntentRecognizer",
+                function_name="intent_recognition",
+                prompt_template_config=self._intent_recognition_prompt,
+                output_model=IntentRecognition,
+            )
+
+    @staticmethod
+    def _intent_recognition_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
             template="""
             You are an AI assistant that analyzes user messages to determine their primary intent.
             Based on the following message and chat history to use as context (use chat history to 
@@ -56,43 +80,55 @@ class IntentRecognitionStep(KernelProcessStep[ConversationContext]):
                 InputVariable(name="chat_history", description="The chat history", is_required=True),
             ]
         )
-        if self.kernel:
-            self.kernel.add_function(
-                plugin_name="IntentRecognizer",
-                function_name="intent_recognition",
-                prompt_template_config=intent_recognition_prompt,
-            )
 
     @kernel_function(name="recognize_intent")
     async def recognize_intent(self, context: KernelProcessStepContext, user_input: str):
         """Recognizes the user's intent based on the input message and chat history."""
+        fast_path = fast_path_classifier.classify("intent_recognition", user_input,
+                                                  self.state.artifact.current_state)
+        if fast_path is not None:
+            data_result = {
+                "intent": fast_path["intent"],
+                "confidence": fast_path["confidence"],
+                "user_input": user_input,
+            }
+            print(fast_path["reason"])
+            await context.emit_event(process_event="IntentRecognized", data=data_result)
+            return data_result
+
         if self.kernel:
-            result = await self.kernel.invoke(
-                plugin_name="IntentRecognizer",
-                function_name="intent_recognition",
-                arguments=KernelArguments(
-                    user_input=user_input,
-                    chat_history=self.state.to_chat_history().messages,
+            with turn_span("intent_recognition"):
+                result = await self.kernel.invoke(
+                    plugin_name="IntentRecognizer",
+                    function_name="intent_recognition",
+                    arguments=KernelArguments(
+                        user_input=user_input,
+                        chat_history=self.state.to_chat_history(history_budget("intent_recognition")).messages,
+                    )
                 )
-            )
         else:
             raise ValueError("Kernel is not initialized.")
 
-        response_text = json.loads(str(result))
+        try:
+            recognition = await parse_structured(self.kernel, result, IntentRecognition)
+        except StructuredOutputError as e:
+            # Answer as general_qa rather than failing the turn
+            print(e)
+            recognition = IntentRecognition(intent="unknown")
 
-        match response_text["intent"]:
+        match recognition.intent:
             case "initial":
                 intent = "initial"
-                confidence = response_text["confidence"]
+                confidence = recognition.confidence
             case "degree_planning":
                 intent = "degree_planning"
-                confidence = response_text["confidence"]
+                confidence = recognition.confidence
             case "course_question":
                 intent = "course_question"
-                confidence = response_text["confidence"]
+                confidence = recognition.confidence
             case "general_qa":
                 intent = "general_qa"
-                confidence = response_text["confidence"]
+                confidence = recognition.confidence
             case _:
                 intent = "general_qa"
                 confidence = 0.6
@@ -103,7 +139,7 @@ class IntentRecognitionStep(KernelProcessStep[ConversationContext]):
             "user_input": user_input,
         }
         print(data_result["user_input"])
-        print(response_text["reason"])
+        print(recognition.reason)
 
         await context.emit_event(process_event="IntentRecognized", data=data_result)
 
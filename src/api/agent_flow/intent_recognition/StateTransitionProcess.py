@@ -27,6 +27,8 @@ class StateTransitionProcess(KernelProcessStep[ConversationContext]):
         intent = data.get("intent", "unknown")
         confidence = data.get("confidence", 0.0)
         user_input = data.get("user_input", "No user input provided. Abort transition.")
+        # The combined classifier already decided the retrieval need; pass it on to ResponseStep
+        rag_decision = {key: data[key] for key in ("needs_rag", "rag_type") if key in data}
 
         self.state.last_intent = intent
 
@@ -34,7 +36,8 @@ class StateTransitionProcess(KernelProcessStep[ConversationContext]):
             # Stay in current state if confidence is low
             await context.emit_event(process_event="StateUnchanged", data={
                 "state": self.state.artifact.current_state,
-                "user_input": user_input
+                "user_input": user_input,
+                **rag_decision,
             })
             return
 
@@ -43,27 +46,31 @@ class StateTransitionProcess(KernelProcessStep[ConversationContext]):
             self.state.artifact.current_state = "degree_planning"
             await context.emit_event(process_event="StateChanged", data={
                 "state": "degree_planning",
-                "user_input": user_input
+                "user_input": user_input,
+                **rag_decision,
             })
 
         elif intent == "course_question" and self.state.artifact.current_state != "course_question":
             self.state.artifact.current_state = "course_question"
             await context.emit_event(process_event="StateChanged", data={
                 "state": "course_question",
-                "user_input": user_input
+                "user_input": user_input,
+                **rag_decision,
             })
 
         elif intent == "general_qa" and self.state.artifact.current_state != "general_qa":
             self.state.artifact.current_state = "general_qa"
             await context.emit_event(process_event="StateChanged", data={
                 "state": "general_qa",
-                "user_input": user_input
+                "user_input": user_input,
+                **rag_decision,
             })
         else:
             # State didn't change, but we still need to pass along the user input
             await context.emit_event(process_event="StateUnchanged", data={
                 "state": self.state.artifact.current_state,
-                "user_input": user_input
+                "user_input": user_input,
+                **rag_decision,
             })
 
 
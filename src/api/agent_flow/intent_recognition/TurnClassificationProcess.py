@@ -0,0 +1,162 @@
+from typing import Any, Dict
+
+from pydantic import BaseModel
+from semantic_kernel import Kernel
+from semantic_kernel.functions import kernel_function, KernelArguments
+from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelProcessStepState, KernelProcessStepContext
+from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.information_search.SearchQueryProcess import RagType
+from src.api.agent_flow.intent_recognition.FastPathClassifier import INTENTS, fast_path_classifier
+from src.api.agent_flow.llm_services.StructuredOutput import StructuredOutputError, parse_structured
+
+
+class TurnClassification(BaseModel):
+    """The turn classifier's answer."""
+    intent: str
+    confidence: float = 0.6
+    rag_type: RagType = "none"
+    reason: str = ""
+
+    @property
+    def needs_rag(self) -> bool:
+        return self.rag_type != "none"
+
+
+class TurnClassificationStep(KernelProcessStep[ConversationContext]):
+    """Classifies intent and retrieval need in one LLM call.
+
+    Replaces IntentRecognitionStep + InformationRetrievalEvaluationStep in the "combined"
+    pipeline mode. Emits IntentRecognized with needs_rag and rag_type included, which
+    StateTransitionProcess passes through to ResponseStep.
+    """
+    kernel: Kernel | None = None
+    state: ConversationContext | None = None
+
+    def __init__(self):
+        super().__init__()
+
+    async def activate(self, state: KernelProcessStepState[ConversationContext]):
+        self._setup_turn_classification()
+
+    def _setup_turn_classification(self):
+        if self.kernel:
+            prompt_registry.get_or_add(
+                self.kernel,
+                plugin_name="TurnClassifier",
+                function_name="classify_turn",
+                prompt_template_config=self._turn_classification_prompt,
+                output_model=TurnClassification,
+            )
+
+    @staticmethod
+    def _turn_classification_prompt() -> PromptTemplateConfig:
+        return PromptTemplateConfig(
+            template="""
+            You are an AI assistant for a UNC academic advising system. For the latest user message, decide
+            both the user's primary intent and whether a UNC data lookup or career research retrieval is needed.
+            Use the chat history only to understand whether the message continues an ongoing flow.
+
+            ## Intent categories
+            - initial: User is starting a new conversation or greeting ("hello", "hi", "help", "start").
+            - degree_planning: User wants to discuss degree planning, academic paths, etc.
+            - course_question: Class scheduling, course selection, enrollment, or specific courses.
+              Anything assignment related is general_qa, never course_question.
+            - general_qa: General university questions, policies, the user's own account data (tasks,
+              degree planners, class schedules), or requirements of a specific degree outside degree planning.
+
+            ## Retrieval need (evaluate the latest message only, never carry over earlier lookups)
+            - "lookup": UNC-specific data is requested: major/degree requirements, course details and
+              policies, departments, UNC offices or services.
+              e.g. "What are the CS major requirements?", "Tell me about the Biology degree"
+            - "career": Career goals or professional pathways in the context of a degree, industry trends
+              for a major, or any specific career goal.
+              e.g. "I want to go into software engineering", "What jobs can I get with a CS degree?"
+            - "none": Greetings, acknowledgements ("ok thanks"), exploring general interests ("I like coding"),
+              stating an intent ("I want a CS BS"), or general questions not tied to UNC data
+              ("What is computer science?", "How many courses should I take per semester?").
+
+            User message: {{$user_input}}
+
+            Chat history: {{$chat_history}}
+
+            Current state: {{$current_state}}
+
+            Respond ONLY with a JSON object in this format:
+            {
+                "intent": "one of the intent categories above",
+                "confidence": a number between 0 and 1 representing your confidence in the intent,
+                "rag_type": "none", "lookup" or "career",
+                "reason": Restate the user's message
+            }
+            """,
+            name="classify_turn",
+            template_format="semantic-kernel",
+            input_variables=[
+                InputVariable(name="user_input", description="The user input", is_required=True),
+                InputVariable(name="chat_history", description="The chat history", is_required=True),
+                InputVariable(name="current_state", description="The current state", is_required=True),
+            ]
+        )
+
+    @kernel_function(name="classify_turn")
+    async def classify_turn(self, context: KernelProcessStepContext, user_input: str):
+        """Recognizes intent and retrieval need for the user's message in a single call."""
+        fast_path = fast_path_classifier.classify("turn_classification", user_input,
+                                                  self.state.artifact.current_state)
+        if fast_path is not None:
+            data_result = {
+                "intent": fast_path["intent"],
+                "confidence": fast_path["confidence"],
+                "user_input": user_input,
+                "needs_rag": fast_path["needs_rag"],
+                "rag_type": fast_path["rag_type"],
+            }
+            print(fast_path["reason"])
+            await context.emit_event(process_event="IntentRecognized", data=data_result)
+            return data_result
+
+        if self.kernel:
+            with turn_span("turn_classification"):
+                result = await self.kernel.invoke(
+                    plugin_name="TurnClassifier",
+                    function_name="classify_turn",
+                    arguments=KernelArguments(
+                        user_input=user_input,
+                        chat_history=self.state.to_chat_history(history_budget("turn_classification")).messages,
+                        current_state=self.state.artifact.current_state,
+                    )
+                )
+        else:
+            raise ValueError("Kernel is not initialized.")
+
+        try:
+            classification = await parse_structured(self.kernel, result, TurnClassification)
+        except StructuredOutputError as e:
+            # Answer as general_qa without retrieval rather than failing the turn
+            print(e)
+            classification = TurnClassification(intent="unknown")
+
+        intent = classification.intent
+        confidence = classification.confidence
+        if intent not in INTENTS:
+            intent = "general_qa"
+            confidence = 0.6
+
+        data_result: Dict[str, Any] = {
+            "intent": intent,
+            "confidence": confidence,
+            "user_input": user_input,
+            "needs_rag": classification.needs_rag,
+            "rag_type": classification.rag_type,
+        }
+        print(data_result["user_input"])
+        print(classification.reason)
+
+        await context.emit_event(process_event="IntentRecognized", data=data_result)
+
+        return data_result
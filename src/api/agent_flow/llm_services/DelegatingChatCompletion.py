@@ -0,0 +1,34 @@
+from abc import abstractmethod
+from typing import Callable, ClassVar
+
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+
+
+class DelegatingChatCompletion(ChatCompletionClientBase):
+    """Base for chat services that send each model call on to other chat services.
+
+    Subclasses implement `_inner_get_chat_message_contents` and
+    `_inner_get_streaming_chat_message_contents` over the wrapped services' own. The inherited
+    public methods run Semantic Kernel's auto function calling loop on the wrapper, so every
+    round-trip of a tool-calling exchange goes through the subclass on its own, and the tools
+    run once, between round-trips. Settings are handled as the wrapped service handles them.
+    """
+    SUPPORTS_FUNCTION_CALLING: ClassVar[bool] = True
+
+    @property
+    @abstractmethod
+    def delegate(self) -> ChatCompletionClientBase:
+        """A wrapped service, for its settings class and function calling settings."""
+
+    def get_prompt_execution_settings_class(self) -> type[PromptExecutionSettings]:
+        return self.delegate.get_prompt_execution_settings_class()
+
+    def _verify_function_choice_settings(self, settings: PromptExecutionSettings) -> None:
+        self.delegate._verify_function_choice_settings(settings)
+
+    def _update_function_choice_settings_callback(self) -> Callable:
+        return self.delegate._update_function_choice_settings_callback()
+
+    def _reset_function_choice_settings(self, settings: PromptExecutionSettings) -> None:
+        self.delegate._reset_function_choice_settings(settings)
@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+class LlmPriority(IntEnum):
+    """Order in which queued LLM requests are admitted; lower goes first."""
+    # The answer the student is waiting for
+    RESPONSE = 0
+    # Classification, search queries and other calls on the turn's critical path
+    INTERACTIVE = 1
+    # Work the student does not wait for, e.g. artifact validation and history summaries
+    BACKGROUND = 2
+
+
+_active_priority: ContextVar[LlmPriority] = ContextVar("active_llm_priority", default=LlmPriority.INTERACTIVE)
+
+
+@contextmanager
+def use_llm_priority(priority: LlmPriority) -> Iterator[LlmPriority]:
+    """Schedule the LLM requests made in this scope (and tasks started from it) at `priority`."""
+    token = _active_priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _active_priority.reset(token)
+
+
+def current_llm_priority() -> LlmPriority:
+    return _active_priority.get()
+
+
+class LlmTicket:
+    """A request waiting for, or holding, one of the scheduler's slots."""
+
+    def __init__(self, priority: LlmPriority, sequence: int, tokens: int, admitted: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.admitted = admitted
+        self.enqueued = time.perf_counter()
+        # [admission time, tokens] in the scheduler's one-minute window
+        self.usage: Optional[List[float]] = None
+
+    def __lt__(self, other: "LlmTicket") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class LlmScheduler:
+    """Admits LLM requests under a concurrency cap and a tokens-per-minute budget.
+
+    Requests queue by priority, first come first served within a priority, and only the head of
+    the queue is admitted so a large request is not starved by smaller ones behind it. Tokens
+    are estimated before sending and corrected with the reported usage afterwards. A 429 from
+    the service pauses all admissions for the time the service asked for.
+    """
+
+    def __init__(self, max_concurrency: int = 8, tokens_per_minute: int = 0, max_retries: int = 2):
+        self.max_concurrency = max_concurrency
+        # 0 disables the token budget
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self._queue: List[LlmTicket] = []
+        self._sequence = itertools.count()
+        self._window: Deque[List[float]] = deque()
+        self._window_tokens = 0
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self.admitted: Dict[str, int] = {}
+        self.wait_seconds: Dict[str, float] = {}
+        self.max_wait_seconds: Dict[str, float] = {}
+        self.rate_limited = 0
+        self.retries = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for ticket in self._queue if not ticket.admitted.done())
+
+    async def acquire(self, tokens: int, priority: Optional[LlmPriority] = None,
+                      sequence: Optional[int] = None) -> LlmTicket:
+        """Wait for a slot. `sequence` keeps a retried request's place in the queue."""
+        ticket = LlmTicket(priority if priority is not None else current_llm_priority(),
+                           next(self._sequence) if sequence is None else sequence,
+                           tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, ticket)
+        self._dispatch()
+        try:
+            await ticket.admitted
+        except asyncio.CancelledError:
+            # Admitted just as the caller was cancelled; give the slot back
+            if ticket.admitted.done() and not ticket.admitted.cancelled():
+                self.release(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: LlmTicket, used_tokens: Optional[int] = None) -> None:
+        """Free the ticket's slot, replacing its estimate with the tokens actually used if known."""
+        self.in_flight -= 1
+        if used_tokens is not None and ticket.usage is not None:
+            self._window_tokens += used_tokens - int(ticket.usage[1])
+            ticket.usage[1] = used_tokens
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Stop admitting requests for `seconds`, e.g. after the service answered 429."""
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, time.perf_counter() + seconds)
+        self._schedule_wakeup(seconds)
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            head = self._queue[0]
+            if head.admitted.done():  # cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return
+            delay = self._admission_delay(head.tokens)
+            if delay > 0:
+                self._schedule_wakeup(delay)
+                return
+            heapq.heappop(self._queue)
+            self._admit(head)
+
+    def _admit(self, ticket: LlmTicket) -> None:
+        now = time.perf_counter()
+        self.in_flight += 1
+        ticket.usage = [now, ticket.tokens]
+        self._window.append(ticket.usage)
+        self._window_tokens += ticket.tokens
+
+        name = ticket.priority.name.lower()
+        waited = now - ticket.enqueued
+        self.admitted[name] = self.admitted.get(name, 0) + 1
+        self.wait_seconds[name] = self.wait_seconds.get(name, 0.0) + waited
+        self.max_wait_seconds[name] = max(self.max_wait_seconds.get(name, 0.0), waited)
+        ticket.admitted.set_result(None)
+
+    def _admission_delay(self, tokens: int) -> float:
+        """Seconds until a request of `tokens` fits the pause and the one-minute token budget."""
+        now = time.perf_counter()
+        if self._paused_until > now:
+            return self._paused_until - now
+        while self._window and self._window[0][0] <= now - 60:
+            self._window_tokens -= int(self._window.popleft()[1])
+        if not self.tokens_per_minute or not self._window:
+            # A request over the whole budget still goes out once the window is empty
+            return 0.0
+        excess = self._window_tokens + tokens - self.tokens_per_minute
+        for admitted_at, used in self._window:
+            if excess <= 0:
+                break
+            excess -= used
+            if excess <= 0:
+                return admitted_at + 60 - now
+        return 0.0 if excess <= 0 else self._window[-1][0] + 60 - now
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            if self._wakeup.when() <= asyncio.get_running_loop().time() + delay:
+                return
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "tokens_last_minute": self._window_tokens,
+            "tokens_per_minute": self.tokens_per_minute,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "admitted": dict(self.admitted),
+            "avg_wait_ms": {
+                name: round(self.wait_seconds[name] / count * 1000, 1) for name, count in self.admitted.items()
+            },
+            "max_wait_ms": {name: round(seconds * 1000, 1) for name, seconds in self.max_wait_seconds.items()},
+        }
+
+
+# Shared by every manager in the process, since they all draw on the same deployment's limits
+llm_scheduler = LlmScheduler(
+    max_concurrency=int(os.getenv("PANDA_LLM_MAX_CONCURRENCY", "8")),
+    tokens_per_minute=int(os.getenv("PANDA_LLM_TOKENS_PER_MINUTE", "0")),
+    max_retries=int(os.getenv("PANDA_LLM_MAX_RETRIES", "2")),
+)
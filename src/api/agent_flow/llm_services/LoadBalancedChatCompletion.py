@@ -0,0 +1,326 @@
+import asyncio
+import copy
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional, Tuple
+
+import openai
+from pydantic import BaseModel, PrivateAttr
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import ChatHistory, ChatMessageContent, StreamingChatMessageContent
+
+from src.api.agent_flow.chat_flow.TurnTimings import percentile
+from src.api.agent_flow.llm_services.DelegatingChatCompletion import DelegatingChatCompletion
+from src.api.agent_flow.llm_services.ScheduledChatCompletion import error_cause
+
+LATENCY_SAMPLES = 200
+# Latency samples a member needs before its p95 is trusted as a hedging delay
+HEDGE_MIN_SAMPLES = 20
+
+
+class PoolEndpoint(BaseModel):
+    """An Azure OpenAI resource in the pool; every route's deployment must exist on each one.
+
+    Without a key of its own it uses the manager's key.
+    """
+    name: str
+    endpoint: str
+    api_key: Optional[str] = None
+    # Name of the environment variable holding the key, so the pool file can be checked in
+    api_key_env: Optional[str] = None
+
+    def key(self) -> Optional[str]:
+        return self.api_key or (os.getenv(self.api_key_env) if self.api_key_env else None)
+
+
+def load_pool(path: str) -> List[PoolEndpoint]:
+    with open(path, encoding="utf-8") as file:
+        return [PoolEndpoint.model_validate(endpoint) for endpoint in json.load(file)]
+
+
+class PoolMember:
+    """One deployment in a LoadBalancedChatCompletion pool, with its observed health."""
+
+    def __init__(self, name: str, service: ChatCompletionClientBase):
+        self.name = name
+        self.service = service
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Time to the complete answer, and to the first chunk of streamed ones
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.first_chunk_latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+
+class LoadBalancedChatCompletion(DelegatingChatCompletion):
+    """Chat service that spreads requests over a pool of equivalent deployments.
+
+    Each model call goes to a member picked at random, weighted by its latency and error rate
+    (exponentially weighted) and its requests in flight. A member failing `eject_after` times
+    in a row is left out for `eject_seconds`, doubling each time it fails again right after
+    coming back. A failed call moves on to another member, unless the request itself was
+    rejected (400). With `hedge` on, a call still unanswered after the member's p95 latency
+    (time to first chunk when streaming) is also sent to a second member and the first answer
+    wins. Balancing is per model call and auto function calling runs on the pool itself, so
+    failing over or hedging a round-trip never runs tools that already ran again.
+    """
+    _members: List[PoolMember] = PrivateAttr()
+    _hedge: bool = PrivateAttr()
+    _hedge_min_delay: float = PrivateAttr()
+    _alpha: float = PrivateAttr()
+    _eject_after: int = PrivateAttr()
+    _eject_seconds: float = PrivateAttr()
+    _max_eject_seconds: float = PrivateAttr()
+    _max_attempts: int = PrivateAttr()
+    _random: random.Random = PrivateAttr()
+
+    def __init__(self, members: Dict[str, ChatCompletionClientBase], service_id: str | None = None,
+                 hedge: bool = False, hedge_min_delay: float = 0.05, alpha: float = 0.2, eject_after: int = 3,
+                 eject_seconds: float = 10.0, max_eject_seconds: float = 300.0, max_attempts: int = 3,
+                 seed: int | None = None):
+        first = next(iter(members.values()))
+        super().__init__(service_id=service_id or first.service_id, ai_model_id=first.ai_model_id)
+        self._members = [PoolMember(name, service) for name, service in members.items()]
+        self._hedge = hedge
+        self._hedge_min_delay = hedge_min_delay
+        self._alpha = alpha
+        self._eject_after = eject_after
+        self._eject_seconds = eject_seconds
+        self._max_eject_seconds = max_eject_seconds
+        self._max_attempts = max_attempts
+        self._random = random.Random(seed)
+
+    @property
+    def members(self) -> List[PoolMember]:
+        return self._members
+
+    @property
+    def delegate(self) -> ChatCompletionClientBase:
+        return self._members[0].service
+
+    # region Member selection and health
+
+    def _weight(self, member: PoolMember, default_latency: float) -> float:
+        # Squared, so a region twice as slow gets a quarter of the traffic rather than half;
+        # requests in flight still spread the load once the fastest one gets busy
+        latency = member.latency_ewma or default_latency
+        return max(1e-6, (1.0 - member.error_ewma) / (latency ** 2 * (1 + member.in_flight)))
+
+    def _choose(self, exclude: List[PoolMember]) -> Optional[PoolMember]:
+        now = time.perf_counter()
+        candidates = [member for member in self._members if member not in exclude]
+        if not candidates:
+            return None
+        healthy = [member for member in candidates if not member.is_ejected(now)]
+        if not healthy:
+            # Everything is ejected; try whichever comes back first rather than failing outright
+            return min(candidates, key=lambda member: member.ejected_until)
+        known = [member.latency_ewma for member in healthy if member.latency_ewma is not None]
+        # Members without samples yet are treated as average, so they are tried
+        default_latency = sum(known) / len(known) if known else 1.0
+        return self._random.choices(healthy, [self._weight(member, default_latency) for member in healthy])[0]
+
+    def _record_success(self, member: PoolMember, latency: float, first_chunk: bool = False) -> None:
+        (member.first_chunk_latencies if first_chunk else member.latencies).append(latency)
+        member.latency_ewma = latency if member.latency_ewma is None \
+            else self._alpha * latency + (1 - self._alpha) * member.latency_ewma
+        member.error_ewma *= 1 - self._alpha
+        member.consecutive_failures = 0
+        member.ejections = 0
+
+    def _record_failure(self, member: PoolMember) -> None:
+        member.failures += 1
+        member.error_ewma = self._alpha + (1 - self._alpha) * member.error_ewma
+        member.consecutive_failures += 1
+        if member.consecutive_failures >= self._eject_after:
+            seconds = min(self._max_eject_seconds, self._eject_seconds * 2 ** member.ejections)
+            member.ejected_until = time.perf_counter() + seconds
+            member.ejections += 1
+            # Back on probation: one more failure ejects it again, for longer
+            member.consecutive_failures = self._eject_after - 1
+            print(f"Ejected deployment {member.name} for {seconds:.0f} s")
+
+    @staticmethod
+    def _is_member_fault(error: BaseException) -> bool:
+        """Whether another deployment might answer; a rejected request would be rejected everywhere."""
+        return error_cause(error, openai.BadRequestError) is None
+
+    def _hedge_delay(self, member: PoolMember, streaming: bool) -> Optional[float]:
+        if not self._hedge or len(self._members) < 2:
+            return None
+        samples = member.first_chunk_latencies if streaming else member.latencies
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(self._hedge_min_delay, percentile(list(samples), 0.95))
+
+    # endregion
+
+    async def _race(self, attempt, streaming: bool, discard=None) -> Tuple[PoolMember, Any]:
+        """Run `attempt(member)` on a chosen member, hedging and failing over as configured.
+
+        `discard(member, result)` releases the result of an attempt that also succeeded but
+        lost the race.
+        """
+        tried: List[PoolMember] = []
+        pending: Dict[asyncio.Task, PoolMember] = {}
+        error: Optional[BaseException] = None
+        hedge_member: Optional[PoolMember] = None
+
+        def start() -> Optional[PoolMember]:
+            member = self._choose(tried)
+            if member is None:
+                return None
+            tried.append(member)
+            pending[asyncio.create_task(attempt(member))] = member
+            return member
+
+        first = start()
+        hedge_delay = self._hedge_delay(first, streaming)
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The first member is slower than its p95; ask a second one as well
+                    hedge_delay = None
+                    hedge_member = start()
+                    if hedge_member is not None:
+                        hedge_member.hedges += 1
+                    continue
+                for task in done:
+                    member = pending.pop(task)
+                    if task.exception() is None:
+                        if member is hedge_member:
+                            member.hedge_wins += 1
+                        return member, task.result()
+                    error = task.exception()
+                    if not self._is_member_fault(error):
+                        raise error
+                # Fail over; once hedged, a failed attempt is replaced so two still race
+                if (not pending or hedge_member is not None) and len(tried) < self._max_attempts:
+                    hedge_delay = None
+                    start()
+            raise error
+        finally:
+            for task, member in pending.items():
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(member, task.result())
+
+    async def _inner_get_chat_message_contents(self, chat_history: ChatHistory,
+                                               settings: PromptExecutionSettings) -> List[ChatMessageContent]:
+        async def attempt(member: PoolMember) -> List[ChatMessageContent]:
+            member.requests += 1
+            member.in_flight += 1
+            start = time.perf_counter()
+            try:
+                # A copy each, as the services write the request into the settings they are given
+                contents = await member.service._inner_get_chat_message_contents(chat_history,
+                                                                                  copy.deepcopy(settings))
+            except Exception as e:
+                if self._is_member_fault(e):
+                    self._record_failure(member)
+                raise
+            finally:
+                member.in_flight -= 1
+            self._record_success(member, time.perf_counter() - start)
+            return contents
+
+        _, contents = await self._race(attempt, streaming=False)
+        return contents
+
+    async def _inner_get_streaming_chat_message_contents(
+            self, chat_history: ChatHistory, settings: PromptExecutionSettings, function_invoke_attempt: int = 0,
+    ) -> AsyncGenerator[List[StreamingChatMessageContent], Any]:
+        async def attempt(member: PoolMember):
+            """Open the stream and wait for its first chunk; hedging and failover race on this."""
+            member.requests += 1
+            member.in_flight += 1
+            start = time.perf_counter()
+            stream = member.service._inner_get_streaming_chat_message_contents(
+                chat_history, copy.deepcopy(settings), function_invoke_attempt)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except BaseException as e:
+                member.in_flight -= 1
+                await stream.aclose()
+                if isinstance(e, Exception) and self._is_member_fault(e):
+                    self._record_failure(member)
+                raise
+            self._record_success(member, time.perf_counter() - start, first_chunk=True)
+            return stream, first
+
+        async def discard(member: PoolMember, opened) -> None:
+            member.in_flight -= 1
+            await opened[0].aclose()
+
+        member, (stream, first) = await self._race(attempt, streaming=True, discard=discard)
+        try:
+            if first is None:
+                return
+            yield first
+            async for messages in stream:
+                yield messages
+        except Exception as e:
+            # Output already reached the caller, so there is no failing over now
+            if self._is_member_fault(e):
+                self._record_failure(member)
+            raise
+        finally:
+            member.in_flight -= 1
+            await stream.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        return {
+            member.name: {
+                "requests": member.requests,
+                "failures": member.failures,
+                "in_flight": member.in_flight,
+                "latency_ewma_ms": round(member.latency_ewma * 1000, 1) if member.latency_ewma is not None else None,
+                "p95_latency_ms": round(percentile(list(member.latencies), 0.95) * 1000, 1),
+                "p95_first_chunk_ms": round(percentile(list(member.first_chunk_latencies), 0.95) * 1000, 1),
+                "error_rate": round(member.error_ewma, 3),
+                "ejected_for_s": round(max(0.0, member.ejected_until - now), 1),
+                "hedges": member.hedges,
+                "hedge_wins": member.hedge_wins,
+            }
+            for member in self._members
+        }
+
+
+class LoadBalancerStats:
+    """The pools' member health for /metrics, by the service id they serve."""
+
+    def __init__(self):
+        self.pools: Dict[str, LoadBalancedChatCompletion] = {}
+
+    def register(self, pool: LoadBalancedChatCompletion) -> None:
+        # A newer manager's pool replaces the previous one for the same service
+        self.pools[pool.service_id] = pool
+
+    def stats(self) -> Dict[str, Any]:
+        return {service_id: pool.stats() for service_id, pool in self.pools.items()}
+
+
+# PANDA_AZURE_OPENAI_POOL points to a JSON list of endpoints ({"name", "endpoint", "api_key" or
+# "api_key_env"}) to spread every deployment over; PANDA_LLM_HEDGING=true hedges slow requests
+azure_openai_pool = load_pool(os.environ["PANDA_AZURE_OPENAI_POOL"]) if os.getenv("PANDA_AZURE_OPENAI_POOL") else []
+llm_hedging = os.getenv("PANDA_LLM_HEDGING", "false").lower() == "true"
+load_balancer_stats = LoadBalancerStats()
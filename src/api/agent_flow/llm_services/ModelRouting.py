@@ -0,0 +1,180 @@
+import copy
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic import BaseModel, Field
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import StreamingChatMessageContent
+from semantic_kernel.filters import FunctionInvocationContext
+from semantic_kernel.functions import KernelFunction, KernelFunctionFromPrompt
+
+from src.api.agent_flow.chat_flow.TokenBudget import estimate_tokens, result_tokens
+
+# Functions with no route run on the manager's main service
+DEFAULT_ROUTE = "default"
+
+
+class ModelRoute(BaseModel):
+    """A service id's deployment and the execution settings its functions run with."""
+    # None uses the manager's main deployment
+    deployment: Optional[str] = None
+    settings: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ModelRoutingTable(BaseModel):
+    """Which route each prompt function runs on.
+
+    `functions` maps a plugin name, or "Plugin.function" for a single function, to a route in
+    `routes`. The route name is the service id its deployment is registered under.
+    """
+    routes: Dict[str, ModelRoute] = Field(default_factory=dict)
+    functions: Dict[str, str] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> "ModelRoutingTable":
+        with open(path, encoding="utf-8") as file:
+            return cls.model_validate(json.load(file))
+
+    def route_name(self, plugin_name: str, function_name: str) -> Optional[str]:
+        route = self.functions.get(f"{plugin_name}.{function_name}") or self.functions.get(plugin_name)
+        return route if route in self.routes else None
+
+    def apply(self, function: KernelFunction, plugin_name: str, function_name: str) -> None:
+        """Point a prompt function at its route's service, with the route's settings on top of its own.
+
+        The function keeps its original settings under the default service id as well, so a kernel
+        without the route's service registered still runs it on its main service.
+        """
+        name = self.route_name(plugin_name, function_name)
+        if name is None or not isinstance(function, KernelFunctionFromPrompt):
+            return
+        existing = dict(function.prompt_execution_settings) or {DEFAULT_ROUTE: PromptExecutionSettings()}
+        base = existing.get(DEFAULT_ROUTE) or next(iter(existing.values()))
+        routed = copy.deepcopy(base)
+        routed.service_id = name
+        for key, value in self.routes[name].settings.items():
+            if key in type(routed).model_fields:
+                setattr(routed, key, value)
+            else:
+                routed.extension_data[key] = value
+        function.prompt_execution_settings = {name: routed, **existing}
+
+
+# The classifiers and the search query, JSON extraction in the background, and the
+# student-facing answers. By default every route runs on the main deployment with each
+# function's own settings. PANDA_CLASSIFIER_DEPLOYMENT, PANDA_EXTRACTION_DEPLOYMENT and
+# PANDA_ANSWER_DEPLOYMENT move a route to another deployment (e.g. a small one for the
+# classifiers); PANDA_MODEL_ROUTES replaces the whole table with a JSON file of the same
+# shape, which is also where routes get settings of their own, e.g.
+# "classifier": {"deployment": "gpt-4o-mini", "settings": {"temperature": 0.0}}.
+DEFAULT_ROUTING = {
+    "routes": {
+        "classifier": {"deployment": os.getenv("PANDA_CLASSIFIER_DEPLOYMENT")},
+        "extraction": {"deployment": os.getenv("PANDA_EXTRACTION_DEPLOYMENT")},
+        "answer": {"deployment": os.getenv("PANDA_ANSWER_DEPLOYMENT")},
+    },
+    "functions": {
+        "IntentRecognizer": "classifier",
+        "RagRecognizer": "classifier",
+        "TurnClassifier": "classifier",
+        "SearchQuery": "classifier",
+        "DegreePlanningValidation": "extraction",
+        "HistorySummarizer": "extraction",
+        "StructuredOutput": "extraction",
+        "DegreePlanning": "answer",
+        "CourseQuestion": "answer",
+        "General": "answer",
+        "Initial": "answer",
+        "ChatBot": "answer",
+    },
+}
+
+
+class RouteStats:
+    """Latency and tokens of prompt function calls per route and step, for /metrics.
+
+    Registered as a kernel function invocation filter. Streamed answers are timed until the last
+    chunk; unless the service reports usage their tokens are estimated from the streamed text only.
+    """
+
+    def __init__(self, routing: ModelRoutingTable):
+        self.routing = routing
+        self.calls: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.seconds: Dict[str, Dict[str, float]] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, step: str, seconds: float, tokens: int, failed: bool = False) -> None:
+        for counter, value in ((self.calls, 1), (self.errors, int(failed)), (self.seconds, seconds),
+                               (self.tokens, tokens)):
+            steps = counter.setdefault(route, {})
+            steps[step] = steps.get(step, 0) + value
+
+    async def on_function_invocation(self, context: FunctionInvocationContext,
+                                     next: Callable[[FunctionInvocationContext], Awaitable[None]]) -> None:
+        if not isinstance(context.function, KernelFunctionFromPrompt):
+            await next(context)
+            return
+        route = self.routing.route_name(context.function.plugin_name, context.function.name) or DEFAULT_ROUTE
+        step = f"{context.function.plugin_name}.{context.function.name}"
+        start = time.perf_counter()
+        try:
+            await next(context)
+        except Exception:
+            self.record(route, step, time.perf_counter() - start, 0, failed=True)
+            raise
+        if context.result is not None and hasattr(context.result.value, "__aiter__"):
+            context.result.value = self._timed_stream(context.result.value, route, step, start)
+        else:
+            self.record(route, step, time.perf_counter() - start, result_tokens(context.result))
+
+    async def _timed_stream(self, stream, route: str, step: str, start: float):
+        text_tokens = 0
+        usage_tokens = None
+        failed = False
+        try:
+            async for chunks in stream:
+                for chunk in chunks:
+                    if isinstance(chunk, StreamingChatMessageContent):
+                        usage = (chunk.metadata or {}).get("usage")
+                        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+                            usage_tokens = usage.prompt_tokens + (usage.completion_tokens or 0)
+                    text_tokens += estimate_tokens(str(chunk or ""))
+                yield chunks
+        except Exception:
+            failed = True
+            raise
+        finally:
+            tokens = usage_tokens if usage_tokens is not None else text_tokens
+            self.record(route, step, time.perf_counter() - start, tokens, failed=failed)
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, steps in self.calls.items():
+            calls = sum(steps.values())
+            seconds = sum(self.seconds[route].values())
+            tokens = sum(self.tokens[route].values())
+            routes[route] = {
+                "deployment": self.routing.routes[route].deployment if route in self.routing.routes else None,
+                "calls": calls,
+                "errors": sum(self.errors[route].values()),
+                "avg_latency_ms": round(seconds / calls * 1000, 1),
+                "tokens": tokens,
+                "avg_tokens": round(tokens / calls, 1),
+                "steps": {
+                    step: {
+                        "calls": count,
+                        "avg_latency_ms": round(self.seconds[route][step] / count * 1000, 1),
+                        "avg_tokens": round(self.tokens[route][step] / count, 1),
+                    }
+                    for step, count in steps.items()
+                },
+            }
+        return routes
+
+
+model_routing = ModelRoutingTable.load(os.environ["PANDA_MODEL_ROUTES"]) if os.getenv("PANDA_MODEL_ROUTES") \
+    else ModelRoutingTable.model_validate(DEFAULT_ROUTING)
+route_stats = RouteStats(model_routing)
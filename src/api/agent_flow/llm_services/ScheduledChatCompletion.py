@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+from typing import Any, AsyncGenerator, List, Optional
+
+import openai
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import ChatHistory, ChatMessageContent, StreamingChatMessageContent
+
+from src.api.agent_flow.chat_flow.TokenBudget import estimate_tokens
+from src.api.agent_flow.llm_services.DelegatingChatCompletion import DelegatingChatCompletion
+from src.api.agent_flow.llm_services.LlmScheduler import LlmScheduler, current_llm_priority
+
+# Completion tokens reserved for a request whose settings set no max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+
+def request_tokens(chat_history: ChatHistory, settings: PromptExecutionSettings) -> int:
+    """Tokens a request counts against the budget before it is sent: its prompt plus the completion
+    it may produce, as Azure OpenAI counts them."""
+    max_tokens = getattr(settings, "max_tokens", None) or (settings.extension_data or {}).get("max_tokens")
+    prompt = sum(estimate_tokens(str(message.content or "")) for message in chat_history.messages)
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def response_tokens(contents: List[ChatMessageContent]) -> Optional[int]:
+    """Tokens the service reports having used, if it does."""
+    for content in contents:
+        usage = (content.metadata or {}).get("usage")
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            return usage.prompt_tokens + (usage.completion_tokens or 0)
+    return None
+
+
+def error_cause(error: Optional[BaseException], kind: type | tuple) -> Optional[BaseException]:
+    """The error or the first error in its cause chain of the given kind (Semantic Kernel wraps the
+    OpenAI errors)."""
+    while error is not None and not isinstance(error, kind):
+        error = error.__cause__ or error.__context__
+    return error
+
+
+def retry_delay(error: BaseException, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying a failed request, or None if it should not be retried."""
+    rate_limit = error_cause(error, openai.RateLimitError)
+    if rate_limit is not None:
+        retry_after = rate_limit.response.headers.get("retry-after") if rate_limit.response is not None else None
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return 2.0 ** attempt
+    if error_cause(error, (openai.APIConnectionError, openai.InternalServerError)) is not None:
+        return 0.5 * 2 ** attempt
+    return None
+
+
+class ScheduledChatCompletion(DelegatingChatCompletion):
+    """Chat service that sends every request of the wrapped service through an LlmScheduler.
+
+    Requests are admitted at the caller's LlmPriority (see use_llm_priority). With auto function
+    calling each round-trip is admitted and counted against the budget on its own, and no slot
+    is held while the tools run. Rate limit and transient errors are retried through the
+    scheduler, so the wrapped service should not retry itself.
+    """
+    _inner: ChatCompletionClientBase = PrivateAttr()
+    _scheduler: LlmScheduler = PrivateAttr()
+
+    def __init__(self, inner: ChatCompletionClientBase, scheduler: LlmScheduler, service_id: str | None = None):
+        # `service_id` registers the wrapper under another id than the wrapped service's
+        super().__init__(service_id=service_id or inner.service_id, ai_model_id=inner.ai_model_id)
+        self._inner = inner
+        self._scheduler = scheduler
+
+    @property
+    def inner(self) -> ChatCompletionClientBase:
+        return self._inner
+
+    @property
+    def scheduler(self) -> LlmScheduler:
+        return self._scheduler
+
+    @property
+    def delegate(self) -> ChatCompletionClientBase:
+        return self._inner
+
+    async def _retry(self, error: Exception, attempt: int) -> bool:
+        """Whether to retry after `error`; waits, or pauses the whole scheduler, as the error requires."""
+        delay = retry_delay(error, attempt) if attempt < self._scheduler.max_retries else None
+        if delay is None:
+            return False
+        self._scheduler.retries += 1
+        if error_cause(error, openai.RateLimitError) is not None:
+            # Every queued request would hit the same limit
+            self._scheduler.pause(delay)
+        else:
+            await asyncio.sleep(delay)
+        return True
+
+    async def _inner_get_chat_message_contents(self, chat_history: ChatHistory,
+                                               settings: PromptExecutionSettings) -> List[ChatMessageContent]:
+        tokens = request_tokens(chat_history, settings)
+        priority = current_llm_priority()
+        sequence = None
+        for attempt in itertools.count():
+            ticket = await self._scheduler.acquire(tokens, priority, sequence)
+            sequence = ticket.sequence
+            used = None
+            try:
+                contents = await self._inner._inner_get_chat_message_contents(chat_history, settings)
+                used = response_tokens(contents)
+                return contents
+            except Exception as e:
+                error = e
+            finally:
+                self._scheduler.release(ticket, used)
+            if not await self._retry(error, attempt):
+                raise error
+
+    async def _inner_get_streaming_chat_message_contents(
+            self, chat_history: ChatHistory, settings: PromptExecutionSettings, function_invoke_attempt: int = 0,
+    ) -> AsyncGenerator[List[StreamingChatMessageContent], Any]:
+        tokens = request_tokens(chat_history, settings)
+        priority = current_llm_priority()
+        sequence = None
+        for attempt in itertools.count():
+            ticket = await self._scheduler.acquire(tokens, priority, sequence)
+            sequence = ticket.sequence
+            streamed = False
+            used = None
+            try:
+                async for messages in self._inner._inner_get_streaming_chat_message_contents(
+                        chat_history, settings, function_invoke_attempt):
+                    streamed = True
+                    # Usage comes with the last chunk, when the service reports it
+                    used = response_tokens(messages) or used
+                    yield messages
+                return
+            except Exception as e:
+                # Once output has reached the caller the request cannot be replayed
+                if streamed:
+                    raise
+                error = e
+            finally:
+                self._scheduler.release(ticket, used)
+            if not await self._retry(error, attempt):
+                raise error
@@ -0,0 +1,274 @@
+import json
+import os
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.functions import KernelArguments, KernelFunction, KernelFunctionFromPrompt
+from semantic_kernel.prompt_template import InputVariable, PromptTemplateConfig
+
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
+from src.api.agent_flow.llm_services.ModelRouting import DEFAULT_ROUTE, model_routing
+
+T = TypeVar("T", bound=BaseModel)
+
+REPAIR_PLUGIN = "StructuredOutput"
+
+
+class StructuredOutputMode(str, Enum):
+    # Output constrained to the model's JSON schema (structured outputs)
+    JSON_SCHEMA = "json_schema"
+    # Any JSON object (JSON mode), for deployments without structured outputs
+    JSON_OBJECT = "json_object"
+    # Only the prompt asks for JSON
+    OFF = "off"
+
+
+class StructuredOutputError(ValueError):
+    """Model output that does not fit its schema, even after local repair and a re-ask."""
+
+
+def _strict(schema: Any) -> Any:
+    """Make a JSON schema what structured outputs' strict mode accepts, in place: every object closed
+    and all its properties required, and no defaults."""
+    if isinstance(schema, dict):
+        schema.pop("default", None)
+        if schema.get("type") == "object" or "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema.get("properties", {}))
+        for value in schema.values():
+            _strict(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict(value)
+    return schema
+
+
+def response_format(output_model: Type[BaseModel], mode: StructuredOutputMode) -> Dict[str, Any]:
+    if mode == StructuredOutputMode.JSON_OBJECT:
+        return {"type": "json_object"}
+    # Every field is required in the strict schema; the defaults only apply to output that was repaired
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": output_model.__name__,
+            "schema": _strict(output_model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+def apply_response_format(function: KernelFunction, output_model: Type[BaseModel],
+                          mode: "StructuredOutputMode | None" = None) -> None:
+    """Request output in `output_model`'s shape from every service the prompt function may run on."""
+    mode = StructuredOutputMode(mode or structured_output_mode)
+    if mode == StructuredOutputMode.OFF or not isinstance(function, KernelFunctionFromPrompt):
+        return
+    requested = response_format(output_model, mode)
+    if not function.prompt_execution_settings:
+        function.prompt_execution_settings = {DEFAULT_ROUTE: PromptExecutionSettings()}
+    for settings in function.prompt_execution_settings.values():
+        if "response_format" in type(settings).model_fields:
+            settings.response_format = requested
+        else:
+            # Generic settings; converted to the service's own settings class when invoked
+            settings.extension_data["response_format"] = requested
+
+
+def _scan(text: str) -> Tuple[Optional[int], List[str], bool, List[int]]:
+    """Walk JSON text that starts with "{": where the object ends (None if it never does), the
+    brackets still open, whether it stops inside a string, and the commas outside strings."""
+    closers: List[str] = []
+    commas: List[int] = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+            if not closers:
+                return index + 1, [], False, commas
+        elif char == ",":
+            commas.append(index)
+    return None, closers, in_string, commas
+
+
+def _strip_trailing_commas(text: str, commas: List[int]) -> str:
+    trailing = {comma for comma in commas if text[comma + 1:].lstrip()[:1] in ("}", "]")}
+    return "".join(char for index, char in enumerate(text) if index not in trailing) if trailing else text
+
+
+def _close(text: str) -> str:
+    """Close a JSON object cut off part-way."""
+    _, closers, in_string, commas = _scan(text)
+    if in_string:
+        text = (text[:-1] if text.endswith("\\") else text) + '"'
+    text = _strip_trailing_commas(text, commas).rstrip().rstrip(",")
+    return text + "".join(reversed(closers))
+
+
+def repair_json(text: str, max_cuts: int = 3) -> str:
+    """Cheap local fixes for the usual ways model output misses being a JSON object.
+
+    Drops code fences and any text around the object, removes trailing commas, and closes
+    an object that was cut off (e.g. at max_tokens), dropping a last member that cannot be
+    completed. Returns the text unchanged when it has no object at all.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text.lstrip("`")
+    start = text.find("{")
+    if start == -1:
+        return text
+    text = text[start:]
+    end, _, _, commas = _scan(text)
+    if end is not None:
+        return _strip_trailing_commas(text[:end], [comma for comma in commas if comma < end])
+
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    candidate = _close(text)
+    # A cut-off key or value may not close into valid JSON; fall back to the members before it
+    for comma in reversed(commas[-max_cuts:]):
+        try:
+            json.loads(candidate)
+            return candidate
+        except ValueError:
+            candidate = _close(text[:comma])
+    return candidate
+
+
+class StructuredOutputStats:
+    """How often each schema's output parsed directly, needed local repair, or needed a re-ask."""
+
+    OUTCOMES = ("parsed", "repaired", "reasked", "failed")
+
+    def __init__(self):
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, schema: str, outcome: str) -> None:
+        counts = self.outcomes.setdefault(schema, {name: 0 for name in self.OUTCOMES})
+        counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for schema, counts in self.outcomes.items():
+            # Every output is parsed, repaired or re-asked; failures are re-asks that did not help
+            total = counts["parsed"] + counts["repaired"] + counts["reasked"]
+            report[schema] = {
+                **counts,
+                "repair_rate": round(counts["repaired"] / total, 3) if total else 0.0,
+                "retry_rate": round(counts["reasked"] / total, 3) if total else 0.0,
+            }
+        return report
+
+
+def _validate(output_model: Type[T], text: str) -> Tuple[Optional[T], Optional[ValidationError], bool]:
+    """Parse text as-is, then after local repair; returns the model (or the last error) and
+    whether the repair was needed."""
+    try:
+        return output_model.model_validate_json(text), None, False
+    except ValidationError as e:
+        error = e
+    repaired = repair_json(text)
+    if repaired == text:
+        return None, error, False
+    try:
+        return output_model.model_validate_json(repaired), None, True
+    except ValidationError as e:
+        return None, e, False
+
+
+def _repair_prompt() -> PromptTemplateConfig:
+    return PromptTemplateConfig(
+        template="""
+        The text below was meant to be a single JSON object matching the JSON schema below, but it
+        is not valid: {{$error}}
+
+        JSON schema:
+        {{$schema}}
+
+        Text:
+        {{$output}}
+
+        Respond only with the corrected JSON object. Keep every value the text already has; if the
+        text was cut off, complete it.
+        """,
+        name="repair_structured_output",
+        template_format="semantic-kernel",
+        input_variables=[
+            InputVariable(name="error", description="Why the output is not valid", is_required=True),
+            InputVariable(name="schema", description="The expected JSON schema", is_required=True),
+            InputVariable(name="output", description="The output to correct", is_required=True),
+        ]
+    )
+
+
+def _repair_function(kernel: Kernel, output_model: Type[BaseModel]) -> KernelFunction:
+    # Registered here rather than through the prompt registry, which applies response formats
+    # with this module
+    function_name = f"repair_{output_model.__name__}"
+    plugin = kernel.plugins.get(REPAIR_PLUGIN)
+    if plugin is not None and function_name in plugin.functions:
+        return plugin.functions[function_name]
+    function = kernel.add_function(plugin_name=REPAIR_PLUGIN, function_name=function_name,
+                                   prompt_template_config=_repair_prompt())
+    model_routing.apply(function, REPAIR_PLUGIN, function_name)
+    apply_response_format(function, output_model)
+    return function
+
+
+async def parse_structured(kernel: Kernel | None, output: Any, output_model: Type[T]) -> T:
+    """Parse a prompt function's output into `output_model`.
+
+    Output that does not validate is repaired locally first (see repair_json); only if that
+    fails is the model asked once to correct it, with the validation error and the schema.
+    Raises StructuredOutputError if the re-ask fails or its output does not validate either.
+    """
+    schema = output_model.__name__
+    text = str(output)
+    parsed, error, repaired = _validate(output_model, text)
+    if parsed is not None:
+        structured_output_stats.record(schema, "repaired" if repaired else "parsed")
+        return parsed
+
+    structured_output_stats.record(schema, "reasked")
+    if kernel is None:
+        structured_output_stats.record(schema, "failed")
+        raise StructuredOutputError(f"Invalid {schema} output: {error}") from error
+    print(f"Asking the model to correct invalid {schema} output: {error.errors()[0]['msg']}")
+    with turn_span("structured_output_reask"):
+        try:
+            corrected = await kernel.invoke(
+                _repair_function(kernel, output_model),
+                arguments=KernelArguments(
+                    error=str(error),
+                    schema=json.dumps(output_model.model_json_schema()),
+                    output=text,
+                )
+            )
+        except Exception as e:
+            # A re-ask that errors (timeout, refusal, outage) fails like one that does not validate
+            structured_output_stats.record(schema, "failed")
+            raise StructuredOutputError(f"Re-ask for invalid {schema} output failed: {e}") from e
+    parsed, error, _ = _validate(output_model, str(corrected))
+    if parsed is None:
+        structured_output_stats.record(schema, "failed")
+        raise StructuredOutputError(f"Invalid {schema} output after a re-ask: {error}") from error
+    return parsed
+
+
+# PANDA_STRUCTURED_OUTPUT=json_object for deployments without structured outputs, off for neither
+structured_output_mode = StructuredOutputMode(os.getenv("PANDA_STRUCTURED_OUTPUT", StructuredOutputMode.JSON_SCHEMA))
+structured_output_stats = StructuredOutputStats()
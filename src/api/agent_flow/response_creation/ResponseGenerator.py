@@ -1,15 +1,21 @@
 import asyncio
 import logging
+from typing import Tuple
 
 from semantic_kernel import Kernel
 from semantic_kernel.connectors.ai import FunctionChoiceBehavior
 from semantic_kernel.connectors.ai.open_ai import AzureChatPromptExecutionSettings
+from semantic_kernel.contents import AuthorRole, StreamingChatMessageContent, StreamingTextContent
 from semantic_kernel.functions import KernelArguments, FunctionResult
 from semantic_kernel.prompt_template import PromptTemplateConfig, InputVariable
 
 from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.TurnTimings import turn_span
 from src.api.agent_flow.information_search.RagChat import AzureRagChat
-from src.api.agent_flow.information_search.SearchQueryProcess import SearchQuery
+from src.api.agent_flow.information_search.SearchQueryProcess import RagType, SearchQuery
+from src.api.agent_flow.information_search.SpeculativeSearch import SpeculativeSearch
+from src.api.agent_flow.llm_services.LlmScheduler import LlmPriority, use_llm_priority
 from src.api.agent_flow.response_creation.DegreeAdvisorPrompt import degree_advisor_prompt
 from src.api.agent_flow.response_creation.RAGPrompt import rag_prompt
 
@@ -24,6 +30,16 @@ class ResponseGenerator:
         self.setup_response_templates()
         self.state = state
         self.setup_response_functions()
+        # Long-lived RAG components, parameterised per call
+        self.search_query = SearchQuery(kernel=self.kernel)
+        self._rag_chat: AzureRagChat | None = None
+
+    @property
+    def rag_chat(self) -> AzureRagChat:
+        # Built on the first RAG turn so the agent still starts without Azure AI Search configured
+        if self._rag_chat is None:
+            self._rag_chat = AzureRagChat(kernel=self.kernel, prompt_template=rag_prompt)
+        return self._rag_chat
 
 
     def setup_response_templates(self):
@@ -173,32 +189,38 @@ class ResponseGenerator:
             auto_invoke=True
         )
 
-        self.kernel.add_function(
+        # Registered once per kernel, so building more generators does not recompile the templates
+        prompt_registry.get_or_add(
+            self.kernel,
             plugin_name="DegreePlanning",
             function_name="degree_planning",
-            prompt_template_config=self.degree_planning_prompt,
+            prompt_template_config=lambda: self.degree_planning_prompt,
             prompt_execution_settings=execution_settings,
         )
-        self.kernel.add_function(
+        prompt_registry.get_or_add(
+            self.kernel,
             plugin_name="CourseQuestion",
             function_name="course_question",
-            prompt_template_config=self.course_question_prompt,
+            prompt_template_config=lambda: self.course_question_prompt,
             prompt_execution_settings=execution_settings,
         )
-        self.kernel.add_function(
+        prompt_registry.get_or_add(
+            self.kernel,
             plugin_name="General",
             function_name="general",
-            prompt_template_config=self.general_prompt,
+            prompt_template_config=lambda: self.general_prompt,
             prompt_execution_settings=execution_settings,
         )
-        self.kernel.add_function(
+        prompt_registry.get_or_add(
+            self.kernel,
             plugin_name="Initial",
             function_name="initial",
-            prompt_template_config=self.initial_prompt,
+            prompt_template_config=lambda: self.initial_prompt,
             prompt_execution_settings=execution_settings,
         )
 
-    async def generate_response(self, state: ConversationContext, user_input: str, needs_rag: bool, arguments: KernelArguments) -> FunctionResult | None:
+    async def generate_response(self, state: ConversationContext, user_input: str, needs_rag: bool,
+                                arguments: KernelArguments, rag_type: RagType | None = None) -> FunctionResult | None:
         arguments["user_input"] = user_input
         prompt_config: PromptTemplateConfig
         plugin_name: str
@@ -220,19 +242,80 @@ class ResponseGenerator:
             case _:
                 plugin_name = "Initial"
                 function_name = "initial"
+        speculation = state.take_speculation()
         if needs_rag:
-            print("RAG")
-            query = await SearchQuery(kernel=self.kernel, state=self.state).generate_search_query(user_input=user_input)
-            search_results = await AzureRagChat(state=state, kernel=self.kernel, query=query, prompt_template=rag_prompt).generate_response(user_input=user_input)
+            print(f"RAG ({rag_type or 'unclassified'})")
+            if rag_type == "career" and speculation is not None:
+                # The speculative query was built before the classification, without the career focus
+                speculation.discard()
+                speculation = None
+            query, search_results = await self._use_speculation(speculation, user_input)
+            if query is None:
+                with turn_span("search_query"):
+                    query = await self.search_query.generate_search_query(user_input=user_input, state=state,
+                                                                          rag_type=rag_type)
+            if search_results is None:
+                with turn_span("rag_retrieval"):
+                    search_results = await self.rag_chat.generate_response(query=query)
             arguments["search_results"] = search_results
             print(f"search_results: {search_results}")
+        elif speculation is not None:
+            speculation.discard()
+        try:
+            with turn_span("response"), use_llm_priority(LlmPriority.RESPONSE):
+                if state.is_streaming:
+                    return await self._stream_response(state, plugin_name, function_name, arguments)
+                response = await self.kernel.invoke(
+                    plugin_name=plugin_name,
+                    function_name=function_name,
+                    arguments=arguments,
+                )
+                return response
+        except Exception as e:
+            # Propagated, so the turn fails rather than storing a partial or empty answer
+            print(f"Function failed. Error: {e}")
+            raise
+
+    @staticmethod
+    async def _use_speculation(speculation: SpeculativeSearch | None,
+                               user_input: str) -> Tuple[str | None, FunctionResult | None]:
+        """Query and results of a speculative search for this input; (None, None) if there is none."""
+        if speculation is None:
+            return None, None
+        if speculation.user_input != user_input:
+            speculation.discard()
+            return None, None
         try:
-            response = await self.kernel.invoke(
+            with turn_span("wait_for_speculative_search"):
+                return await speculation.use()
+        except Exception as e:
+            print(f"Speculative search failed, searching again: {e}")
+            return None, None
+
+    async def _stream_response(self, state: ConversationContext, plugin_name: str, function_name: str,
+                               arguments: KernelArguments) -> str:
+        """Invoke the response function with streaming, forwarding text chunks to the context's token queue."""
+        response_text = ""
+        async for chunks in self.kernel.invoke_stream(
                 plugin_name=plugin_name,
                 function_name=function_name,
                 arguments=arguments,
-            )
-            return response
-        except Exception as e:
-            print(f"Function failed. Error: {e}")
-            return None
+        ):
+            for chunk in chunks:
+                text = self._chunk_text(chunk)
+                if text:
+                    response_text += text
+                    state.emit_token(text)
+        return response_text
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of a streamed chunk, skipping the function call and function result chunks that
+        auto function calling interleaves with the answer."""
+        if chunk is None:
+            return ""
+        if isinstance(chunk, StreamingChatMessageContent):
+            if chunk.role == AuthorRole.TOOL:
+                return ""
+            return "".join(item.text for item in chunk.items if isinstance(item, StreamingTextContent) and item.text)
+        return str(chunk)
@@ -5,6 +5,8 @@ from semantic_kernel.functions import kernel_function, KernelArguments
 from semantic_kernel.processes.kernel_process import KernelProcessStep, KernelProcessStepState, KernelProcessStepContext
 
 from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+from src.api.agent_flow.information_search.SearchQueryProcess import RagType
 from src.api.agent_flow.response_creation.ResponseGenerator import ResponseGenerator
 
 
@@ -17,7 +19,9 @@ class ResponseStep(KernelProcessStep[ConversationContext]):
         super().__init__()
 
     async def activate(self, state: KernelProcessStepState[ConversationContext]):
-        self.response_generator = ResponseGenerator(self.kernel, self.state)
+        # The manager normally hands over its long-lived generator
+        if self.response_generator is None:
+            self.response_generator = ResponseGenerator(self.kernel, self.state)
 
     def _check_data_completeness(self):
         if self.state.artifact.current_state == "degree_planning":
@@ -51,43 +55,53 @@ class ResponseStep(KernelProcessStep[ConversationContext]):
     async def generate_response(self, context: KernelProcessStepContext, data: Dict[str, Any]) -> str:
         user_input: str = data.get("user_input", "No user input provided. Please provide user input.")
         needs_rag: bool = data.get("needs_rag", False)
+        # Only the combined classifier tells a lookup from career research
+        rag_type: RagType | None = data.get("rag_type")
         arguments: KernelArguments
         data_completeness = self._check_data_completeness()
         missing_fields = data_completeness.get("missing", [])
         event_to_emit: str
+        # Recent turns plus the earlier turns this message refers back to
+        chat_history = self.state.to_chat_history(history_budget("response"), query=user_input).messages
 
         match self.state.artifact.current_state:
             case "initial":
                 arguments = KernelArguments(
                     user_input=user_input,
-                    chat_history=self.state.to_chat_history().messages,
+                    chat_history=chat_history,
                 )
                 event_to_emit = "InitialResponseGenerated"
             case "degree_planning":
                 arguments = KernelArguments(
                     user_input=user_input,
-                    chat_history=self.state.to_chat_history().messages,
+                    chat_history=chat_history,
                     missing_fields=missing_fields,
                 )
                 event_to_emit = "DegreePlanningResponseGenerated"
             case "course_question":
                 arguments = KernelArguments(
                     user_input=user_input,
-                    chat_history=self.state.to_chat_history().messages,
+                    chat_history=chat_history,
                     missing_fields=missing_fields,
                 )
                 event_to_emit = "CourseQuestionResponseGenerated"
             case "general_qa":
                 arguments = KernelArguments(
                     user_input=user_input,
-                    chat_history=self.state.to_chat_history().messages,
+                    chat_history=chat_history,
                 )
                 event_to_emit = "GeneralResponseGenerated"
             case _:
                 raise ValueError(f"Invalid state: {self.state.artifact.current_state}")
 
-        response = await self.response_generator.generate_response(user_input=user_input, arguments=arguments,
-                                                                   needs_rag=needs_rag, state=self.state)
+        try:
+            response = await self.response_generator.generate_response(user_input=user_input, arguments=arguments,
+                                                                       needs_rag=needs_rag, rag_type=rag_type,
+                                                                       state=self.state)
+        except Exception as e:
+            # Nothing is added to the history for a failed turn; process_message raises the error
+            self.state.fail_turn(e)
+            raise
 
         response_text = str(response)
 
@@ -2,12 +2,17 @@ from typing import Annotated, List, Optional, Dict
 
 from semantic_kernel.functions import kernel_function
 
-from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext, get_active_context
 
 
 class CourseRecommendationPlugin:
-    def __init__(self, state: ConversationContext):
-        self.state = state
+    def __init__(self, state: ConversationContext | None = None):
+        # Only used when no conversation is active, e.g. when the plugin is called directly
+        self.default_state = state
+
+    def _state(self) -> ConversationContext:
+        # A method rather than a property, so kernel.add_plugin's member inspection does not evaluate it
+        return get_active_context(self.default_state)
 
     @kernel_function(
         name="add_courses",
@@ -52,7 +57,7 @@ class CourseRecommendationPlugin:
             return "No courses provided to add."
 
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
 
         # Add each course if it's not already in the list
         for course in courses_list:
@@ -71,5 +76,5 @@ class CourseRecommendationPlugin:
         description="Clear all recommended or selected courses."
     )
     async def clear_all_courses(self) -> str:
-        self.state.artifact.courses_selected.clear()
+        self._state().artifact.courses_selected.clear()
         return "All recommended courses cleared"
\ No newline at end of file
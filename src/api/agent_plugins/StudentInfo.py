@@ -3,10 +3,10 @@ from typing import Annotated, List, Optional
 
 from semantic_kernel.functions import kernel_function
 
-from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext, AcademicTerm
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext, AcademicTerm, get_active_context
 from src.api.api_fetch.models import UserModel
-from src.api.api_fetch.services import UserService, PandaService
-from src.api.main import SESSION_COOKIE
+from src.api.api_fetch.services import UserService, shared_panda_service
+from src.api.api_fetch.cache import shared_query_cache
 
 class Season(str, Enum):
     FALL = "Fall"
@@ -21,9 +21,13 @@ class TimePreference(str, Enum):
 
 
 class StudentInfoPlugin:
-    def __init__(self, state: ConversationContext):
-        self.state = state
-        self.user_service = UserService(PandaService(SESSION_COOKIE))
+    def __init__(self, state: ConversationContext | None = None):
+        # Only used when no conversation is active, e.g. when the plugin is called directly
+        self.default_state = state
+
+    def _state(self) -> ConversationContext:
+        # A method rather than a property, so kernel.add_plugin's member inspection does not evaluate it
+        return get_active_context(self.default_state)
 
     @kernel_function(
         name="major_info",
@@ -37,7 +41,7 @@ class StudentInfoPlugin:
     ) -> str:
         """Update major information."""
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
 
         if degree_type and artifact.degree_type != degree_type:
             artifact.degree_type = degree_type
@@ -79,7 +83,7 @@ class StudentInfoPlugin:
             return [str(value)]
 
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         minor = safe_list(minor)
 
         if minor:
@@ -105,7 +109,7 @@ class StudentInfoPlugin:
     ) -> str:
         """Update term information."""
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
 
         if start_season and start_year:
             if not artifact.start_term:
@@ -141,7 +145,7 @@ class StudentInfoPlugin:
     ) -> str:
         """Update course load preferences."""
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
 
         if preferred is not None and artifact.preferred_courses_per_semester != preferred:
             artifact.preferred_courses_per_semester = preferred
@@ -172,7 +176,7 @@ class StudentInfoPlugin:
         if not time:
             return "No time preference provided."
 
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         if artifact.time_preference != time:
             artifact.time_preference = time
             print("Time preference updated")
@@ -190,7 +194,7 @@ class StudentInfoPlugin:
         if available is None:
             return "No summer availability provided."
 
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         if artifact.summer_available != available:
             artifact.summer_available = available
             print("Summer availability updated")
@@ -224,7 +228,7 @@ class StudentInfoPlugin:
             return "No career goals provided."
 
         updates = []
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         new_goals = [g for g in goals if g not in artifact.career_goals]
 
         if new_goals:
@@ -245,7 +249,7 @@ class StudentInfoPlugin:
         if total is None:
             return "No credit information provided."
 
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         if artifact.total_credits_needed != total:
             artifact.total_credits_needed = total
             print("Credits needed updated")
@@ -259,7 +263,7 @@ class StudentInfoPlugin:
                      a different major from the one they initially selected""")
     def clear_student_major_info(self) -> str:
         """Clear student major information."""
-        artifact = self.state.artifact
+        artifact = self._state().artifact
         (artifact.major, artifact.courses_selected,
          artifact.concentration, artifact.minor, artifact.career_goals,
          artifact.degree_type, artifact.total_credits_needed) = None, [], None, [], [], None, None
@@ -271,5 +275,10 @@ class StudentInfoPlugin:
                      graduation semester, or their degree program). Tasks have stageId 1-3, for not started,
                      in progress, completed respectively.""")
 
-    def get_user_info(self) -> UserModel:
-        return self.user_service.get_user()
\ No newline at end of file
+    async def get_user_info(self) -> UserModel | str:
+        # Only ever the conversation's own student; never the server's configured account
+        session = self._state().panda_session
+        if session is None:
+            return "The student is not signed in to Panda, so their information is not available."
+        user_service = UserService(shared_panda_service.for_session(session), cache=shared_query_cache)
+        return await user_service.get_user()
\ No newline at end of file
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple, TypeVar
+
+from src.api.api_fetch.config import PANDA_CACHE_MAX_ENTRIES
+
+T = TypeVar("T")
+
+
+class QueryCache:
+    """Bounded LRU cache with per-entry TTLs and single-flight fetching.
+
+    Concurrent misses for the same key share one upstream call: the first caller
+    starts the fetch in its own task and every caller, the first one included, awaits its
+    result, so a caller that is cancelled (e.g. on a client disconnect) leaves the others
+    waiting on it. Cached values are shared; callers copy mutable ones before handing them out.
+    """
+
+    def __init__(self, max_entries: int = PANDA_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._fetches: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value) for a fresh entry and mark it recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: Hashable, ttl: float, fetch: Callable[[], Awaitable[T]]) -> T:
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            in_flight = self._start_fetch([key], ttl, self._fetch_one(key, fetch))[key]
+        # Shield so a cancelled caller, the first one included, does not cancel the shared fetch
+        return await asyncio.shield(in_flight)
+
+    async def get_or_fetch_many(self, keys: List[Hashable], ttl: float,
+                                fetch_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, T]]]) -> Dict[Hashable, T]:
+        """Resolve several keys, fetching every miss in one call.
+
+        Keys already being fetched by another caller are awaited rather than fetched again.
+        """
+        results: Dict[Hashable, T] = {}
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing: List[Hashable] = []
+
+        for key in dict.fromkeys(keys):
+            found, value = self.get(key)
+            if found:
+                self.hits += 1
+                results[key] = value
+            elif key in self._in_flight:
+                self.coalesced += 1
+                waiting[key] = self._in_flight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            waiting.update(self._start_fetch(missing, ttl, fetch_many(missing)))
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return results
+
+    @staticmethod
+    async def _fetch_one(key: Hashable, fetch: Callable[[], Awaitable[T]]) -> Dict[Hashable, T]:
+        return {key: await fetch()}
+
+    def _start_fetch(self, keys: List[Hashable], ttl: float,
+                     fetch: Awaitable[Dict[Hashable, T]]) -> Dict[Hashable, asyncio.Future]:
+        """Run an upstream fetch for `keys` in its own task, so it outlives whoever started it.
+
+        Each key is in flight with a future for its value until the fetch settles; callers
+        await those futures shielded.
+        """
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._in_flight.update(futures)
+
+        async def run() -> None:
+            try:
+                fetched = await fetch
+                for key in keys:
+                    self.set(key, fetched[key], ttl)
+                    futures[key].set_result(fetched[key])
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        # Mark the exception as retrieved in case nobody else was waiting
+                        future.exception()
+                raise
+            finally:
+                for key in keys:
+                    self._in_flight.pop(key, None)
+
+        task = loop.create_task(run())
+        # Hold a reference until it settles, and retrieve its outcome for a fetch nobody awaits
+        self._fetches.add(task)
+        task.add_done_callback(self._fetch_done)
+        return futures
+
+    def _fetch_done(self, task: asyncio.Task) -> None:
+        self._fetches.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared by the API routes and the agent plugins so they see the same entries
+shared_query_cache = QueryCache()
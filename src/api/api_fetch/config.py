@@ -0,0 +1,33 @@
+import os
+
+# Get session cookie from environment variable or use default
+SESSION_COOKIE = os.getenv("PANDA_SESSION_COOKIE", "gql-api=s%3AmZ9_NJ8jAs_Ajqq5B7Snfbx3ADBigNfa.nD0ni94Ku%2BnRYKhQYDXm%2BSMlHnHkIRS48RD84gaQbUA")
+
+# Cookie carrying a signed-in user's Panda session on requests to this API
+PANDA_SESSION_COOKIE_NAME = os.getenv("PANDA_SESSION_COOKIE_NAME", "gql-api")
+
+# Panda GraphQL backend
+PANDA_GRAPHQL_URL = os.getenv("PANDA_GRAPHQL_URL", "http://localhost:5001/graphql")
+
+# Connection pool used by the async transport. Connections are kept alive and
+# reused across requests, so the pool size caps concurrent upstream calls.
+PANDA_POOL_SIZE = int(os.getenv("PANDA_POOL_SIZE", "100"))
+PANDA_KEEPALIVE_SECONDS = float(os.getenv("PANDA_KEEPALIVE_SECONDS", "30"))
+
+# Timeouts in seconds
+PANDA_CONNECT_TIMEOUT = float(os.getenv("PANDA_CONNECT_TIMEOUT", "5"))
+PANDA_REQUEST_TIMEOUT = float(os.getenv("PANDA_REQUEST_TIMEOUT", "15"))
+
+# Query cache. Degree requirements almost never change, user data (tasks, etc.) does.
+PANDA_CACHE_MAX_ENTRIES = int(os.getenv("PANDA_CACHE_MAX_ENTRIES", "1024"))
+PANDA_USER_CACHE_TTL = float(os.getenv("PANDA_USER_CACHE_TTL", "30"))
+PANDA_REQUIREMENTS_CACHE_TTL = float(os.getenv("PANDA_REQUIREMENTS_CACHE_TTL", "3600"))
+
+# Batched requirement lookups: aliases per GraphQL query (larger batches are split into
+# several queries) and degree names accepted per /degrees request
+PANDA_BATCH_MAX_ALIASES = int(os.getenv("PANDA_BATCH_MAX_ALIASES", "25"))
+PANDA_BATCH_MAX_NAMES = int(os.getenv("PANDA_BATCH_MAX_NAMES", "100"))
+
+# Send only the sha256 of prepared queries (automatic persisted queries).
+# The backend must support the Apollo persisted query protocol.
+PANDA_PERSISTED_QUERIES = os.getenv("PANDA_PERSISTED_QUERIES", "false").lower() == "true"
@@ -0,0 +1,124 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+from gql import gql
+from graphql import DocumentNode, GraphQLSchema, build_schema, validate
+
+from src.api.api_fetch.config import PANDA_BATCH_MAX_ALIASES
+
+SCHEMA_PATH = Path(__file__).with_name("schema.graphql")
+
+# Built once from the checked-in SDL instead of introspecting the backend at startup
+PANDA_SCHEMA: GraphQLSchema = build_schema(SCHEMA_PATH.read_text())
+
+
+class PreparedQuery:
+    """A GraphQL operation parsed and validated once, ready to be sent."""
+
+    def __init__(self, name: str, source: str, schema: GraphQLSchema = PANDA_SCHEMA):
+        self.name = name
+        self.source = source
+        self.document: DocumentNode = gql(source)
+        # Hash of the exact text sent, used for automatic persisted queries
+        self.sha256 = hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+        errors = validate(schema, self.document)
+        if errors:
+            raise ValueError(f"Query {name} does not match the Panda schema: {'; '.join(e.message for e in errors)}")
+
+
+PREPARED_QUERIES: Dict[str, PreparedQuery] = {}
+
+
+def prepare_query(name: str, source: str) -> PreparedQuery:
+    """Parse, validate and register a query under its operation name."""
+    prepared = PreparedQuery(name, source)
+    PREPARED_QUERIES[name] = prepared
+    return prepared
+
+
+GET_USER = prepare_query("GetUser", """
+  query GetUser {
+    getUser {
+      email
+      university
+      isPremium
+      yearInUniversity
+      graduationSemesterName
+      gpa
+      tasks {
+        id
+        title
+        description
+        dueDate
+        stageId
+        classCode
+        source
+      }
+      classSchedules {
+        id
+        title
+        isCurrent
+        semesterId
+      }
+      degreePlanners {
+        id
+        title
+        degreeId
+      }
+      attendancePercentage
+      assignmentCompletionPercentage
+      takenClassIds
+      degrees {
+        id
+        name
+        type
+        coreCategories
+        gatewayCategories
+        electiveCategories
+        numberOfCores
+        numberOfElectives
+      }
+    }
+  }
+""")
+
+REQUIREMENT_FIELDS = """
+      id
+      category
+      reqType
+      classIds
+      degreeId
+"""
+
+GET_REQUIREMENTS = prepare_query("GetRequirements", f"""
+  query GetRequirements($degreeName: String) {{
+    getRequirements(degreeName: $degreeName) {{{REQUIREMENT_FIELDS}    }}
+  }}
+""")
+
+
+def requirements_alias(index: int) -> str:
+    return f"d{index}"
+
+
+@lru_cache(maxsize=32)
+def get_requirements_batch(count: int) -> PreparedQuery:
+    """Aliased query fetching the requirements of `count` degrees in one request.
+
+    Variables and aliases are d0..d{count-1}. Documents are prepared once per batch size,
+    which is capped at PANDA_BATCH_MAX_ALIASES; callers split larger batches.
+    """
+    if not 0 < count <= PANDA_BATCH_MAX_ALIASES:
+        raise ValueError(f"Batch size must be between 1 and {PANDA_BATCH_MAX_ALIASES}, got {count}")
+    aliases = [requirements_alias(i) for i in range(count)]
+    variables = ", ".join(f"${alias}: String" for alias in aliases)
+    fields = "".join(
+        f"\n    {alias}: getRequirements(degreeName: ${alias}) {{{REQUIREMENT_FIELDS}    }}" for alias in aliases
+    )
+    return PreparedQuery("GetRequirementsBatch", f"""
+  query GetRequirementsBatch({variables}) {{{fields}
+  }}
+""")
@@ -1,95 +1,232 @@
-from typing import Any, List
+import asyncio
+from typing import Any, Dict, List
 
+import httpx
 from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from gql.client import AsyncClientSession
+from gql.transport.exceptions import TransportQueryError
+from gql.transport.httpx import HTTPXAsyncTransport
 
+from src.api.api_fetch.config import (
+    PANDA_GRAPHQL_URL,
+    PANDA_POOL_SIZE,
+    PANDA_KEEPALIVE_SECONDS,
+    PANDA_CONNECT_TIMEOUT,
+    PANDA_REQUEST_TIMEOUT,
+    PANDA_PERSISTED_QUERIES,
+    PANDA_USER_CACHE_TTL,
+    PANDA_REQUIREMENTS_CACHE_TTL,
+    PANDA_BATCH_MAX_ALIASES,
+    SESSION_COOKIE,
+)
+from src.api.api_fetch.cache import QueryCache
 from src.api.api_fetch.models import UserModel, RequirementModel
+from src.api.api_fetch.queries import (
+    PreparedQuery,
+    GET_USER,
+    GET_REQUIREMENTS,
+    get_requirements_batch,
+    requirements_alias,
+)
 
 
 class PandaService:
-    def __init__(self, session_cookie: str):
+    def __init__(self,
+                 session_cookie: str,
+                 url: str = PANDA_GRAPHQL_URL,
+                 pool_size: int = PANDA_POOL_SIZE,
+                 keepalive_seconds: float = PANDA_KEEPALIVE_SECONDS,
+                 connect_timeout: float = PANDA_CONNECT_TIMEOUT,
+                 request_timeout: float = PANDA_REQUEST_TIMEOUT,
+                 persisted_queries: bool = PANDA_PERSISTED_QUERIES,
+                 ):
         self.session_cookie = session_cookie
-        transport = RequestsHTTPTransport(
-            url="http://localhost:5001/graphql",
-            headers={"Cookie": self.session_cookie}
+        self.persisted_queries = persisted_queries
+        # Keyword arguments are forwarded to httpx.AsyncClient, which keeps a pool
+        # of keep-alive connections for the lifetime of the session.
+        transport = HTTPXAsyncTransport(
+            url=url,
+            headers={"Cookie": self.session_cookie},
+            timeout=httpx.Timeout(request_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive_seconds,
+            ),
         )
-        self.client = Client(transport=transport, fetch_schema_from_transport=True)
+        # Prepared queries are validated against the checked-in schema at import,
+        # so the client neither introspects the backend nor re-validates per request.
+        self.client = Client(
+            transport=transport,
+            fetch_schema_from_transport=False,
+            execute_timeout=request_timeout,
+        )
+        self._session: AsyncClientSession | None = None
+        self._connect_lock: asyncio.Lock | None = None
+
+    async def connect(self) -> AsyncClientSession:
+        """Open the pooled session once; later calls reuse it."""
+        if self._session is not None:
+            return self._session
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._session is None:
+                try:
+                    self._session = await self.client.connect_async(reconnecting=False)
+                except Exception:
+                    # Leave the transport closed so the next call can retry the connection
+                    await self.client.transport.close()
+                    raise
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session and release all pooled connections."""
+        if self._session is not None:
+            await self.client.close_async()
+            self._session = None
+
+    async def fetch_panda(self, query: PreparedQuery | str, variables: dict[str, Any] | None,
+                          session_cookie: str | None = None) -> dict[str, Any]:
+        """Run a query; `session_cookie` sends it as another user than the service's own."""
+        session = await self.connect()
+        headers = {"Cookie": session_cookie} if session_cookie else None
+        extra_args = {"headers": headers} if headers else None
+        if isinstance(query, str):
+            # Ad-hoc queries still work, but pay for a full parse on every call
+            return await session.execute(gql(query), variable_values=variables, extra_args=extra_args)
+        if self.persisted_queries:
+            return await self._fetch_persisted(query, variables, headers)
+        return await session.execute(query.document, variable_values=variables, operation_name=query.name,
+                                     extra_args=extra_args)
+
+    def for_session(self, session_cookie: str) -> "PandaSession":
+        """This service's pooled connections, sending another user's session cookie."""
+        return PandaSession(self, session_cookie)
+
+    async def _fetch_persisted(self, query: PreparedQuery, variables: dict[str, Any] | None,
+                               headers: dict[str, str] | None = None) -> dict[str, Any]:
+        """Send only the query hash (automatic persisted queries), registering the full text on a miss."""
+        payload: dict[str, Any] = {
+            "operationName": query.name,
+            "variables": variables or {},
+            "extensions": {"persistedQuery": {"version": 1, "sha256Hash": query.sha256}},
+        }
+        result = await self._post(payload, headers)
+        if _is_persisted_query_miss(result):
+            payload["query"] = query.source
+            result = await self._post(payload, headers)
+
+        if result.get("errors"):
+            raise TransportQueryError(str(result["errors"][0]), errors=result["errors"], data=result.get("data"))
+        return result["data"]
+
+    async def _post(self, payload: dict[str, Any], headers: dict[str, str] | None = None) -> dict[str, Any]:
+        transport: HTTPXAsyncTransport = self.client.transport
+        response = await transport.client.post(transport.url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+
+class PandaSession:
+    """A signed-in user's view of a shared PandaService: its pooled connections, with the user's cookie.
+
+    Cheap to create per request; stands in for a PandaService in UserService and DegreeService.
+    """
+
+    def __init__(self, panda_service: PandaService, session_cookie: str):
+        self.panda = panda_service
+        self.session_cookie = session_cookie
+
+    async def fetch_panda(self, query: PreparedQuery | str, variables: dict[str, Any] | None) -> dict[str, Any]:
+        return await self.panda.fetch_panda(query, variables, session_cookie=self.session_cookie)
 
-    def fetch_panda(self, query: str, variables: dict[str, any] | None) -> dict[str, Any]:
-        query_obj = gql(query)
-        return self.client.execute(query_obj, variable_values=variables)
+
+def _is_persisted_query_miss(result: dict[str, Any]) -> bool:
+    for error in result.get("errors") or []:
+        code = (error.get("extensions") or {}).get("code")
+        if code == "PERSISTED_QUERY_NOT_FOUND" or error.get("message") == "PersistedQueryNotFound":
+            return True
+    return False
 
 class UserService:
-    def __init__(self, panda_service: PandaService):
+    def __init__(self, panda_service: PandaService | PandaSession, cache: QueryCache | None = None,
+                 ttl: float = PANDA_USER_CACHE_TTL):
         self.panda = panda_service
+        self.cache = cache
+        self.ttl = ttl
+
+    async def get_user(self) -> UserModel:
+        if self.cache is None:
+            return await self._fetch_user()
+        # User data is per session, so the cookie is part of the key
+        user = await self.cache.get_or_fetch(("GetUser", self.panda.session_cookie), self.ttl, self._fetch_user)
+        # A copy, so callers that change it do not change the cached entry
+        return user.model_copy(deep=True)
 
-    def get_user(self):
-        query = """
-          query GetUser {
-            getUser {
-              email
-              university
-              isPremium
-              yearInUniversity
-              graduationSemesterName
-              gpa
-              tasks {
-                id
-                title
-                description
-                dueDate
-                stageId
-                classCode
-                source
-              }
-              classSchedules {
-                id
-                title
-                isCurrent
-                semesterId
-              }
-              degreePlanners {
-                id
-                title
-                degreeId
-              }
-              attendancePercentage
-              assignmentCompletionPercentage
-              takenClassIds
-              degrees {
-                id
-                name
-                type
-                coreCategories
-                gatewayCategories
-                electiveCategories
-                numberOfCores
-                numberOfElectives
-              }
-            }
-          }
-        """
-
-        output = self.panda.fetch_panda(query, None)
+    async def _fetch_user(self) -> UserModel:
+        output = await self.panda.fetch_panda(GET_USER, None)
         user_model = UserModel.model_validate(output["getUser"])
         return user_model
 
+def _copy_requirements(requirements: List[RequirementModel]) -> List[RequirementModel]:
+    return [requirement.model_copy(deep=True) for requirement in requirements]
+
 class DegreeService:
-    def __init__(self, panda_service: PandaService):
+    def __init__(self, panda_service: PandaService, cache: QueryCache | None = None,
+                 ttl: float = PANDA_REQUIREMENTS_CACHE_TTL):
         self.panda = panda_service
+        self.cache = cache
+        self.ttl = ttl
 
-    def get_degree_req(self, degree_name: str):
-        query = """
-        query GetRequirements($degreeName: String) {
-          getRequirements(degreeName: $degreeName) {
-            id
-            category
-            reqType
-            classIds
-            degreeId
-          }
-        }
-        """
-        output = self.panda.fetch_panda(query, {"degreeName": degree_name})
+    async def get_degree_req(self, degree_name: str) -> List[RequirementModel]:
+        if self.cache is None:
+            return await self._fetch_degree_req(degree_name)
+        requirements = await self.cache.get_or_fetch(
+            ("GetRequirements", degree_name), self.ttl, lambda: self._fetch_degree_req(degree_name)
+        )
+        return _copy_requirements(requirements)
+
+    async def _fetch_degree_req(self, degree_name: str) -> List[RequirementModel]:
+        output = await self.panda.fetch_panda(GET_REQUIREMENTS, {"degreeName": degree_name})
         requirement_model: List[RequirementModel] = [RequirementModel.model_validate(requirement) for requirement in output["getRequirements"]]
-        return requirement_model
\ No newline at end of file
+        return requirement_model
+
+    async def get_degree_reqs(self, degree_names: List[str]) -> Dict[str, List[RequirementModel]]:
+        """Requirements for several degrees, fetched in a single aliased request."""
+        degree_names = list(dict.fromkeys(degree_names))
+        if not degree_names:
+            return {}
+        if self.cache is None:
+            return await self._fetch_degree_reqs(degree_names)
+
+        keys = [("GetRequirements", name) for name in degree_names]
+
+        async def fetch_missing(missing_keys):
+            fetched = await self._fetch_degree_reqs([name for _, name in missing_keys])
+            return {("GetRequirements", name): requirements for name, requirements in fetched.items()}
+
+        cached = await self.cache.get_or_fetch_many(keys, self.ttl, fetch_missing)
+        return {name: _copy_requirements(cached[("GetRequirements", name)]) for name in degree_names}
+
+    async def _fetch_degree_reqs(self, degree_names: List[str]) -> Dict[str, List[RequirementModel]]:
+        # Bounded query size; larger batches go out as several queries in parallel
+        chunks = [degree_names[i:i + PANDA_BATCH_MAX_ALIASES]
+                  for i in range(0, len(degree_names), PANDA_BATCH_MAX_ALIASES)]
+        results: Dict[str, List[RequirementModel]] = {}
+        for fetched in await asyncio.gather(*(self._fetch_degree_reqs_chunk(chunk) for chunk in chunks)):
+            results.update(fetched)
+        return results
+
+    async def _fetch_degree_reqs_chunk(self, degree_names: List[str]) -> Dict[str, List[RequirementModel]]:
+        variables = {requirements_alias(i): name for i, name in enumerate(degree_names)}
+        output = await self.panda.fetch_panda(get_requirements_batch(len(degree_names)), variables)
+        return {
+            name: [RequirementModel.model_validate(requirement) for requirement in output[requirements_alias(i)]]
+            for i, name in enumerate(degree_names)
+        }
+
+
+# One pooled Panda connection for the process; the API routes and the agent plugins query
+# through it, as their caller's session where they have one (see PandaService.for_session)
+shared_panda_service = PandaService(session_cookie=SESSION_COOKIE)
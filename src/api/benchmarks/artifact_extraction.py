@@ -0,0 +1,63 @@
+"""
+Per-turn cost of artifact extraction as a conversation grows: full-history
+re-extraction versus the incremental patch extractor.
+
+The stub LLM charges a fixed latency plus time per prompt character, so the
+reported prompt size and latency of one extraction at turn 5, 20 and 60 show how
+each approach scales.
+
+    python -m src.api.benchmarks.artifact_extraction
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from semantic_kernel import Kernel
+
+from src.api.agent_flow.ProcessValidation.DegreePlanningValidationStep import validate_conversation_artifact
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.benchmarks.stub_chat_service import StubChatCompletion
+
+USER_MESSAGE = "I'm thinking about taking COMP 210 and MATH 233 next semester, maybe five courses in total."
+ASSISTANT_MESSAGE = ("That sounds like a solid plan for a Computer Science BS. COMP 210 covers data structures "
+                     "and MATH 233 is multivariable calculus; together with three electives you would stay on "
+                     "track to graduate on time. Do you prefer morning or afternoon classes?")
+
+
+def build_conversation(turns: int) -> ConversationContext:
+    """A conversation of `turns` turns whose first `turns - 1` are already in the artifact."""
+    context = ConversationContext()
+    for _ in range(turns):
+        context.add_user_message(USER_MESSAGE)
+        context.add_assistant_message(ASSISTANT_MESSAGE)
+    context.artifact.extracted_turns = turns - 1
+    return context
+
+
+async def measure(mode: str, turns: int, repeats: int) -> str:
+    os.environ["PANDA_ARTIFACT_EXTRACTION"] = mode
+    service = StubChatCompletion(delays={"validation": 0.2, "artifact_patch": 0.2}, delay_per_1k_chars=0.05)
+    kernel = Kernel()
+    kernel.add_service(service)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await validate_conversation_artifact(kernel, build_conversation(turns))
+    latency_ms = (time.perf_counter() - start) / repeats * 1000
+    chars = sum(service.prompt_chars.values()) / repeats
+    return f"{mode:<12} {turns:>3} turns: prompt {chars:8.0f} chars (~{chars / 4:6.0f} tokens), {latency_ms:6.0f} ms"
+
+
+async def main(lengths, repeats: int):
+    for mode in ("full", "incremental"):
+        for turns in lengths:
+            print(await measure(mode, turns, repeats))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[5, 20, 60])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.lengths, args.repeats))
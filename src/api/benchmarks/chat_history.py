@@ -0,0 +1,71 @@
+"""
+Cost of the ChatHistory conversions made during one turn, as a conversation grows
+to 100 turns: rebuilding from the message dicts on every call versus the context's
+incrementally maintained ChatHistory.
+
+Each simulated turn makes the calls a sequential-mode degree planning turn makes:
+four budgeted views (intent, RAG evaluation, search query, response) and two full
+histories (the response step's debug print and full-history validation).
+
+    python -m src.api.benchmarks.chat_history
+"""
+import argparse
+import time
+
+from semantic_kernel.contents import ChatHistory
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+
+BUDGETED_CALLS = ["intent_recognition", "rag_evaluation", "search_query", "response"]
+FULL_CALLS = 2
+
+
+def rebuild(messages) -> ChatHistory:
+    """What to_chat_history did before the cache."""
+    chat_history = ChatHistory()
+    for msg in messages:
+        if msg["role"] == "user":
+            chat_history.add_user_message(msg["content"])
+        elif msg["role"] == "assistant":
+            chat_history.add_assistant_message(msg["content"])
+        elif msg["role"] == "system":
+            chat_history.add_system_message(msg["content"])
+    return chat_history
+
+
+def run(turns: int, cached: bool) -> float:
+    context = ConversationContext()
+    elapsed = 0.0
+    for turn in range(turns):
+        context.add_user_message(f"Turn {turn}: can I fit COMP 210 and MATH 233 into next semester?")
+        context.add_assistant_message("Yes, both are offered in the spring and fit a five-course load. " * 4)
+
+        start = time.perf_counter()
+        for prompt in BUDGETED_CALLS:
+            if cached:
+                context.to_chat_history(history_budget(prompt))
+            else:
+                rebuild(context.history_window(history_budget(prompt)))
+        for _ in range(FULL_CALLS):
+            if cached:
+                context.to_chat_history()
+            else:
+                rebuild(context.messages)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main(turns: int, repeats: int):
+    for label, cached in (("rebuild", False), ("incremental", True)):
+        best = min(run(turns, cached) for _ in range(repeats))
+        print(f"{label:<12} {best * 1000:8.1f} ms for a {turns}-turn conversation"
+              f" ({best / turns * 1e6:7.1f} us per turn)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    main(args.turns, args.repeats)
@@ -0,0 +1,82 @@
+"""
+Degree planning turn latency with artifact validation inline versus in the background.
+
+The stub LLM answers every turn as degree planning, with delays in the range seen
+from Azure OpenAI (the full-history extraction being the slowest call). `--think`
+is the pause between turns while the student reads and types; with a pause longer
+than the extraction, the next turn never waits for it.
+
+    python -m src.api.benchmarks.degree_planning_latency
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager, ValidationMode
+from src.api.benchmarks.stub_chat_service import DEFAULT_RESPONSES, StubChatCompletion
+
+DELAYS = {
+    "intent": 0.5,
+    "rag_evaluation": 0.4,
+    "validation": 1.5,
+    "artifact_patch": 0.8,
+    "search_query": 0.3,
+    "response": 1.2,
+}
+
+EXTRACTED = json.dumps({
+    "current_state": "degree_planning", "degree_type": "BS", "major": "Computer Science",
+    "time_preference": None, "current_term": None, "preferred_courses_per_semester": 5,
+    "career_goals": ["software engineering"], "courses_selected": [],
+})
+
+RESPONSES = {
+    **DEFAULT_RESPONSES,
+    "intent": '{"intent": "degree_planning", "confidence": 0.95, "reason": "stub"}',
+    "validation": EXTRACTED,
+    "artifact_patch": EXTRACTED,
+    "response": "Great, a BS in Computer Science. Which term are you starting in?",
+}
+
+MESSAGES = [
+    "I want to plan a Computer Science BS",
+    "I'd like to take five courses a semester",
+    "I'm interested in software engineering",
+    "I started in Fall 2024",
+]
+
+
+async def run_mode(mode: ValidationMode, think: float) -> None:
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        validation_mode=mode,
+        chat_service=StubChatCompletion(delays=DELAYS, responses=RESPONSES),
+    )
+    context = ConversationContext()
+    latencies = []
+    for message in MESSAGES:
+        start = time.perf_counter()
+        await manager.process_message(message, context=context)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(think)
+    await context.wait_for_background_tasks()
+
+    turns = ", ".join(f"{latency * 1000:.0f}" for latency in latencies)
+    print(f"{mode.value:<10} avg {sum(latencies) / len(latencies) * 1000:6.0f} ms per turn ({turns} ms)"
+          f" major={context.artifact.major}")
+
+
+async def main(think: float):
+    for mode in ValidationMode:
+        await run_mode(mode, think)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--think", type=float, default=2.0, help="seconds between turns")
+    args = parser.parse_args()
+    asyncio.run(main(args.think))
@@ -0,0 +1,48 @@
+"""
+Startup and per-request cost of GraphQL document handling.
+
+Measures how long the query registry takes to build (schema + parse + validate),
+and compares parsing a query on every request with reusing a prepared document.
+
+    python -m src.api.benchmarks.graphql_documents
+"""
+import argparse
+import importlib
+import sys
+import time
+
+from gql import gql
+
+
+def main(iterations: int):
+    start = time.perf_counter()
+    queries = importlib.import_module("src.api.api_fetch.queries")
+    import_ms = (time.perf_counter() - start) * 1000
+    print(f"registry import (schema build, parse, validate {len(queries.PREPARED_QUERIES)} queries): {import_ms:.2f} ms")
+
+    from src.api.api_fetch.services import PandaService
+    start = time.perf_counter()
+    PandaService(session_cookie="")
+    print(f"PandaService construction (no schema round trip): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    for prepared in queries.PREPARED_QUERIES.values():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            gql(prepared.source)
+        parse_us = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            queries.PREPARED_QUERIES[prepared.name].document
+        lookup_us = (time.perf_counter() - start) / iterations * 1e6
+
+        print(f"{prepared.name}: parse per request {parse_us:.1f} us, prepared lookup {lookup_us:.3f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    if "src.api.api_fetch.queries" in sys.modules:
+        print("warning: query registry already imported, import time will read as zero")
+    main(args.iterations)
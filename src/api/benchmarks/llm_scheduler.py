@@ -0,0 +1,76 @@
+"""
+Queueing behaviour of the LLM scheduler against the stub chat service: a burst of
+background extraction requests followed by interactive turns' final responses,
+under a concurrency cap and a tokens-per-minute budget.
+
+With priorities the responses overtake the queued background work; "fifo" runs the
+same load with every request at one priority for comparison. --rate-limit-every
+makes the stub answer every nth request with a 429, which pauses the whole queue.
+
+    python -m src.api.benchmarks.llm_scheduler
+"""
+import argparse
+import asyncio
+import time
+
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import ChatHistory
+
+from src.api.agent_flow.llm_services.LlmScheduler import LlmPriority, LlmScheduler, use_llm_priority
+from src.api.agent_flow.llm_services.ScheduledChatCompletion import ScheduledChatCompletion
+from src.api.benchmarks.stub_chat_service import StubChatCompletion
+
+BACKGROUND_PROMPT = "You are an AI that extracts structured information from conversations. " + "Conversation. " * 200
+RESPONSE_PROMPT = "You are a helpful UNC academic advisor. Which courses should I take next semester?"
+
+
+async def request(service: ScheduledChatCompletion, prompt: str, priority: LlmPriority, latencies: list) -> None:
+    chat_history = ChatHistory()
+    chat_history.add_user_message(prompt)
+    start = time.perf_counter()
+    with use_llm_priority(priority):
+        await service.get_chat_message_contents(chat_history, PromptExecutionSettings())
+    latencies.append(time.perf_counter() - start)
+
+
+async def run(label: str, prioritise: bool, args) -> None:
+    scheduler = LlmScheduler(max_concurrency=args.concurrency, tokens_per_minute=args.tpm, max_retries=3)
+    stub = StubChatCompletion(rate_limit_every=args.rate_limit_every, retry_after=0.5)
+    service = ScheduledChatCompletion(stub, scheduler)
+    background, responses = [], []
+    low = LlmPriority.BACKGROUND if prioritise else LlmPriority.INTERACTIVE
+    high = LlmPriority.RESPONSE if prioritise else LlmPriority.INTERACTIVE
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(request(service, BACKGROUND_PROMPT, low, background))
+             for _ in range(args.background)]
+    for _ in range(args.responses):
+        await asyncio.sleep(args.arrival)
+        tasks.append(asyncio.create_task(request(service, RESPONSE_PROMPT, high, responses)))
+    await asyncio.gather(*tasks)
+
+    def summary(latencies):
+        latencies = sorted(latencies)
+        return (f"avg {sum(latencies) / len(latencies) * 1000:6.0f} ms,"
+                f" max {latencies[-1] * 1000:6.0f} ms") if latencies else "none"
+
+    print(f"{label:<10} total {(time.perf_counter() - start) * 1000:6.0f} ms  "
+          f"responses: {summary(responses)}  background: {summary(background)}")
+    print(f"  {scheduler.stats()}")
+
+
+async def main(args):
+    await run("fifo", False, args)
+    await run("priority", True, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute budget (0: none)")
+    parser.add_argument("--background", type=int, default=12)
+    parser.add_argument("--responses", type=int, default=4)
+    parser.add_argument("--arrival", type=float, default=0.2, help="seconds between responses")
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,98 @@
+"""
+Request latency and failures against three stub Azure OpenAI regions: a fast one with
+an occasional slow request, a slower one, and a fast one that starts failing half-way
+through the run.
+
+"single" sends everything to the region that fails, "pool" balances over all three by
+health, and "hedged" also hedges requests slower than the member's p95. Compare p50,
+p95, p99 and failed requests, and the pool's per-region counts and ejections.
+
+    python -m src.api.benchmarks.load_balancing
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from openai import AsyncAzureOpenAI
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion, AzureChatPromptExecutionSettings
+from semantic_kernel.contents import ChatHistory
+
+from src.api.agent_flow.chat_flow.TurnTimings import percentile
+from src.api.agent_flow.llm_services.LoadBalancedChatCompletion import LoadBalancedChatCompletion
+from src.api.benchmarks.stub_azure_openai_server import start_stub_azure_openai_server
+
+REGIONS = {
+    "eastus": {"delay": 0.10, "jitter": 0.05, "slow_rate": 0.04, "slow_delay": 1.0},
+    "westus": {"delay": 0.25, "jitter": 0.05},
+    "swedencentral": {"delay": 0.10, "jitter": 0.05},
+}
+# Region that fails every request from half-way through the run
+FAILING_REGION = "swedencentral"
+
+
+def azure_service(url: str) -> AzureChatCompletion:
+    client = AsyncAzureOpenAI(azure_endpoint=url, api_key="benchmark", api_version="2024-02-15-preview",
+                              max_retries=0)
+    return AzureChatCompletion(deployment_name="benchmark", async_client=client)
+
+
+async def run(label: str, service, handlers: Dict[str, type], args) -> None:
+    for handler in handlers.values():
+        handler.failure_rate = 0.0
+    latencies: List[float] = []
+    failed = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    settings = AzureChatPromptExecutionSettings()
+
+    async def request(index: int) -> None:
+        nonlocal failed
+        async with semaphore:
+            if index == args.requests // 2:
+                handlers[FAILING_REGION].failure_rate = 1.0
+            history = ChatHistory()
+            history.add_user_message("Which courses should I take next semester?")
+            start = time.perf_counter()
+            try:
+                if args.stream:
+                    async for _ in service.get_streaming_chat_message_contents(history, settings):
+                        pass
+                else:
+                    await service.get_chat_message_contents(history, settings)
+            except Exception:
+                failed += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(request(index) for index in range(args.requests)))
+    print(f"{label:<7} p50 {percentile(latencies, 0.5) * 1000:6.0f} ms  p95 {percentile(latencies, 0.95) * 1000:6.0f} ms"
+          f"  p99 {percentile(latencies, 0.99) * 1000:6.0f} ms  failed {failed:3d}/{args.requests}")
+    if isinstance(service, LoadBalancedChatCompletion):
+        for name, member in service.stats().items():
+            print(f"  {name:<14} requests {member['requests']:4d}  failures {member['failures']:3d}"
+                  f"  ewma {member['latency_ewma_ms'] or 0:6.0f} ms  error rate {member['error_rate']:.2f}"
+                  f"  ejected for {member['ejected_for_s']:4.1f} s  hedges {member['hedges']:3d}"
+                  f"  won {member['hedge_wins']:3d}")
+
+
+async def main(args):
+    urls, handlers = {}, {}
+    for name, settings in REGIONS.items():
+        server, urls[name] = start_stub_azure_openai_server(**settings)
+        handlers[name] = server.RequestHandlerClass
+
+    await run("single", azure_service(urls[FAILING_REGION]), handlers, args)
+    await run("pool", LoadBalancedChatCompletion(
+        {name: azure_service(url) for name, url in urls.items()}, seed=args.seed), handlers, args)
+    await run("hedged", LoadBalancedChatCompletion(
+        {name: azure_service(url) for name, url in urls.items()}, hedge=True, seed=args.seed), handlers, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stream", action="store_true", help="stream the answers")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main(args))
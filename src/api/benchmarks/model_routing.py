@@ -0,0 +1,59 @@
+"""
+Turn latency with every prompt on one deployment versus the classifier and
+extraction routes on a smaller, faster one, against stub chat services, and the
+per-route latency and token report /metrics serves.
+
+    python -m src.api.benchmarks.model_routing
+"""
+import argparse
+import asyncio
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager
+from src.api.agent_flow.chat_flow.TurnTimings import TurnTimingStats
+from src.api.agent_flow.llm_services.ModelRouting import RouteStats, model_routing, route_stats
+from src.api.agent_flow.llm_services.ScheduledChatCompletion import ScheduledChatCompletion
+from src.api.benchmarks.stub_chat_service import DEFAULT_DELAYS, StubChatCompletion
+
+SMALL_ROUTES = ("classifier", "extraction")
+
+
+async def run(label: str, small_speedup: float, turns: int) -> None:
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        chat_service=StubChatCompletion(),
+    )
+    if small_speedup != 1.0:
+        small = StubChatCompletion(delays={kind: delay / small_speedup for kind, delay in DEFAULT_DELAYS.items()})
+        for route in SMALL_ROUTES:
+            manager.kernel.add_service(ScheduledChatCompletion(small, manager.llm_scheduler, service_id=route),
+                                       overwrite=True)
+
+    RouteStats.__init__(route_stats, model_routing)
+    stats = TurnTimingStats()
+    context = ConversationContext()
+    for _ in range(turns):
+        await manager.process_message("What are the requirements for the Computer Science major?", context=context)
+        stats.record(manager.last_turn_timer)
+
+    print(f"{label}: avg turn {stats.stats()['avg_turn_ms']} ms")
+    for route, report in route_stats.stats().items():
+        print(f"  {route:<10} calls {report['calls']:3d}  avg {report['avg_latency_ms']:7.1f} ms"
+              f"  avg tokens {report['avg_tokens']:7.1f}")
+        for step, step_report in report["steps"].items():
+            print(f"    {step:<40} {step_report['avg_latency_ms']:7.1f} ms  {step_report['avg_tokens']:7.1f} tokens")
+
+
+async def main(turns: int, speedup: float):
+    await run("one deployment", 1.0, turns)
+    await run(f"small classifier/extraction deployment ({speedup}x faster)", speedup, turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--speedup", type=float, default=2.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.speedup))
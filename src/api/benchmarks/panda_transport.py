@@ -0,0 +1,89 @@
+"""
+Concurrency benchmark for the Panda GraphQL client.
+
+Runs 200 concurrent clients against a local stub GraphQL server, once with the
+old blocking RequestsHTTPTransport called from async handlers and once with the
+pooled async PandaService, and prints requests/sec and p95 latency for both.
+
+    python -m src.api.benchmarks.panda_transport
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from gql import gql, Client
+from gql.transport.requests import RequestsHTTPTransport
+
+from src.api.api_fetch.services import PandaService, UserService
+from src.api.benchmarks.stub_panda_server import start_stub_panda_server
+
+GET_USER = """
+query GetUser {
+  getUser { email university isPremium tasks { id title description dueDate stageId classCode source }
+            classSchedules { id title isCurrent semesterId } degreePlanners { id title degreeId }
+            takenClassIds degrees { id name type coreCategories gatewayCategories electiveCategories
+            numberOfCores numberOfElectives } }
+}
+"""
+
+
+def p95(latencies: List[float]) -> float:
+    return statistics.quantiles(latencies, n=20)[18]
+
+
+async def run_clients(handler: Callable[[], Awaitable[object]], clients: int, requests_per_client: int) -> None:
+    latencies: List[float] = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    total = clients * requests_per_client
+    print(f"  requests:     {total}")
+    print(f"  requests/sec: {total / elapsed:.1f}")
+    print(f"  p50 latency:  {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"  p95 latency:  {p95(latencies) * 1000:.1f} ms")
+
+
+async def main(clients: int, requests_per_client: int, delay: float):
+    server, url = start_stub_panda_server(delay=delay)
+
+    # Before: the blocking transport called directly inside an async route
+    blocking_client = Client(transport=RequestsHTTPTransport(url=url), fetch_schema_from_transport=False)
+    blocking_query = gql(GET_USER)
+
+    async def blocking_route():
+        return blocking_client.execute(blocking_query)
+
+    print(f"Blocking RequestsHTTPTransport ({clients} clients, {delay * 1000:.0f} ms backend):")
+    await run_clients(blocking_route, clients, requests_per_client)
+
+    # After: the pooled async PandaService awaited natively
+    panda = PandaService(session_cookie="", url=url, pool_size=clients)
+    user_service = UserService(panda)
+
+    async def async_route():
+        return await user_service.get_user()
+
+    print(f"\nAsync HTTPXAsyncTransport ({clients} clients, {delay * 1000:.0f} ms backend):")
+    await run_clients(async_route, clients, requests_per_client)
+
+    await panda.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5, help="requests per client")
+    parser.add_argument("--delay", type=float, default=0.02, help="stub backend delay in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.delay))
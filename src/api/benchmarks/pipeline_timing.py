@@ -0,0 +1,50 @@
+"""
+Turn latency of each pipeline mode against a stub LLM with fixed per-prompt delays.
+
+"sequential" runs intent recognition, the state transition and the RAG evaluation
+one after another; "parallel" starts intent recognition and the RAG evaluation
+together and joins them before the response; "combined" makes a single
+classification call. The timeline of the last turn of each mode is printed so the
+overlap is visible.
+
+    python -m src.api.benchmarks.pipeline_timing
+"""
+import argparse
+import asyncio
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager, PipelineMode
+from src.api.agent_flow.chat_flow.TurnTimings import TurnTimingStats
+from src.api.benchmarks.stub_chat_service import StubChatCompletion
+
+
+async def run_mode(mode: PipelineMode, turns: int) -> None:
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        pipeline_mode=mode,
+        chat_service=StubChatCompletion(),
+    )
+    stats = TurnTimingStats()
+    context = ConversationContext()
+    for _ in range(turns):
+        await manager.process_message("What are the requirements for the Business Administration major?",
+                                      context=context)
+        stats.record(manager.last_turn_timer)
+
+    print(f"{mode.value}: {stats.stats()}")
+    print(manager.last_turn_timer.report())
+    print()
+
+
+async def main(turns: int):
+    for mode in PipelineMode:
+        await run_mode(mode, turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
@@ -0,0 +1,66 @@
+"""
+Per-turn cost of preparing prompt functions.
+
+Before: every process run rebuilt each step's PromptTemplateConfig and called
+kernel.add_function, and ResponseStep re-registered all four response functions.
+After: the prompt registry compiles each function once per kernel.
+
+    python -m src.api.benchmarks.prompt_registration
+"""
+import argparse
+import time
+
+from semantic_kernel import Kernel
+
+from src.api.agent_flow.ProcessValidation.DegreePlanningValidationStep import DegreePlanningValidationStep
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.PromptRegistry import PromptFunctionRegistry
+from src.api.agent_flow.information_search.InformationRetrievalEvaluationProcess import \
+    InformationRetrievalEvaluationStep
+from src.api.agent_flow.intent_recognition.RecognizeIntentProcess import IntentRecognitionStep
+from src.api.agent_flow.response_creation.ResponseGenerator import ResponseGenerator
+
+STEP_PROMPTS = [
+    ("IntentRecognizer", "intent_recognition", IntentRecognitionStep._intent_recognition_prompt),
+    ("RagRecognizer", "evaluate_rag_need", InformationRetrievalEvaluationStep._evaluation_prompt),
+    ("DegreePlanningValidation", "validate_degree_planning", DegreePlanningValidationStep._extraction_prompt),
+]
+
+
+def main(turns: int):
+    # Response templates, built the way ResponseGenerator builds them
+    templates = ResponseGenerator.__new__(ResponseGenerator)
+    templates.setup_response_templates()
+    response_prompts = [
+        ("DegreePlanning", "degree_planning", lambda: templates.degree_planning_prompt),
+        ("CourseQuestion", "course_question", lambda: templates.course_question_prompt),
+        ("General", "general", lambda: templates.general_prompt),
+        ("Initial", "initial", lambda: templates.initial_prompt),
+    ]
+
+    kernel = Kernel()
+    start = time.perf_counter()
+    for _ in range(turns):
+        for plugin_name, function_name, build in STEP_PROMPTS + response_prompts:
+            kernel.add_function(plugin_name=plugin_name, function_name=function_name,
+                                prompt_template_config=build())
+    before_ms = (time.perf_counter() - start) / turns * 1000
+
+    kernel = Kernel()
+    registry = PromptFunctionRegistry()
+    start = time.perf_counter()
+    for _ in range(turns):
+        for plugin_name, function_name, build in STEP_PROMPTS + response_prompts:
+            registry.get_or_add(kernel, plugin_name=plugin_name, function_name=function_name,
+                                prompt_template_config=build)
+    after_ms = (time.perf_counter() - start) / turns * 1000
+
+    print(f"before: {before_ms:.3f} ms per turn spent building and registering prompt functions")
+    print(f"after:  {after_ms:.3f} ms per turn ({registry.stats()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    main(args.turns)
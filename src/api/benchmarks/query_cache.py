@@ -0,0 +1,35 @@
+"""
+Shows request coalescing and hit rates of the Panda query cache.
+
+Fires 50 concurrent requirement lookups for one degree at a local stub server,
+then a second wave, and prints how many calls reached the backend.
+
+    python -m src.api.benchmarks.query_cache
+"""
+import asyncio
+import time
+
+from src.api.api_fetch.cache import QueryCache
+from src.api.api_fetch.services import PandaService, DegreeService
+from src.api.benchmarks.stub_panda_server import start_stub_panda_server
+
+
+async def main():
+    server, url = start_stub_panda_server(delay=0.05)
+    panda = PandaService(session_cookie="", url=url)
+    cache = QueryCache(max_entries=128)
+    degree_service = DegreeService(panda, cache=cache)
+
+    for wave in ("cold", "warm"):
+        start = time.perf_counter()
+        await asyncio.gather(*(degree_service.get_degree_req("Business Administration") for _ in range(50)))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{wave}: 50 lookups in {elapsed:.1f} ms, upstream calls so far: {server.RequestHandlerClass.request_count}")
+
+    print(cache.stats())
+    await panda.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Per-session setup cost: a whole ConversationStateManager per session versus
+one shared manager with a fresh ConversationContext per session.
+
+No requests are sent; the Azure credentials only need to be well-formed.
+
+    python -m src.api.benchmarks.session_setup
+"""
+import argparse
+import time
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager
+
+
+def build_manager() -> ConversationStateManager:
+    return ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+    )
+
+
+def main(sessions: int):
+    start = time.perf_counter()
+    for _ in range(sessions):
+        build_manager()
+    per_manager_ms = (time.perf_counter() - start) / sessions * 1000
+
+    start = time.perf_counter()
+    build_manager()
+    shared_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(sessions):
+        ConversationContext()
+    per_context_ms = (time.perf_counter() - start) / sessions * 1000
+
+    print(f"before: kernel + chat service + plugins per session: {per_manager_ms:.3f} ms/session")
+    print(f"after:  shared manager built once in {shared_ms:.3f} ms, then {per_context_ms:.4f} ms/session")
+    print(f"setup for {sessions} sessions: {per_manager_ms * sessions:.1f} ms -> "
+          f"{shared_ms + per_context_ms * sessions:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    args = parser.parse_args()
+    main(args.sessions)
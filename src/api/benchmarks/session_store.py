@@ -0,0 +1,83 @@
+"""
+Load test for the conversation session store.
+
+Simulates 1,000 concurrent sessions, each sending several turns to a stub chat
+service with LLM-like latency. Reports throughput, turn latency, whether any
+session ever ran two turns at once, and eviction counts under a small capacity.
+
+    python -m src.api.benchmarks.session_store
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.SessionStore import ConversationSessionStore
+
+
+class StubChatService:
+    """Stands in for ConversationStateManager: sleeps like an LLM pipeline and records history."""
+
+    def __init__(self, min_delay: float, max_delay: float):
+        self.context = ConversationContext()
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.running = 0
+        self.max_running = 0
+
+    async def process_message(self, user_input: str) -> str:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(random.uniform(self.min_delay, self.max_delay))
+        self.context.add_user_message(user_input)
+        self.context.add_assistant_message(f"echo: {user_input}")
+        self.running -= 1
+        return self.context.messages[-1]["content"]
+
+
+async def main(sessions: int, turns: int, capacity: int, min_delay: float, max_delay: float):
+    services: List[StubChatService] = []
+
+    def factory(session_id: str) -> StubChatService:
+        service = StubChatService(min_delay, max_delay)
+        services.append(service)
+        return service
+
+    store = ConversationSessionStore(factory=factory, capacity=capacity,
+                                     weigh=lambda service: 1 + len(service.context.messages))
+    latencies: List[float] = []
+
+    async def student(session_id: str):
+        # Fire all turns at once so the store has to serialise them
+        async def turn(index: int):
+            start = time.perf_counter()
+            async with store.acquire(session_id) as service:
+                await service.process_message(f"message {index}")
+            latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(turn(i) for i in range(turns)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(student(f"session-{i}") for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    total = sessions * turns
+    print(f"sessions: {sessions}, turns per session: {turns}, capacity: {capacity} messages")
+    print(f"turns/sec:        {total / elapsed:.1f}  ({elapsed:.2f} s total)")
+    print(f"p50 turn latency: {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"p95 turn latency: {statistics.quantiles(latencies, n=20)[18] * 1000:.1f} ms")
+    print(f"max concurrent turns in one session: {max(service.max_running for service in services)}")
+    print(store.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--capacity", type=int, default=3000)
+    parser.add_argument("--min-delay", type=float, default=0.05)
+    parser.add_argument("--max-delay", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.turns, args.capacity, args.min_delay, args.max_delay))
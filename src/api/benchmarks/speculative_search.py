@@ -0,0 +1,76 @@
+"""
+Turn latency with and without speculative search, against a stub LLM and a stub
+retriever, for turns that need retrieval and turns that do not.
+
+With speculation the search query (and with --retrieval the retrieval too) starts
+alongside the classification; turns that need retrieval save that time, turns that
+do not waste the speculative call's tokens.
+
+    python -m src.api.benchmarks.speculative_search
+"""
+import argparse
+import asyncio
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager, PipelineMode
+from src.api.agent_flow.chat_flow.TurnTimings import TurnTimingStats
+from src.api.agent_flow.information_search.SpeculativeSearch import speculation_stats
+from src.api.benchmarks.stub_chat_service import StubChatCompletion
+
+
+class StubRagChat:
+    """Stands in for AzureRagChat: fixed latency, canned search results."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def generate_response(self, query: str, streaming: bool = False) -> str:
+        await asyncio.sleep(self.delay)
+        return f"Search results for {query}: the major requires COMP 110, COMP 210 and MATH 231."
+
+
+async def run(mode: PipelineMode, speculate: bool, retrieval: bool, needs_rag: bool, turns: int,
+              retrieval_delay: float) -> None:
+    chat_service = StubChatCompletion()
+    chat_service.responses["rag_evaluation"] = "true" if needs_rag else "false"
+    chat_service.responses["turn_classification"] = (
+        '{"intent": "general_qa", "confidence": 0.9, "rag_type": "%s", "reason": "stub"}'
+        % ("lookup" if needs_rag else "none"))
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        pipeline_mode=mode,
+        chat_service=chat_service,
+        speculative_search=speculate,
+    )
+    manager.speculative_retrieval = retrieval
+    manager.response_generator._rag_chat = StubRagChat(retrieval_delay)
+
+    speculation_stats.__init__()
+    stats = TurnTimingStats()
+    context = ConversationContext()
+    for _ in range(turns):
+        await manager.process_message("What are the requirements for the Computer Science major?", context=context)
+        stats.record(manager.last_turn_timer)
+
+    label = "off" if not speculate else ("query+retrieval" if retrieval else "query")
+    print(f"{mode.value:<10} needs_rag={str(needs_rag):<5} speculation={label:<15}"
+          f" avg turn {stats.stats()['avg_turn_ms']:7.1f} ms  search_query calls {chat_service.calls.get('search_query', 0)}")
+    if speculate:
+        print(f"  {speculation_stats.stats()}")
+
+
+async def main(mode: PipelineMode, turns: int, retrieval_delay: float):
+    for needs_rag in (True, False):
+        for speculate, retrieval in ((False, False), (True, False), (True, True)):
+            await run(mode, speculate, retrieval, needs_rag, turns, retrieval_delay)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", type=PipelineMode, default=PipelineMode.SEQUENTIAL)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--retrieval-delay", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.mode, args.turns, args.retrieval_delay))
@@ -0,0 +1,128 @@
+"""
+Parsing classifier and extractor output: how much of a corpus of typical malformed
+outputs the old json.loads parsing, validated parsing alone, and validated parsing with
+local repair accept, and what each costs per output.
+
+Then turn latency against a stub chat service whose classifier and extractor answers are
+valid, fenced and cut off (repaired locally), or missing the intent (re-asked), with the
+parse outcomes /metrics reports.
+
+    python -m src.api.benchmarks.structured_output
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from pydantic import ValidationError
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager
+from src.api.agent_flow.chat_flow.TurnTimings import TurnTimingStats
+from src.api.agent_flow.intent_recognition.TurnClassificationProcess import TurnClassification
+from src.api.agent_flow.llm_services.StructuredOutput import StructuredOutputStats, repair_json, \
+    structured_output_stats
+from src.api.benchmarks.stub_chat_service import DEFAULT_RESPONSES, StubChatCompletion
+
+VALID = '{"intent": "degree_planning", "confidence": 0.92, "rag_type": "lookup", "reason": "Plans a CS BS"}'
+CORPUS = {
+    "valid": VALID,
+    "fenced": f"```json\n{VALID}\n```",
+    "prose around": f"Here is the classification: {VALID} Let me know if you need more.",
+    "trailing comma": VALID[:-1] + ",}",
+    "cut off in a value": VALID[:-8],
+    "cut off after a key": '{"intent": "degree_planning", "confidence": 0.92, "rag_type":',
+    "missing key": '{"confidence": 0.92, "rag_type": "lookup"}',
+}
+KEYS = ("intent", "confidence", "rag_type", "reason")
+
+# Degree planning turns, so the artifact extractor runs as well
+CLASSIFICATION = '{"intent": "degree_planning", "confidence": 0.9, "rag_type": "none", "reason": "stub"}'
+SCENARIOS = {
+    "valid": {
+        "turn_classification": CLASSIFICATION,
+        "artifact_patch": '{"current_state": "degree_planning", "major": "Computer Science"}',
+    },
+    "fenced, cut off": {
+        "turn_classification": f"```json\n{CLASSIFICATION}\n```",
+        "artifact_patch": '{"current_state": "degree_planning", "major": "Computer Science", "minor": ["Ma',
+    },
+    "missing intent": {
+        "turn_classification": '{"confidence": 0.9, "rag_type": "none", "reason": "stub"}',
+        "artifact_patch": '{"current_state": "degree_planning", "major": "Computer Science"}',
+    },
+}
+
+
+def old_parse(text: str) -> bool:
+    try:
+        data = json.loads(text)
+        return all(key in data for key in KEYS)
+    except ValueError:
+        return False
+
+
+def validated_parse(text: str, repair: bool) -> bool:
+    try:
+        TurnClassification.model_validate_json(text)
+        return True
+    except ValidationError:
+        if not repair:
+            return False
+    try:
+        TurnClassification.model_validate_json(repair_json(text))
+        return True
+    except ValidationError:
+        return False
+
+
+def parse_corpus(rounds: int) -> None:
+    parsers = {
+        "json.loads": old_parse,
+        "model_validate_json": lambda text: validated_parse(text, repair=False),
+        "with local repair": lambda text: validated_parse(text, repair=True),
+    }
+    print(f"{'output':<22}" + "".join(f"{name:>22}" for name in parsers))
+    for label, text in CORPUS.items():
+        row = f"{label:<22}"
+        for parse in parsers.values():
+            start = time.perf_counter()
+            for _ in range(rounds):
+                accepted = parse(text)
+            row += f"{'ok' if accepted else 'fail':>8} {(time.perf_counter() - start) / rounds * 1e6:7.1f} us   "
+        print(row)
+    print()
+
+
+async def run_turns(label: str, responses: dict, turns: int) -> None:
+    StructuredOutputStats.__init__(structured_output_stats)
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        pipeline_mode="combined",
+        chat_service=StubChatCompletion(responses={**DEFAULT_RESPONSES, **responses}),
+    )
+    stats = TurnTimingStats()
+    context = ConversationContext()
+    for _ in range(turns):
+        await manager.process_message("Which courses should I take next semester?", context=context)
+        stats.record(manager.last_turn_timer)
+    print(f"{label:<16} avg turn {stats.stats()['avg_turn_ms']:7.1f} ms  major {context.artifact.major}")
+    for schema, report in structured_output_stats.stats().items():
+        print(f"  {schema:<20} parsed {report['parsed']:2d}  repaired {report['repaired']:2d}"
+              f"  re-asked {report['reasked']:2d}  failed {report['failed']:2d}  retry rate {report['retry_rate']:.2f}")
+
+
+async def main(args):
+    parse_corpus(args.rounds)
+    for label, responses in SCENARIOS.items():
+        await run_turns(label, responses, args.turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000, help="parses per corpus entry and parser")
+    parser.add_argument("--turns", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args))
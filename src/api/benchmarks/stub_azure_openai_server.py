@@ -0,0 +1,119 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+STUB_ANSWER = "You could take COMP 210 and COMP 211 next semester to stay on track for the major."
+
+
+class StubAzureOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers Azure OpenAI chat completion requests, streamed or not, after an injectable delay.
+
+    `delay` plus up to `jitter` seconds passes before the answer (or, streamed, before the first
+    chunk), and `slow_rate` of the requests take `slow_delay` longer still. `failure_rate` of the
+    requests fail with a 500 and `rate_limit_rate` with a 429. All of them can be changed on the
+    handler class while the server runs, e.g. to take a region down.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse connections
+    delay: float = 0.2
+    jitter: float = 0.0
+    slow_rate: float = 0.0
+    slow_delay: float = 1.0
+    failure_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    chunk_delay: float = 0.005
+    request_count: int = 0
+
+    def do_POST(self):
+        try:
+            self._answer()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, e.g. a hedged request that lost
+            self.close_connection = True
+
+    def _answer(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        cls = type(self)
+        cls.request_count += 1
+        slow = self.slow_delay if random.random() < self.slow_rate else 0.0
+        time.sleep(self.delay + random.random() * self.jitter + slow)
+
+        roll = random.random()
+        if roll < self.failure_rate:
+            self._send_json(500, {"error": {"code": "InternalServerError", "message": "Stub region failure"}})
+        elif roll < self.failure_rate + self.rate_limit_rate:
+            self._send_json(429, {"error": {"code": "429", "message": "Stub rate limit"}}, {"retry-after": "1"})
+        elif payload.get("stream"):
+            self._stream(payload)
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{cls.request_count}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": self._deployment(),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": STUB_ANSWER}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+            })
+
+    def _deployment(self) -> str:
+        # /openai/deployments/{deployment}/chat/completions?api-version=...
+        parts = self.path.split("?")[0].split("/")
+        return parts[3] if len(parts) > 3 else "stub"
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, payload: dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        # No length for a stream; closing the connection ends it
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        model = self._deployment()
+        for index, word in enumerate(STUB_ANSWER.split(" ")):
+            chunk = {
+                "id": f"chatcmpl-{type(self).request_count}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": None,
+                             "delta": {"role": "assistant", "content": word if index == 0 else f" {word}"}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_azure_openai_server(delay: float = 0.2, jitter: float = 0.0, slow_rate: float = 0.0,
+                                   slow_delay: float = 1.0, failure_rate: float = 0.0,
+                                   rate_limit_rate: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub server on a free local port in a daemon thread; returns it and its endpoint URL.
+
+    `server.RequestHandlerClass` is this server's own handler class, to change its settings on.
+    """
+    handler = type("ConfiguredStubAzureOpenAIHandler", (StubAzureOpenAIHandler,), {
+        "delay": delay, "jitter": jitter, "slow_rate": slow_rate, "slow_delay": slow_delay,
+        "failure_rate": failure_rate, "rate_limit_rate": rate_limit_rate,
+        "request_count": 0,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
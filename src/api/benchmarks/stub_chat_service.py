@@ -0,0 +1,121 @@
+import asyncio
+from typing import Any, AsyncGenerator, Dict, List
+
+import httpx
+import openai
+from pydantic import Field, PrivateAttr
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent, StreamingChatMessageContent
+
+# Phrases that identify each of the agent's prompts, checked in order
+PROMPT_KINDS = [
+    ("turn_classification", "both the user's primary intent and whether"),
+    ("intent", "analyzes user messages to determine their primary intent"),
+    ("rag_evaluation", "validation agent for an academic advising"),
+    ("validation", "extracts structured information from conversations"),
+    ("artifact_patch", "keeps a conversation artifact up to date"),
+    ("search_query", "generates specialized search queries"),
+    ("history_summary", "maintain a running summary of a conversation"),
+    ("structured_repair", "was meant to be a single JSON object"),
+]
+
+DEFAULT_DELAYS = {
+    "turn_classification": 0.45,
+    "intent": 0.4,
+    "rag_evaluation": 0.35,
+    "validation": 0.6,
+    "artifact_patch": 0.3,
+    "search_query": 0.3,
+    "history_summary": 0.8,
+    "structured_repair": 0.3,
+    "response": 1.0,
+}
+
+DEFAULT_RESPONSES = {
+    "turn_classification": '{"intent": "general_qa", "confidence": 0.9, "rag_type": "none", "reason": "stub"}',
+    "intent": '{"intent": "general_qa", "confidence": 0.9, "reason": "stub"}',
+    "rag_evaluation": "false",
+    "validation": '{"current_state": "general_qa", "degree_type": null, "major": null, "time_preference": null, '
+                  '"current_term": null, "preferred_courses_per_semester": null, "career_goals": [], '
+                  '"courses_selected": []}',
+    "artifact_patch": '{"current_state": "general_qa"}',
+    "search_query": "UNC computer science major requirements",
+    "history_summary": "The student is exploring UNC programs and asked about general requirements.",
+    # Valid for every schema that is re-asked: the classifiers' answers, and an empty artifact patch
+    "structured_repair": '{"intent": "general_qa", "confidence": 0.9, "rag_type": "none", "reason": "stub"}',
+    "response": "Sure, here is some general information about UNC that should help you get started.",
+}
+
+
+class StubChatCompletion(ChatCompletionClientBase):
+    """Chat service with canned answers and a fixed latency per prompt kind, for benchmarks.
+
+    The prompt kind is recognised from the rendered prompt, so the agent's own prompt
+    functions can run against it unchanged.
+    """
+    delays: Dict[str, float] = Field(default_factory=lambda: dict(DEFAULT_DELAYS))
+    responses: Dict[str, str] = Field(default_factory=lambda: dict(DEFAULT_RESPONSES))
+    # Delay between streamed words of the response
+    token_delay: float = 0.0
+    # Extra delay per 1000 prompt characters, as prompt processing time grows with input length
+    delay_per_1k_chars: float = 0.0
+    # Answer every nth request with a 429 asking to retry after `retry_after` seconds (0 never)
+    rate_limit_every: int = 0
+    retry_after: float = 1.0
+
+    _calls: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _prompt_chars: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _requests: int = PrivateAttr(default=0)
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("ai_model_id", "stub")
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def prompt_text(chat_history: ChatHistory) -> str:
+        return "\n".join(str(message.content) for message in chat_history.messages)
+
+    @staticmethod
+    def prompt_kind(chat_history: ChatHistory) -> str:
+        prompt = StubChatCompletion.prompt_text(chat_history)
+        for kind, phrase in PROMPT_KINDS:
+            if phrase in prompt:
+                return kind
+        return "response"
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self._calls)
+
+    @property
+    def prompt_chars(self) -> Dict[str, int]:
+        return dict(self._prompt_chars)
+
+    async def _answer(self, chat_history: ChatHistory) -> str:
+        self._requests += 1
+        if self.rate_limit_every and self._requests % self.rate_limit_every == 0:
+            response = httpx.Response(429, headers={"retry-after": str(self.retry_after)},
+                                      request=httpx.Request("POST", "https://stub.openai.azure.com/"))
+            raise openai.RateLimitError("Rate limit exceeded", response=response, body=None)
+        kind = self.prompt_kind(chat_history)
+        chars = len(self.prompt_text(chat_history))
+        self._calls[kind] = self._calls.get(kind, 0) + 1
+        self._prompt_chars[kind] = self._prompt_chars.get(kind, 0) + chars
+        await asyncio.sleep(self.delays.get(kind, 0.0) + chars / 1000 * self.delay_per_1k_chars)
+        return self.responses[kind]
+
+    async def _inner_get_chat_message_contents(self, chat_history: ChatHistory,
+                                               settings: PromptExecutionSettings) -> List[ChatMessageContent]:
+        text = await self._answer(chat_history)
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, content=text, ai_model_id=self.ai_model_id)]
+
+    async def _inner_get_streaming_chat_message_contents(
+            self, chat_history: ChatHistory, settings: PromptExecutionSettings, function_invoke_attempt: int = 0,
+    ) -> AsyncGenerator[List[StreamingChatMessageContent], Any]:
+        text = await self._answer(chat_history)
+        for word in text.split(" "):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield [StreamingChatMessageContent(role=AuthorRole.ASSISTANT, content=word + " ", choice_index=0,
+                                               ai_model_id=self.ai_model_id)]
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+
+STUB_USER = {
+    "email": "student@unc.edu",
+    "university": "UNC Chapel Hill",
+    "isPremium": False,
+    "yearInUniversity": "Sophomore",
+    "graduationSemesterName": "Spring 2027",
+    "gpa": 3.6,
+    "tasks": [
+        {"id": 1, "title": "Problem set 3", "description": "Recursion", "dueDate": "2025-03-10",
+         "stageId": 1, "classCode": "COMP 210", "source": "canvas"},
+    ],
+    "classSchedules": [{"id": 1, "title": "Spring", "isCurrent": True, "semesterId": "S25"}],
+    "degreePlanners": [{"id": 1, "title": "Plan A", "degreeId": 1}],
+    "attendancePercentage": 95.0,
+    "assignmentCompletionPercentage": 88.0,
+    "takenClassIds": [1, 2, 3],
+    "degrees": [
+        {"id": 1, "name": "Business Administration", "type": "BSBA", "coreCategories": ["Core"],
+         "gatewayCategories": ["Gateway"], "electiveCategories": ["Elective"], "numberOfCores": 10,
+         "numberOfElectives": 4},
+    ],
+}
+
+STUB_REQUIREMENTS = [
+    {"id": 1, "category": "Core", "reqType": "core", "classIds": [1, 2, 3], "degreeId": 1},
+    {"id": 2, "category": "Elective", "reqType": "elective", "classIds": [4, 5], "degreeId": 1},
+]
+
+
+class StubPandaHandler(BaseHTTPRequestHandler):
+    """Answers Panda GraphQL queries with canned data after a fixed delay."""
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse connections
+    delay: float = 0.02
+    request_count: int = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        type(self).request_count += 1
+        time.sleep(self.delay)
+
+        body = json.dumps({"data": self._resolve(payload)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _resolve(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        query = payload.get("query") or ""
+        if payload.get("operationName") == "GetRequirementsBatch":
+            return {alias: STUB_REQUIREMENTS for alias in payload.get("variables") or {}}
+        # Persisted-query requests carry only the operation name and hash
+        if "getRequirements" in query or payload.get("operationName") == "GetRequirements":
+            return {"getRequirements": STUB_REQUIREMENTS}
+        return {"getUser": STUB_USER}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_panda_server(delay: float = 0.02) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub server on a free local port in a daemon thread."""
+    handler = type("ConfiguredStubPandaHandler", (StubPandaHandler,), {"delay": delay, "request_count": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/graphql"
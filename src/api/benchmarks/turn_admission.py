@@ -0,0 +1,60 @@
+"""
+Per-tier turn latency under overload: turns arrive faster than the agent (stub LLM)
+can serve them, one in --premium-every from a premium student.
+
+"fifo" admits waiting turns in arrival order; "premium" gives premium turns the
+configured head start. Compare the tiers' p95 latency between the two runs.
+
+    python -m src.api.benchmarks.turn_admission
+"""
+import argparse
+import asyncio
+import random
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager
+from src.api.agent_flow.chat_flow.TurnAdmission import ServiceTier, TurnAdmission
+from src.api.benchmarks.stub_chat_service import DEFAULT_DELAYS, StubChatCompletion
+
+
+async def run(label: str, head_start: float, args) -> None:
+    # Faster stub so an overloaded run finishes in seconds
+    chat_service = StubChatCompletion(delays={kind: delay * args.speed for kind, delay in DEFAULT_DELAYS.items()})
+    manager = ConversationStateManager(
+        azure_openai_deployment="benchmark",
+        azure_openai_endpoint="https://benchmark.openai.azure.com/",
+        azure_openai_api_key="benchmark",
+        chat_service=chat_service,
+    )
+    manager.turn_admission = TurnAdmission(max_active=args.max_active, premium_head_start=head_start)
+
+    rng = random.Random(args.seed)
+    turns = []
+    for index in range(args.turns):
+        tier = ServiceTier.PREMIUM if index % args.premium_every == 0 else ServiceTier.FREE
+        turns.append(asyncio.create_task(manager.process_message(
+            "Which courses should I take next semester?", context=ConversationContext(), tier=tier)))
+        await asyncio.sleep(rng.expovariate(1 / args.arrival))
+    await asyncio.gather(*turns)
+
+    for tier, stats in manager.turn_admission.stats()["tiers"].items():
+        print(f"{label:<8} {tier:<8} turns {stats['turns']:3d}  avg wait {stats['avg_wait_ms']:7.0f} ms"
+              f"  p50 {stats['p50_latency_ms']:7.0f} ms  p95 {stats['p95_latency_ms']:7.0f} ms")
+
+
+async def main(args):
+    await run("fifo", 0.0, args)
+    await run("premium", args.head_start, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--max-active", type=int, default=4)
+    parser.add_argument("--arrival", type=float, default=0.15, help="mean seconds between arrivals")
+    parser.add_argument("--premium-every", type=int, default=5)
+    parser.add_argument("--head-start", type=float, default=5.0)
+    parser.add_argument("--speed", type=float, default=0.2, help="scale of the stub's per-prompt delays")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,57 @@
+"""
+Latency of relevance-based history retrieval (to_chat_history with a query) for
+long sessions, and which earlier turn a follow-up question pulls back in.
+
+    python -m src.api.benchmarks.turn_retrieval
+"""
+import argparse
+import time
+
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.TokenBudget import history_budget
+
+TOPICS = [
+    ("What is due this week for COMP 210?", "Problem set 3 on recursion is due Monday."),
+    ("Which electives count toward the economics minor?", "ECON 410 and ECON 454 both count."),
+    ("Can I take MATH 233 in the summer?", "Yes, MATH 233 runs in both summer sessions."),
+    ("How do I book an advising appointment?", "Use the advising portal to pick a slot."),
+    ("What GPA do I need for the business school?", "Admission is competitive; most admits have a 3.5+."),
+]
+
+FOLLOW_UP = "Which of my assignments is due soonest?"
+
+
+def build_conversation(turns: int) -> ConversationContext:
+    context = ConversationContext()
+    for turn in range(turns):
+        question, answer = TOPICS[turn % len(TOPICS)]
+        context.add_user_message(f"{question} (turn {turn})")
+        context.add_assistant_message(answer)
+    # The conversation has moved on; the assignment turn is long out of the recent window
+    for _ in range(5):
+        context.add_user_message("Tell me about study abroad programs.")
+        context.add_assistant_message("UNC offers semester programs in over forty countries.")
+    return context
+
+
+def main(turns: int, repeats: int):
+    context = build_conversation(turns)
+    context.to_chat_history()  # index the existing messages, as earlier turns would have
+
+    budget = history_budget("response")
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chat_history = context.to_chat_history(budget, query=FOLLOW_UP)
+    latency_ms = (time.perf_counter() - start) / repeats * 1000
+
+    print(f"{turns + 5}-turn session: {latency_ms:.3f} ms per retrieval, {len(chat_history.messages)} messages returned")
+    for message in chat_history.messages:
+        print(f"  {message.role.value:<9} {message.content}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    main(args.turns, args.repeats)
@@ -1,13 +1,94 @@
-from fastapi import FastAPI, Depends, HTTPException
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
+from src.api.agent_flow.chat_flow.ConversationContext import ConversationContext
+from src.api.agent_flow.chat_flow.ConversationStateManager import ConversationStateManager
+from src.api.agent_flow.chat_flow.PromptRegistry import prompt_registry
+from src.api.agent_flow.chat_flow.SessionStore import ConversationSessionStore
+from src.api.agent_flow.chat_flow.TurnAdmission import ServiceTier, turn_admission
+from src.api.agent_flow.chat_flow.TurnTimings import turn_timing_stats
+from src.api.agent_flow.information_search.RagNeedClassifier import rag_need_classifier
+from src.api.agent_flow.information_search.SpeculativeSearch import speculation_stats
+from src.api.agent_flow.intent_recognition.FastPathClassifier import fast_path_classifier
+from src.api.agent_flow.llm_services.LlmScheduler import llm_scheduler
+from src.api.agent_flow.llm_services.LoadBalancedChatCompletion import load_balancer_stats
+from src.api.agent_flow.llm_services.ModelRouting import route_stats
+from src.api.agent_flow.llm_services.StructuredOutput import structured_output_stats
+from src.api.api_fetch.cache import shared_query_cache
+from src.api.api_fetch.config import PANDA_BATCH_MAX_NAMES, PANDA_SESSION_COOKIE_NAME
 from src.api.api_fetch.models import UserModel, RequirementModel
-from src.api.api_fetch.services import PandaService, UserService, DegreeService
-import os
+from src.api.api_fetch.services import UserService, DegreeService, shared_panda_service
 from typing import Dict, Any, List
 
+# Create services once at startup
+panda_service = shared_panda_service
+user_service = UserService(panda_service=panda_service, cache=shared_query_cache)
+degree_service = DegreeService(panda_service=panda_service, cache=shared_query_cache)
+
+load_dotenv()
+
+CHAT_SESSION_CAPACITY = int(os.getenv("CHAT_SESSION_CAPACITY", "50000"))  # total messages held in memory
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+
+
+# One warmed kernel and plugin set serves every session; it is built on first use
+# so the data routes work without Azure OpenAI configured.
+chat_manager: ConversationStateManager | None = None
+
+
+def get_chat_manager() -> ConversationStateManager:
+    global chat_manager
+    if chat_manager is None:
+        chat_manager = ConversationStateManager(
+            azure_openai_deployment=os.environ["AZURE_DEPLOYMENT_NAME"],
+            azure_openai_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
+            azure_openai_api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        )
+    return chat_manager
+
+
+# One conversation per session id; turns are serialised per session and run in parallel across sessions
+chat_sessions: ConversationSessionStore[ConversationContext] = ConversationSessionStore(
+    factory=lambda session_id: ConversationContext(),
+    capacity=CHAT_SESSION_CAPACITY,
+    idle_ttl=CHAT_SESSION_IDLE_TTL,
+    weigh=lambda context: 1 + len(context.messages),
+)
+
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: str | None = None
+
+
+def sse_event(data: Dict[str, Any], event: str | None = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled Panda connection on the server's event loop and release it on shutdown.
+    # If the backend is down the first request will retry the connection.
+    try:
+        await panda_service.connect()
+    except Exception as e:
+        print(f"Could not connect to Panda API at startup: {str(e)}")
+    yield
+    await panda_service.close()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Panda AI API", description="API for Panda user data")
+app = FastAPI(title="Panda AI API", description="API for Panda user data", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -18,14 +99,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Get session cookie from environment variable or use default
-SESSION_COOKIE = os.getenv("PANDA_SESSION_COOKIE", "gql-api=s%3AmZ9_NJ8jAs_Ajqq5B7Snfbx3ADBigNfa.nD0ni94Ku%2BnRYKhQYDXm%2BSMlHnHkIRS48RD84gaQbUA")
-
-# Create services once at startup
-panda_service = PandaService(session_cookie=SESSION_COOKIE)
-user_service = UserService(panda_service=panda_service)
-degree_service = DegreeService(panda_service=panda_service)
-
 # API routes
 @app.get("/")
 async def root():
@@ -34,24 +107,115 @@ async def root():
 @app.get("/user", response_model=UserModel)
 async def get_user():
     try:
-        user_data = user_service.get_user()
+        user_data = await user_service.get_user()
         return user_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch user data: {str(e)}")
 
 @app.get("/degree", response_model=List[RequirementModel])
-async def get_degree():
+async def get_degree(name: str = "Business Administration"):
     try:
-        degree_data = degree_service.get_degree_req("Business Administration")
+        degree_data = await degree_service.get_degree_req(name)
         return degree_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch degree data: {str(e)}")
 
+@app.get("/degrees", response_model=Dict[str, List[RequirementModel]])
+async def get_degrees(names: List[str] | None = Query(default=None)):
+    """Requirements for several degrees in one upstream request. Defaults to every degree the user holds."""
+    if names and len(set(names)) > PANDA_BATCH_MAX_NAMES:
+        raise HTTPException(status_code=422, detail=f"At most {PANDA_BATCH_MAX_NAMES} degree names per request")
+    try:
+        if not names:
+            user_data = await user_service.get_user()
+            names = [degree.name for degree in user_data.degrees]
+        degree_data = await degree_service.get_degree_reqs(names)
+        return degree_data
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch degree data: {str(e)}")
+
+def request_panda_session(request: Request) -> str | None:
+    """The caller's Panda session, as the Cookie header to send upstream; None without one."""
+    session = request.cookies.get(PANDA_SESSION_COOKIE_NAME)
+    return f"{PANDA_SESSION_COOKIE_NAME}={session}" if session else None
+
+def request_user_service(request: Request) -> UserService | None:
+    """User lookups as the caller, from the Panda session cookie on their request; None without one.
+
+    Shares the pooled Panda connection, and the query cache keys user records by cookie.
+    """
+    session = request_panda_session(request)
+    if session is None:
+        return None
+    return UserService(panda_service=panda_service.for_session(session), cache=shared_query_cache)
+
+async def get_service_tier(request: Request) -> ServiceTier:
+    """Tier of the calling student, from their cached user record; free if it cannot be fetched."""
+    service = request_user_service(request)
+    if service is None:
+        return ServiceTier.FREE
+    try:
+        user_data = await service.get_user()
+    except Exception as e:
+        print(f"Could not look up the user's tier: {str(e)}")
+        return ServiceTier.FREE
+    return ServiceTier.PREMIUM if user_data.isPremium else ServiceTier.FREE
+
+@app.post("/chat")
+async def chat(request: ChatRequest, http_request: Request, tier: ServiceTier = Depends(get_service_tier)):
+    """Run one conversation turn, streaming response tokens as server-sent events.
+
+    Emits `event: session` with the session id (new if none was sent), `data: {"token": ...}`
+    per chunk, then an `event: done` with the full response. Premium students' turns are
+    admitted first when the agent is saturated.
+    """
+    try:
+        manager = get_chat_manager()
+    except KeyError as e:
+        raise HTTPException(status_code=503, detail=f"Chat is not configured: missing {str(e)}")
+    session_id = request.session_id or str(uuid.uuid4())
+    panda_session = request_panda_session(http_request)
+
+    async def event_stream():
+        yield sse_event({"session_id": session_id}, event="session")
+        async with chat_sessions.acquire(session_id) as context:
+            # The student's own Panda data for this turn's tool calls; none without a session
+            context.attach_panda_session(panda_session)
+            try:
+                async for chunk in manager.stream_message(request.message, context=context, tier=tier):
+                    if chunk.final:
+                        yield sse_event({"response": chunk.text}, event="done")
+                    else:
+                        yield sse_event({"token": chunk.text})
+            except Exception as e:
+                yield sse_event({"detail": f"Failed to generate response: {str(e)}"}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+# Runtime counters used to size caches and queues
+@app.get("/metrics")
+async def metrics():
+    return {
+        "query_cache": shared_query_cache.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "prompt_functions": prompt_registry.stats(),
+        "turn_timings": turn_timing_stats.stats(),
+        "fast_path": fast_path_classifier.stats(),
+        "rag_classifier": rag_need_classifier.stats() if rag_need_classifier else None,
+        "speculative_search": speculation_stats.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "turn_admission": turn_admission.stats(),
+        "model_routes": route_stats.stats(),
+        "deployment_pools": load_balancer_stats.stats(),
+        "structured_output": structured_output_stats.stats(),
+    }
+
 # Run the application using uvicorn
 if __name__ == "__main__":
     import uvicorn